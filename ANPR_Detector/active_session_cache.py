@@ -0,0 +1,178 @@
+# active_session_cache.py
+# local write-through cache of active parking sessions, backed by SQLite
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from storage.base import is_active
+
+
+class ActiveSessionCache:
+    """
+    plate -> (session_id, entry_time) of every active session, so the gate
+    decides entry or exit without a network read.
+
+    - write-through: SessionEngine updates the cache (memory and SQLite)
+      after each entry/exit transaction it commits
+    - the SQLite file keeps the cache across restarts, only the first start
+      populates it, with one read of `active-sessions`
+    - a background thread reconciles with `active-sessions` every
+      `reconcile_interval` seconds (downloaded only when the etag changed,
+      or once when local writes may have moved the cache off the snapshot
+      that etag names), picking up sessions opened or closed by other gates or the app
+    """
+
+    def __init__(self, active_ref, db_path, reconcile_interval=60):
+        """
+        Args:
+            active_ref: Reference to `active-sessions`
+            db_path: SQLite file of the cache
+            reconcile_interval: seconds between reconciliations, None to disable
+        """
+        self.active_ref = active_ref
+        self.db_path = db_path
+        self.reconcile_interval = reconcile_interval
+
+        self.lock = threading.Lock()
+        self.sessions = {}
+        # plate -> time of the last local write, reconciliation must not undo newer writes
+        self.written_at = {}
+        # etag of the last reconciled snapshot; dirty: written locally since then
+        self.etag = None
+        self.dirty = False
+        self.connection = None
+
+        self.stop_event = threading.Event()
+        self.worker = None
+        self.stats = {"hits": 0, "misses": 0, "reconciles": 0, "corrections": 0}
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def start(self):
+        """open the store, populate it on first use and start reconciling"""
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        self.connection = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS active_sessions ("
+                                "plate TEXT PRIMARY KEY, session_id TEXT NOT NULL, entry_time TEXT NOT NULL)")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.connection.commit()
+
+        self.sessions = {plate: (session_id, entry_time) for plate, session_id, entry_time
+                         in self.connection.execute("SELECT plate, session_id, entry_time FROM active_sessions")}
+        meta = dict(self.connection.execute("SELECT key, value FROM meta"))
+        self.etag = meta.get('etag')
+        self.dirty = meta.get('dirty') == '1'
+
+        if self.etag is None:
+            self.reconcile()
+        else:
+            logging.info(f"Loaded {len(self.sessions)} active sessions from {self.db_path}")
+
+        if self.reconcile_interval:
+            self.worker = threading.Thread(target=self._run, name="session-reconcile", daemon=True)
+            self.worker.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.worker is not None:
+            self.worker.join(timeout=5)
+            self.worker = None
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def get(self, plate):
+        """(session_id, entry_time) of the plate's active session, None if it has none"""
+        session = self.sessions.get(plate)
+        self.stats["hits" if session else "misses"] += 1
+        return session
+
+    def put(self, plate, session_id, entry_time):
+        with self.lock:
+            self.sessions[plate] = (session_id, entry_time)
+            self._mark_written(plate)
+            self.connection.execute("INSERT OR REPLACE INTO active_sessions VALUES (?, ?, ?)",
+                                    (plate, session_id, entry_time))
+            self.connection.commit()
+
+    def remove(self, plate, session_id=None):
+        """drop the plate's active session (only if it is session_id, when given)"""
+        with self.lock:
+            current = self.sessions.get(plate)
+            if current is None or (session_id is not None and current[0] != session_id):
+                return
+            del self.sessions[plate]
+            self._mark_written(plate)
+            self.connection.execute("DELETE FROM active_sessions WHERE plate = ?", (plate,))
+            self.connection.commit()
+
+    def _mark_written(self, plate):
+        # the cache no longer matches the snapshot the etag names, so the next
+        # reconcile downloads even if `active-sessions` is back to that content
+        self.written_at[plate] = time.monotonic()
+        if not self.dirty:
+            self.dirty = True
+            self.connection.execute("INSERT OR REPLACE INTO meta VALUES ('dirty', '1')")
+
+    def reconcile(self):
+        """
+        bring the cache in line with `active-sessions`, returns the number of corrected plates
+        """
+        started_at = time.monotonic()
+        if self.etag is None:
+            sessions, etag = self.active_ref.get(etag=True)
+        else:
+            changed, sessions, etag = self.active_ref.get_if_changed(self.etag)
+            if not changed:
+                if not self.dirty:
+                    return 0
+                sessions, etag = self.active_ref.get(etag=True)
+
+        active = {plate: (session.get('sessionId'), session.get('entryTime'))
+                  for plate, session in (sessions or {}).items() if is_active(session)}
+
+        corrections = 0
+        with self.lock:
+            for plate in set(self.sessions) | set(active):
+                if self.written_at.get(plate, -1) >= started_at:
+                    # written by this gate after the snapshot was taken
+                    continue
+                if self.sessions.get(plate) == active.get(plate):
+                    continue
+                corrections += 1
+                if plate in active:
+                    self.sessions[plate] = active[plate]
+                    self.connection.execute("INSERT OR REPLACE INTO active_sessions VALUES (?, ?, ?)",
+                                            (plate, *active[plate]))
+                else:
+                    del self.sessions[plate]
+                    self.connection.execute("DELETE FROM active_sessions WHERE plate = ?", (plate,))
+            # only writes made while the snapshot was downloaded still matter
+            self.written_at = {plate: at for plate, at in self.written_at.items() if at >= started_at}
+            self.dirty = bool(self.written_at)
+            self.etag = etag
+            self.connection.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                                        [('etag', etag), ('dirty', '1' if self.dirty else '0')])
+            self.connection.commit()
+
+        self.stats["reconciles"] += 1
+        self.stats["corrections"] += corrections
+        logging.info(f"Active session cache reconciled: {len(self.sessions)} active, {corrections} corrected")
+        return corrections
+
+    def _run(self):
+        # a cache restarted with local writes reconciles at once, in the background
+        wait = 0 if self.dirty else self.reconcile_interval
+        while not self.stop_event.wait(wait):
+            wait = self.reconcile_interval
+            try:
+                self.reconcile()
+            except Exception as e:
+                logging.error(f"Active session reconcile failed: {str(e)}")
@@ -0,0 +1,129 @@
+# benchmark_registration.py
+# compare the full `users` scan with the registered plate index
+
+import argparse
+import json
+import os
+import random
+import string
+import tempfile
+import time
+
+from local_db import LocalDatabase
+from plate_index import RegisteredPlateIndex
+
+
+def random_plate(rng):
+    letters = string.ascii_uppercase
+    return (''.join(rng.choices(letters, k=2)) + ''.join(rng.choices(string.digits, k=2))
+            + ''.join(rng.choices(letters, k=3)))
+
+
+def make_users(num_users, seed=0):
+    """users tree shaped like the app's RegisterScreen writes it"""
+    rng = random.Random(seed)
+    users = {}
+    for i in range(num_users):
+        uid = f"user{i}@example,com"
+        users[uid] = {
+            "name": f"User {i}",
+            "phone": f"07{rng.randrange(10 ** 9):09d}",
+            "email": f"user{i}@example.com",
+            "license_plates": [random_plate(rng) for _ in range(rng.choice((1, 1, 1, 2)))]
+        }
+    return users
+
+
+def full_scan_is_registered(users_ref, plate_number):
+    """the previous is_registered_user: download every user and scan their plates"""
+    users_snapshot = users_ref.get()
+    if not users_snapshot:
+        return False
+    for user_data in users_snapshot.values():
+        if plate_number in user_data.get('license_plates', []):
+            return True
+    return False
+
+
+def time_lookups(lookup, plates):
+    start = time.perf_counter()
+    answers = [lookup(plate) for plate in plates]
+    return answers, (time.perf_counter() - start) / len(plates)
+
+
+def run_benchmark(args):
+    if args.firebase:
+        # read-only against the real database
+        from config import get_database
+        database = get_database()
+        users = database.reference('users').get() or {}
+    else:
+        users = make_users(args.num_users, args.seed)
+        database = LocalDatabase(latency=args.latency, bandwidth=args.bandwidth)
+        database.reference('users').set(users)
+
+    rng = random.Random(args.seed + 1)
+    registered = sorted({plate for user in users.values() for plate in user.get('license_plates', [])})
+    plates = [rng.choice(registered) if rng.random() < 0.8 else random_plate(rng) for _ in range(args.num_queries)]
+    users_ref = database.reference('users')
+    print(f"{len(users)} users, {len(registered)} plates, {args.num_queries} lookups")
+
+    scan_answers, scan_latency = time_lookups(lambda plate: full_scan_is_registered(users_ref, plate), plates)
+
+    cache_path = os.path.join(tempfile.mkdtemp(), 'registered_plates.json')
+    start = time.perf_counter()
+    index = RegisteredPlateIndex(users_ref, cache_path=cache_path, use_listener=not args.poll).start()
+    cold_start = time.perf_counter() - start
+    index_answers, index_latency = time_lookups(index.contains, plates * args.repeat_index)
+    index.stop()
+
+    start = time.perf_counter()
+    warm_index = RegisteredPlateIndex(users_ref, cache_path=cache_path, use_listener=False)
+    warm_index.load()
+    warm_start = time.perf_counter() - start
+
+    if index_answers[:len(plates)] != scan_answers:
+        raise SystemExit("Index and full scan disagree")
+
+    report = {
+        "users": len(users),
+        "lookups": args.num_queries,
+        "full_scan_ms": scan_latency * 1000,
+        "index_us": index_latency * 1e6,
+        "index_cold_start_s": cold_start,
+        "index_warm_start_s": warm_start,
+        "speedup": scan_latency / index_latency if index_latency else None
+    }
+    print(f"{'full scan':<12} {report['full_scan_ms']:10.2f} ms / lookup")
+    print(f"{'index':<12} {report['index_us']:10.2f} us / lookup, cold start {cold_start:.2f}s, "
+          f"warm start {warm_start * 1000:.1f} ms")
+    print(f"Speedup: {report['speedup']:.0f}x, answers identical")
+
+    if not args.firebase:
+        # a registration made while the gate runs is visible without a rebuild
+        index = RegisteredPlateIndex(users_ref, use_listener=not args.poll).start()
+        users_ref.child("new@example,com").set({"license_plates": ["NEW123"]})
+        if not args.poll:
+            print(f"Registration visible immediately: {index.contains('NEW123')}")
+        index.stop()
+
+    if args.report_path:
+        with open(args.report_path, 'w') as f:
+            json.dump(report, f, indent=4)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--num_users', type=int, default=5000, help="Simulated registered users")
+    parser.add_argument('--num_queries', type=int, default=20, help="Plate reads timed on the full-scan path")
+    parser.add_argument('--repeat_index', type=int, default=1000, help="Repeat the reads this often on the index")
+    parser.add_argument('--latency', type=float, default=0.05, help="Simulated round trip per request (s)")
+    parser.add_argument('--bandwidth', type=float, default=2e6, help="Simulated download bandwidth (bytes/s)")
+    parser.add_argument('--poll', action='store_true', help="Keep the index fresh by polling instead of listening")
+    parser.add_argument('--firebase', action='store_true', help="Read `users` from the configured Firebase database")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--report_path', default=None, help="Optional JSON file for the results")
+    args = parser.parse_args()
+
+    run_benchmark(args)
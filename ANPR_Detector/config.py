@@ -1,9 +1,7 @@
 # config.py
-# Configuration paths and Firebase setup
+# Configuration paths, Firebase setup and storage backend
 
 import os
-import firebase_admin
-from firebase_admin import credentials, db
 import pytesseract
 
 # Path to Tesseract.exe
@@ -14,9 +12,44 @@ pytesseract.pytesseract.tesseract_cmd = TESSERACT_PATH
 FIREBASE_CONFIG_PATH = os.path.join(os.path.dirname(__file__), 'firebase_config.json')
 FIREBASE_DB_URL = "https://smartparkingapp-1d951-default-rtdb.europe-west1.firebasedatabase.app/"
 
-# initialise Firebase if not already initialised
-if not firebase_admin._apps:
-    cred = credentials.Certificate(FIREBASE_CONFIG_PATH)
-    firebase_admin.initialize_app(cred, {
-        'databaseURL': FIREBASE_DB_URL
-    })
+# registered plate index: warm-start cache and poll interval (used when streaming is unavailable)
+PLATE_INDEX_PATH = os.path.join(os.path.dirname(__file__), 'cache', 'registered_plates.json')
+PLATE_INDEX_TTL = 300
+
+# active session cache: SQLite file and seconds between background reconciliations
+ACTIVE_SESSION_DB_PATH = os.path.join(os.path.dirname(__file__), 'cache', 'active_sessions.db')
+ACTIVE_SESSION_RECONCILE_INTERVAL = 60
+
+# storage backend of the gates: 'firebase' or 'sqlite' (offline, one local file)
+STORAGE_BACKEND = os.environ.get('ANPR_STORAGE_BACKEND', 'firebase')
+SQLITE_DB_PATH = os.environ.get('ANPR_SQLITE_DB_PATH', os.path.join(os.path.dirname(__file__), 'cache', 'anpr.db'))
+
+
+def get_database():
+    """
+    firebase_admin.db, initialising Firebase if not already initialised
+    (on first use, so the sqlite backend runs without credentials)
+    """
+    import firebase_admin
+    from firebase_admin import credentials, db
+
+    if not firebase_admin._apps:
+        cred = credentials.Certificate(FIREBASE_CONFIG_PATH)
+        firebase_admin.initialize_app(cred, {
+            'databaseURL': FIREBASE_DB_URL
+        })
+    return db
+
+
+def open_storage(backend=None):
+    """
+    storage backend configured above (or the given one)
+    """
+    import storage
+
+    backend = backend or STORAGE_BACKEND
+    if backend == 'firebase':
+        return storage.open_storage('firebase', database=get_database(), plate_index_path=PLATE_INDEX_PATH,
+                                    plate_index_ttl=PLATE_INDEX_TTL, cache_path=ACTIVE_SESSION_DB_PATH,
+                                    reconcile_interval=ACTIVE_SESSION_RECONCILE_INTERVAL)
+    return storage.open_storage(backend, path=SQLITE_DB_PATH)
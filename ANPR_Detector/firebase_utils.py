@@ -1,70 +1,88 @@
 # firebase_utils.py
-# firebase operations: user registration check, entry/exit
+# firebase operations: user registration check, entry/exit (through the configured storage backend)
 
-from datetime import datetime
-from firebase_admin import db
+import atexit
+
+from config import open_storage
+from plate_index import normalize_plate
+from session_engine import SessionEngine
+
+_storage = None
+_session_engine = None
+
+def get_storage():
+    """
+    storage backend shared by all gate events (config.STORAGE_BACKEND), opened on first use
+
+    """
+    global _storage
+    if _storage is None:
+        _storage = open_storage()
+        # buffered writes (app copies, archive, unregistered entries) go out before the process exits
+        atexit.register(close_storage)
+    return _storage
+
+def close_storage():
+    """
+    flush and close the shared storage backend
+
+    """
+    global _storage, _session_engine
+    if _storage is not None:
+        _storage.close()
+        _storage = None
+        _session_engine = None
+
+def get_session_engine():
+    """
+    session engine shared by all gate events
+
+    """
+    global _session_engine
+    if _session_engine is None:
+        _session_engine = SessionEngine(get_storage())
+    return _session_engine
 
 def is_registered_user(plate_number):
     """
-    check if the given plate number is listed under any registered user in firebase
+    check if the given plate number is listed under any registered user
+    (with firebase, a hash-set lookup in the local index which follows `users` in the background)
 
     """
     try:
-        users_ref = db.reference('users')
-        users_snapshot = users_ref.get()
-        if not users_snapshot:
-            
-            return False
-
-        for user_data in users_snapshot.values():
-            license_plates = user_data.get('license_plates', [])
-            if plate_number in license_plates:
-                return True
-        return False
+        return get_storage().is_registered(normalize_plate(plate_number))
     except Exception as e:
         print(f"Firebase check error: {str(e)}")
         
         return False
 
-def register_entry(plate_number, confidence, image_name):
+def process_plate(plate_number, confidence, image_name):
     """
-    if no active unpaid session exists, register a new entry in firebase.
+    one gate event: exit if the plate has an active session, else entry.
+    decided from the plate's active session, written as a conditional write in the storage backend.
+    returns the session_engine outcome (entry / exit / already_active / already_closed / unregistered)
 
     """
-    normalized_plate = plate_number.replace(" ", "").upper()
-
-    if not is_registered_user(normalized_plate):
-        print(f"Unregistered plate detected: {plate_number}")
-        unreg_ref = db.reference(f"unregistered-entries/{normalized_plate}")
-        unreg_ref.push({
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "confidence": float(confidence)
-        })
-        return False
-
-    sessions_ref = db.reference(f"parking-records/{normalized_plate}")
-    sessions = sessions_ref.get()
-
-    if sessions:
-        for session in sessions.values():
-            if session.get('paid') is False:
-                print(f"Active session exists for plate {plate_number}")
+    try:
+        outcome = get_session_engine().process_plate(plate_number, confidence, image_name)
+        print(f"{plate_number}: {outcome}")
+        return outcome
+    except Exception as e:
+        print(f"Firebase session error: {str(e)}")
 
-                return False
+        return None
 
-    now = datetime.now()
-    new_ref = sessions_ref.push()
-    new_ref.set({
-        "entryTime": now.strftime("%Y-%m-%d %H:%M:%S"),
-        "paid": False,
-        "entryMethod": "camera",
-        "confidence": float(confidence),
-        "image": image_name
-    })
+def register_entry(plate_number, confidence, image_name):
+    """
+    if no active unpaid session exists, register a new entry in firebase.
 
-    print(f"Registered entry for {plate_number}")
+    """
+    try:
+        return get_session_engine().register_entry(plate_number, confidence, image_name)
+    except Exception as e:
+        print(f"Firebase entry error: {str(e)}")
 
-    return True
+        return False
 
 def register_exit(plate_number, confidence, image_name):
     """
@@ -72,45 +90,7 @@ def register_exit(plate_number, confidence, image_name):
 
     """
     try:
-        normalized_plate = plate_number.replace(" ", "").upper()
-        records_ref = db.reference(f"parking-records/{normalized_plate}")
-        records = records_ref.get()
-
-        if not records:
-            print(f"No sessions found for {plate_number}")
-
-            return False
-
-        for session_id, session in records.items():
-            if session.get('paid') is False and session.get('exitTime') is None:
-                now = datetime.now()
-                entry_time = datetime.strptime(session.get('entryTime'), "%Y-%m-%d %H:%M:%S")
-                duration_min = (now - entry_time).total_seconds() / 60.0
-
-                # pricing logic
-                if duration_min <= 10:
-                    fee = 0.0
-                else:
-                    hours = int(duration_min / 60) + (1 if duration_min % 60 > 0 else 0)
-                    fee = min(hours * 2.0, 10.0)
-
-                session_ref = records_ref.child(session_id)
-                session_ref.update({
-                    "exitTime": now.strftime("%Y-%m-%d %H:%M:%S"),
-                    "durationMinutes": round(duration_min, 1),
-                    "amountDue": round(fee, 2),
-                    "exitConfidence": float(confidence),
-                    "exitImage": image_name,
-                    "paid": True
-                })
-
-                print(f"{plate_number} exited, charged £{fee:.2f}")
-                return True
-
-        print(f"No active unpaid session for {plate_number}")
-
-        return False
-
+        return get_session_engine().register_exit(plate_number, confidence, image_name)
     except Exception as e:
         print(f"Firebase exit error: {str(e)}")
 
@@ -0,0 +1,154 @@
+# load_test.py
+# drive simulated gate events through the entry/exit logic on a storage backend
+
+import argparse
+import itertools
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from benchmark_registration import make_users, random_plate
+from local_db import LocalDatabase
+from session_engine import ENTRY, EXIT, SessionEngine
+from storage import open_storage
+
+
+def make_storage(args):
+    if args.backend == 'sqlite':
+        path = args.db_path or os.path.join(tempfile.mkdtemp(), 'anpr.db')
+        return open_storage('sqlite', path=path, batch_size=args.batch_size)
+    # FirebaseStorage on the in-memory stand-in, with a simulated round trip
+    database = LocalDatabase(latency=args.latency)
+    cache_path = os.path.join(tempfile.mkdtemp(), 'active_sessions.db') if args.cache else None
+    return open_storage('firebase', database=database, cache_path=cache_path, batch_size=args.batch_size)
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def run_load_test(args):
+    storage = make_storage(args)
+    users = make_users(args.num_users, args.seed)
+    for uid, user in users.items():
+        storage.add_user(uid, user)
+    registered = sorted({plate for user in users.values() for plate in user['license_plates']})
+    engine = SessionEngine(storage)
+    print(f"{args.backend}: {len(users)} users, {len(registered)} plates, "
+          f"{args.num_events} events on {args.threads} threads")
+
+    # simulated clock, so stays are minutes long while the test runs in seconds
+    start_time = datetime(2025, 1, 1, 8, 0, 0)
+    ticks = itertools.count()
+    latencies = {}
+    lock = threading.Lock()
+
+    def worker(thread_id, num_events):
+        rng = random.Random(args.seed + thread_id)
+        local = {}
+        for _ in range(num_events):
+            tick = next(ticks)
+            now = start_time + timedelta(seconds=tick * args.seconds_per_event)
+            if args.lot_every and tick % args.lot_every == 0:
+                space = rng.randrange(args.num_spaces)
+                status = rng.choice(("occupied", "empty"))
+                started = time.perf_counter()
+                storage.update_lot("lot1", {f"spaces/{space}/status": status})
+                local.setdefault("lot_update", []).append(time.perf_counter() - started)
+                continue
+            if rng.random() < args.unregistered_ratio:
+                plate = random_plate(rng)
+            else:
+                plate = rng.choice(registered)
+            started = time.perf_counter()
+            outcome = engine.process_plate(plate, 0.9, f"frame_{tick}.jpg", now=now)
+            local.setdefault(outcome, []).append(time.perf_counter() - started)
+        with lock:
+            for outcome, values in local.items():
+                latencies.setdefault(outcome, []).extend(values)
+
+    per_thread = [args.num_events // args.threads + (i < args.num_events % args.threads)
+                  for i in range(args.threads)]
+    threads = [threading.Thread(target=worker, args=(i, n)) for i, n in enumerate(per_thread)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    storage.flush()
+    elapsed = time.perf_counter() - started
+
+    report = {
+        "backend": args.backend,
+        "events": args.num_events,
+        "threads": args.threads,
+        "elapsed_s": elapsed,
+        "events_per_s": args.num_events / elapsed if elapsed else None,
+        "outcomes": {outcome: {"count": len(values),
+                               "p50_ms": percentile(values, 0.5) * 1000,
+                               "p99_ms": percentile(values, 0.99) * 1000}
+                     for outcome, values in sorted(latencies.items())},
+        "problems": check_invariants(storage, engine, registered)
+    }
+    storage.close()
+
+    print(f"{report['events_per_s']:.0f} events/s ({elapsed:.2f}s)")
+    for outcome, row in report["outcomes"].items():
+        print(f"  {outcome:<15} {row['count']:8d}   p50 {row['p50_ms']:8.3f} ms   p99 {row['p99_ms']:8.3f} ms")
+    for problem in report["problems"]:
+        print(f"  {problem}")
+    print("Invariants hold" if not report["problems"] else f"{len(report['problems'])} problems found")
+
+    if args.report_path:
+        with open(args.report_path, 'w') as f:
+            json.dump(report, f, indent=4)
+    return report
+
+
+def check_invariants(storage, engine, registered):
+    """one active session per plate, and every entry either still active or archived once"""
+    problems = []
+    active = storage.active_sessions()
+    entries, exits = engine.stats[ENTRY], engine.stats[EXIT]
+    if entries - exits != len(active):
+        problems.append(f"{entries} entries - {exits} exits != {len(active)} active sessions")
+    archived = sum(len(storage.session_history(plate)) for plate in registered)
+    if archived != exits:
+        problems.append(f"{archived} archived sessions != {exits} exits")
+    for plate, session in active.items():
+        if plate not in registered:
+            problems.append(f"{plate}: active session of an unregistered plate")
+        if session.get('exitTime') is not None:
+            problems.append(f"{plate}: active session {session.get('sessionId')} has an exit time")
+    return problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--backend', choices=('sqlite', 'local_firebase'), default='sqlite',
+                        help="SQLite file, or FirebaseStorage on the in-memory local_db stand-in")
+    parser.add_argument('--num_users', type=int, default=2000, help="Simulated registered users")
+    parser.add_argument('--num_events', type=int, default=20000, help="Gate events (plate reads) to process")
+    parser.add_argument('--threads', type=int, default=4, help="Concurrent gates")
+    parser.add_argument('--unregistered_ratio', type=float, default=0.05, help="Share of reads of unknown plates")
+    parser.add_argument('--seconds_per_event', type=float, default=5.0, help="Simulated time between events")
+    parser.add_argument('--lot_every', type=int, default=0, help="Make every Nth event a lot space update (0: none)")
+    parser.add_argument('--num_spaces', type=int, default=200, help="Spaces of the simulated lot")
+    parser.add_argument('--batch_size', type=int, default=200, help="Buffered writes per batch")
+    parser.add_argument('--latency', type=float, default=0.0, help="Simulated round trip of local_firebase (s)")
+    parser.add_argument('--cache', action='store_true', help="Use the active session cache with local_firebase")
+    parser.add_argument('--db_path', default=None, help="SQLite file (default: a temporary one)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--report_path', default=None, help="Optional JSON file for the results")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    run_load_test(args)
@@ -0,0 +1,373 @@
+# local_db.py
+# local stand-in for firebase_admin.db, used for offline runs and benchmarks
+
+import copy
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+PUSH_CHARS = '-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz'
+_push_lock = threading.Lock()
+_last_push = [0, []]
+
+
+def split_path(path):
+    """'/users/abc/' -> ['users', 'abc']"""
+    return [segment for segment in str(path).split('/') if segment]
+
+
+def generate_push_id():
+    """
+    client-side push id with the same algorithm as the firebase SDKs:
+    8 characters of millisecond timestamp then 12 random ones, incremented
+    within the same millisecond, so ids sort chronologically
+    """
+    now = int(time.time() * 1000)
+    with _push_lock:
+        if now == _last_push[0]:
+            random_chars = _last_push[1]
+            i = 11
+            while i >= 0 and random_chars[i] == 63:
+                random_chars[i] = 0
+                i -= 1
+            if i >= 0:
+                random_chars[i] += 1
+        else:
+            random_chars = [random.randrange(64) for _ in range(12)]
+        _last_push[0], _last_push[1] = now, random_chars
+
+    time_chars = []
+    for _ in range(8):
+        time_chars.append(PUSH_CHARS[now % 64])
+        now //= 64
+    return ''.join(reversed(time_chars)) + ''.join(PUSH_CHARS[c] for c in random_chars)
+
+
+def sort_rank(value):
+    """firebase child ordering: null, false, true, numbers, strings, objects"""
+    if value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, str):
+        return (3, value)
+    return (4, 0)
+
+
+def encode_size(value):
+    """size in bytes of a value once sent over the wire as JSON"""
+    return len(json.dumps(value, separators=(',', ':'))) if value is not None else 0
+
+
+class Event:
+    """same fields as firebase_admin.db.Event"""
+
+    def __init__(self, event_type, path, data):
+        self.event_type = event_type
+        self.path = path
+        self.data = data
+
+
+class TransactionAbortedError(Exception):
+    """same meaning as firebase_admin.db.TransactionAbortedError"""
+
+
+class ListenerRegistration:
+    def __init__(self, database, listener):
+        self.database = database
+        self.listener = listener
+
+    def close(self):
+        with self.database.lock:
+            if self.listener in self.database.listeners:
+                self.database.listeners.remove(self.listener)
+
+
+class LocalDatabase:
+    """
+    In-memory realtime database tree with the subset of the firebase_admin.db
+    Reference API used by the ANPR code, optionally loaded from / saved to a JSON file.
+
+    - latency: seconds added to every call, to mimic a network round trip
+    - bandwidth: bytes per second for downloaded data, None for unlimited
+    - stats count round trips and downloaded bytes
+    """
+
+    def __init__(self, path=None, latency=0.0, bandwidth=None):
+        self.path = path
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.lock = threading.RLock()
+        self.listeners = []
+        self.stats = {"round_trips": 0, "bytes_read": 0, "bytes_written": 0}
+
+        self.root = {}
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.root = json.load(f) or {}
+
+    def reference(self, path='/'):
+        return LocalReference(self, split_path(path))
+
+    def save(self, path=None):
+        """write the whole tree to the JSON file (atomically)"""
+        path = path or self.path
+        with self.lock:
+            data = json.dumps(self.root, ensure_ascii=False, indent=1)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _round_trip(self, bytes_read=0, bytes_written=0):
+        self.stats["round_trips"] += 1
+        self.stats["bytes_read"] += bytes_read
+        self.stats["bytes_written"] += bytes_written
+        delay = self.latency
+        if self.bandwidth:
+            delay += (bytes_read + bytes_written) / self.bandwidth
+        if delay > 0:
+            time.sleep(delay)
+
+    def _read(self, segments):
+        node = self.root
+        for segment in segments:
+            if isinstance(node, dict):
+                node = node.get(segment)
+            elif isinstance(node, list) and segment.isdigit() and int(segment) < len(node):
+                node = node[int(segment)]
+            else:
+                return None
+            if node is None:
+                return None
+        return node
+
+    def _write(self, segments, value):
+        """set the value at a path, None deletes it (empty parents disappear like in firebase)"""
+        if not segments:
+            self.root = value if isinstance(value, dict) else {}
+            return
+
+        parents = [self.root]
+        node = self.root
+        for segment in segments[:-1]:
+            child = node.get(segment) if isinstance(node, dict) else None
+            if isinstance(child, list):
+                child = {str(i): item for i, item in enumerate(child) if item is not None}
+                node[segment] = child
+            if not isinstance(child, dict):
+                if value is None:
+                    return
+                child = {}
+                node[segment] = child
+            node = child
+            parents.append(node)
+
+        if value is None or value == {} or value == []:
+            node.pop(segments[-1], None)
+            # remove parents left empty
+            for depth in range(len(segments) - 1, 0, -1):
+                if parents[depth]:
+                    break
+                parents[depth - 1].pop(segments[depth - 1], None)
+        else:
+            node[segments[-1]] = value
+
+    def _notify(self, segments, event_type, data):
+        for listener_segments, callback in list(self.listeners):
+            if segments[:len(listener_segments)] == listener_segments:
+                relative = segments[len(listener_segments):]
+                event = Event(event_type, '/' + '/'.join(relative), copy.deepcopy(data))
+            elif listener_segments[:len(segments)] == segments:
+                # a write above the listener replaces its whole node
+                event = Event('put', '/', copy.deepcopy(self._read(listener_segments)))
+            else:
+                continue
+            callback(event)
+
+
+class LocalReference:
+    """subset of firebase_admin.db.Reference backed by a LocalDatabase"""
+
+    def __init__(self, database, segments):
+        self.database = database
+        self.segments = segments
+
+    @property
+    def key(self):
+        return self.segments[-1] if self.segments else None
+
+    @property
+    def path(self):
+        return '/' + '/'.join(self.segments)
+
+    def child(self, path):
+        return LocalReference(self.database, self.segments + split_path(path))
+
+    def get(self, etag=False, shallow=False):
+        with self.database.lock:
+            value = copy.deepcopy(self.database._read(self.segments))
+        if shallow and isinstance(value, dict):
+            value = {key: True for key in value}
+        self.database._round_trip(bytes_read=encode_size(value))
+        if etag:
+            return value, self._etag(value)
+        return value
+
+    def get_if_changed(self, etag):
+        """returns (changed, value, etag), the value is only downloaded when the etag differs"""
+        with self.database.lock:
+            value = copy.deepcopy(self.database._read(self.segments))
+        new_etag = self._etag(value)
+        if new_etag == etag:
+            self.database._round_trip()
+            return False, None, etag
+        self.database._round_trip(bytes_read=encode_size(value))
+        return True, value, new_etag
+
+    def set(self, value):
+        if value is None:
+            # like firebase_admin: None is not a value, use delete()
+            raise ValueError('Value must not be None.')
+        with self.database.lock:
+            self.database._write(self.segments, copy.deepcopy(value))
+            self.database._notify(self.segments, 'put', value)
+        self.database._round_trip(bytes_written=encode_size(value))
+
+    def update(self, value):
+        with self.database.lock:
+            for path, child_value in value.items():
+                self.database._write(self.segments + split_path(path), copy.deepcopy(child_value))
+            self.database._notify(self.segments, 'patch', value)
+        self.database._round_trip(bytes_written=encode_size(value))
+
+    def push(self, value=''):
+        with self.database.lock:
+            ref = self.child(generate_push_id())
+        if value != '':
+            ref.set(value)
+        return ref
+
+    def delete(self):
+        with self.database.lock:
+            self.database._write(self.segments, None)
+            self.database._notify(self.segments, 'put', None)
+        self.database._round_trip()
+
+    def set_if_unchanged(self, expected_etag, value):
+        """returns (success, value, etag) like the firebase_admin method, which rejects None"""
+        if value is None:
+            raise ValueError('Value must not be None.')
+        with self.database.lock:
+            current = copy.deepcopy(self.database._read(self.segments))
+            if self._etag(current) != expected_etag:
+                success = False
+            else:
+                self.database._write(self.segments, copy.deepcopy(value))
+                self.database._notify(self.segments, 'put', value)
+                success = True
+        if not success:
+            self.database._round_trip(bytes_read=encode_size(current))
+            return False, current, self._etag(current)
+        self.database._round_trip(bytes_written=encode_size(value))
+        return True, value, self._etag(value)
+
+    def transaction(self, transaction_update):
+        """
+        optimistic read-modify-write like firebase_admin: get with etag, then
+        set_if_unchanged, retrying with the fresh value up to 25 times.
+        as in the SDK, transaction_update must not return None (a delete is
+        not possible) and an exception it raises aborts the transaction
+        """
+        data, etag = self.get(etag=True)
+        for _ in range(25):
+            new_data = transaction_update(data)
+            success, data, etag = self.set_if_unchanged(etag, new_data)
+            if success:
+                return new_data
+        raise TransactionAbortedError('Transaction aborted after failed retries.')
+
+    def order_by_child(self, path):
+        return LocalQuery(self, path)
+
+    def listen(self, callback):
+        """calls callback(Event) with the current value, then synchronously on every write below this path"""
+        listener = (self.segments, callback)
+        with self.database.lock:
+            value = copy.deepcopy(self.database._read(self.segments))
+        self.database._round_trip(bytes_read=encode_size(value))
+        with self.database.lock:
+            self.database.listeners.append(listener)
+            callback(Event('put', '/', value))
+        return ListenerRegistration(self.database, listener)
+
+    @staticmethod
+    def _etag(value):
+        return hashlib.md5(json.dumps(value, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class LocalQuery:
+    """order_by_child(...).equal_to / start_at / end_at / limit_to_first / limit_to_last"""
+
+    def __init__(self, reference, order_by):
+        self.reference = reference
+        self.order_by = split_path(order_by)
+        self.start = self.end = None
+        self.limit_first = self.limit_last = None
+
+    def equal_to(self, value):
+        self.start = self.end = value
+        return self
+
+    def start_at(self, value):
+        self.start = value
+        return self
+
+    def end_at(self, value):
+        self.end = value
+        return self
+
+    def limit_to_first(self, limit):
+        self.limit_first = limit
+        return self
+
+    def limit_to_last(self, limit):
+        self.limit_last = limit
+        return self
+
+    def _value_of(self, child):
+        node = child
+        for segment in self.order_by:
+            node = node.get(segment) if isinstance(node, dict) else None
+        return node
+
+    def get(self):
+        """only the matching children are downloaded, ordered by the child value then key"""
+        with self.reference.database.lock:
+            node = self.reference.database._read(self.reference.segments)
+            if isinstance(node, list):
+                node = {str(i): item for i, item in enumerate(node) if item is not None}
+            matches = []
+            for key, child in (node or {}).items():
+                value = self._value_of(child)
+                if value is None and (self.start is not None or self.end is not None):
+                    continue
+                if self.start is not None and (type(value) is not type(self.start) or value < self.start):
+                    continue
+                if self.end is not None and (type(value) is not type(self.end) or value > self.end):
+                    continue
+                matches.append((value, key, copy.deepcopy(child)))
+
+        matches.sort(key=lambda match: (sort_rank(match[0]), match[1]))
+        if self.limit_first is not None:
+            matches = matches[:self.limit_first]
+        if self.limit_last is not None:
+            matches = matches[-self.limit_last:]
+        result = {key: child for _, key, child in matches}
+        self.reference.database._round_trip(bytes_read=encode_size(result))
+        return result
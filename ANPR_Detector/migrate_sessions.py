@@ -0,0 +1,124 @@
+# migrate_sessions.py
+# move existing parking-records to the indexed layout (active-sessions pointer + parking-history archive)
+
+import argparse
+import logging
+
+from local_db import LocalDatabase
+from storage.base import archive_partition, is_active
+
+
+def plan_plate(plate, sessions):
+    """
+    multi-path update moving one plate to the indexed layout:
+    completed sessions go to parking-history/{plate}/{YYYY-MM}, the newest
+    active session stays in parking-records and gets the active-sessions pointer.
+    returns (update, number of archived sessions, number of extra active sessions)
+    """
+    update = {}
+    active_ids = sorted(session_id for session_id, session in sessions.items() if is_active(session))
+    current_id = active_ids[-1] if active_ids else None
+
+    archived = 0
+    for session_id, session in sessions.items():
+        if session_id == current_id or not isinstance(session, dict):
+            continue
+        if is_active(session):
+            # duplicate from the time entries were not transactional, kept for review
+            session = {**session, "migrationNote": "duplicate active session"}
+        partition = archive_partition(session.get('entryTime', 'unknown'))
+        update[f"parking-history/{plate}/{partition}/{session_id}"] = session
+        update[f"parking-records/{plate}/{session_id}"] = None
+        archived += 1
+
+    if current_id is not None:
+        update[f"active-sessions/{plate}"] = {**sessions[current_id], "sessionId": current_id}
+    else:
+        update[f"active-sessions/{plate}"] = None
+    return update, archived, len(active_ids) - 1 if active_ids else 0
+
+
+def migrate(database, batch_size=100, dry_run=False):
+    """
+    compact every plate of parking-records; plates are read one by one
+    (after a shallow read of the keys) and written in batched multi-path updates.
+    run it with the gates stopped; running it again is safe and only moves what changed since
+    """
+    root_ref = database.reference('/')
+    records_ref = database.reference('parking-records')
+    plates = sorted((records_ref.get(shallow=True) or {}).keys())
+
+    report = {"plates": len(plates), "archived": 0, "active": 0, "duplicate_active": 0, "updates": 0}
+    batch = {}
+    for plate in plates:
+        sessions = records_ref.child(plate).get() or {}
+        update, archived, duplicates = plan_plate(plate, sessions)
+        report["archived"] += archived
+        report["duplicate_active"] += duplicates
+        report["active"] += update[f"active-sessions/{plate}"] is not None
+        batch.update(update)
+
+        if len(batch) >= batch_size:
+            report["updates"] += flush(root_ref, batch, dry_run)
+            batch = {}
+    report["updates"] += flush(root_ref, batch, dry_run)
+    return report
+
+
+def flush(root_ref, batch, dry_run):
+    if not batch:
+        return 0
+    if not dry_run:
+        root_ref.update(batch)
+    return 1
+
+
+def verify(database):
+    """check the indexed layout, returns a list of problems"""
+    problems = []
+    records = database.reference('parking-records').get() or {}
+    pointers = database.reference('active-sessions').get() or {}
+    for plate, sessions in records.items():
+        if len(sessions) > 1:
+            problems.append(f"{plate}: {len(sessions)} sessions left in parking-records")
+        for session_id, session in sessions.items():
+            pointer = pointers.get(plate) or {}
+            if not is_active(pointer) or pointer.get('sessionId') != session_id:
+                problems.append(f"{plate}: session {session_id} has no active-sessions pointer")
+    for plate, pointer in pointers.items():
+        if not is_active(pointer):
+            # completed record left by the last exit
+            continue
+        if pointer.get('sessionId') not in records.get(plate, {}):
+            problems.append(f"{plate}: pointer to missing session {pointer.get('sessionId')}")
+    return problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--db_json', default=None,
+                        help="Migrate a local JSON export of the database instead of Firebase")
+    parser.add_argument('--output_json', default=None, help="Where to save the migrated JSON (default: in place)")
+    parser.add_argument('--batch_size', type=int, default=100, help="Paths written per multi-path update")
+    parser.add_argument('--dry_run', action='store_true', help="Only report what would move")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    if args.db_json:
+        database = LocalDatabase(args.db_json)
+    else:
+        from config import get_database
+        database = get_database()
+
+    report = migrate(database, batch_size=args.batch_size, dry_run=args.dry_run)
+    print(f"{report['plates']} plates: {report['archived']} sessions archived, {report['active']} active "
+          f"({report['duplicate_active']} duplicate active sessions archived with a note), "
+          f"{report['updates']} updates{' (dry run)' if args.dry_run else ''}")
+
+    if not args.dry_run:
+        problems = verify(database)
+        for problem in problems:
+            print(f"  {problem}")
+        print("Layout verified" if not problems else f"{len(problems)} problems found")
+        if args.db_json:
+            database.save(args.output_json or args.db_json)
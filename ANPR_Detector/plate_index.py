@@ -0,0 +1,227 @@
+# plate_index.py
+# in-memory index of registered plates, kept in sync with the `users` node
+
+import json
+import logging
+import os
+import threading
+import time
+
+
+def normalize_plate(plate_number):
+    return str(plate_number).replace(" ", "").upper()
+
+
+def plates_of(user_data):
+    """license_plates of a user record, stored as a list or (after edits) as a dict"""
+    if not isinstance(user_data, dict):
+        return set()
+    plates = user_data.get('license_plates') or []
+    if isinstance(plates, dict):
+        plates = plates.values()
+    return {normalize_plate(plate) for plate in plates if plate}
+
+
+class RegisteredPlateIndex:
+    """
+    Hash-set index of registered plates, so a gate lookup is a set membership
+    test instead of downloading and scanning the whole `users` tree.
+
+    - built once from `users`, then kept fresh with a streaming listener
+      (`Reference.listen`), or, when listening is not available, by a
+      background poll every `ttl` seconds that only downloads `users` when its etag changed
+    - persisted to `cache_path`, so a restart answers lookups immediately
+      from the last known state while the listener catches up
+    """
+
+    def __init__(self, users_ref, cache_path=None, ttl=300, use_listener=True, start_timeout=30):
+        """
+        Args:
+            users_ref: Reference to the `users` node (firebase_admin.db or local_db)
+            cache_path: optional JSON file for warm starts
+            ttl: seconds between polls when not listening
+            use_listener: stream changes instead of polling
+            start_timeout: seconds start() waits for the first build without a disk cache
+        """
+        self.users_ref = users_ref
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.use_listener = use_listener
+        self.start_timeout = start_timeout
+
+        self.lock = threading.Lock()
+        # uid -> set of plates, plate -> number of users holding it
+        self.user_plates = {}
+        self.plate_counts = {}
+        self.etag = None
+        self.built_at = None
+        self.ready = threading.Event()
+
+        self.listener = None
+        self.stop_event = threading.Event()
+        self.poller = None
+        self.stats = {"lookups": 0, "rebuilds": 0, "updates": 0}
+
+    def __contains__(self, plate_number):
+        return self.contains(plate_number)
+
+    def __len__(self):
+        with self.lock:
+            return len(self.plate_counts)
+
+    def contains(self, plate_number):
+        """O(1) registration check"""
+        self.stats["lookups"] += 1
+        return self.plate_counts.get(normalize_plate(plate_number), 0) > 0
+
+    def start(self):
+        """
+        load the disk cache (if any), then start listening or polling.
+        without a cache the first build blocks, so lookups are never answered from an empty index
+        """
+        warm = self.load()
+        if self.use_listener and hasattr(self.users_ref, 'listen'):
+            try:
+                # the first event carries the whole node and rebuilds the index
+                self.listener = self.users_ref.listen(self._on_event)
+                if not self.ready.wait(self.start_timeout):
+                    logging.warning("Plate index not built yet, lookups miss until the listener delivers `users`")
+                return self
+            except Exception as e:
+                logging.warning(f"Plate index listener unavailable, polling every {self.ttl}s: {str(e)}")
+
+        if not warm:
+            self.refresh()
+        self.poller = threading.Thread(target=self._poll, name="plate-index-poll", daemon=True)
+        self.poller.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.listener is not None:
+            self.listener.close()
+            self.listener = None
+        if self.poller is not None:
+            self.poller.join(timeout=5)
+            self.poller = None
+        self.save()
+
+    def rebuild(self, users):
+        user_plates = {uid: plates_of(user_data) for uid, user_data in (users or {}).items()}
+        plate_counts = {}
+        for plates in user_plates.values():
+            for plate in plates:
+                plate_counts[plate] = plate_counts.get(plate, 0) + 1
+
+        with self.lock:
+            self.user_plates = user_plates
+            self.plate_counts = plate_counts
+            self.built_at = time.time()
+        self.ready.set()
+        self.stats["rebuilds"] += 1
+        logging.info(f"Registered plate index built: {len(plate_counts)} plates of {len(user_plates)} users")
+
+    def refresh(self):
+        """download `users` only if it changed since the last build, returns True if rebuilt"""
+        if self.etag is None:
+            users, etag = self.users_ref.get(etag=True)
+            changed = True
+        else:
+            changed, users, etag = self.users_ref.get_if_changed(self.etag)
+
+        if changed:
+            self.rebuild(users)
+            self.etag = etag
+            self.save()
+        else:
+            self.built_at = time.time()
+        return changed
+
+    def _poll(self):
+        while not self.stop_event.wait(self._seconds_to_refresh()):
+            try:
+                self.refresh()
+            except Exception as e:
+                logging.error(f"Plate index refresh failed: {str(e)}")
+
+    def _seconds_to_refresh(self):
+        if self.built_at is None:
+            return 0
+        return max(0.0, self.built_at + self.ttl - time.time())
+
+    def set_user(self, uid, plates):
+        """replace the plates of one user, adjusting the counts"""
+        with self.lock:
+            old = self.user_plates.pop(uid, set())
+            for plate in old - plates:
+                self.plate_counts[plate] -= 1
+                if not self.plate_counts[plate]:
+                    del self.plate_counts[plate]
+            for plate in plates - old:
+                self.plate_counts[plate] = self.plate_counts.get(plate, 0) + 1
+            if plates:
+                self.user_plates[uid] = plates
+        self.stats["updates"] += 1
+
+    def _on_event(self, event):
+        """
+        apply a listener event, paths are relative to `users`:
+        '/' (whole tree), '/<uid>', '/<uid>/license_plates[/<i>]' or another user field
+        """
+        segments = [segment for segment in event.path.split('/') if segment]
+        if event.event_type == 'patch':
+            # a patch sets several children of the event path
+            for key, value in (event.data or {}).items():
+                self._apply(segments + [segment for segment in key.split('/') if segment], value)
+        else:
+            self._apply(segments, event.data)
+        self.save()
+
+    def _apply(self, segments, data):
+        if not segments:
+            self.rebuild(data)
+            return
+
+        uid = segments[0]
+        if len(segments) == 1:
+            self.set_user(uid, plates_of(data))
+        elif segments[1] == 'license_plates':
+            if len(segments) == 2:
+                self.set_user(uid, plates_of({'license_plates': data}))
+            else:
+                # a single element changed, re-read this user's plates
+                self.set_user(uid, plates_of(self.users_ref.child(uid).get()))
+
+    def load(self):
+        """read the disk cache, returns True if one was loaded"""
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return False
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable plate index cache {self.cache_path}: {str(e)}")
+            return False
+
+        self.rebuild({uid: {'license_plates': plates} for uid, plates in cache.get('users', {}).items()})
+        # an old cache is served immediately but refreshed on the first poll
+        self.built_at = cache.get('built_at')
+        self.etag = cache.get('etag')
+        logging.info(f"Loaded registered plate index from {self.cache_path}")
+        return True
+
+    def save(self):
+        """write the index to the disk cache (temporary file + rename)"""
+        if not self.cache_path:
+            return
+        with self.lock:
+            cache = {
+                "built_at": self.built_at,
+                "etag": self.etag,
+                "users": {uid: sorted(plates) for uid, plates in self.user_plates.items()}
+            }
+        os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+        tmp_path = self.cache_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, self.cache_path)
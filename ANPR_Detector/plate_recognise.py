@@ -22,21 +22,16 @@ import pytesseract
 from datetime import datetime
 import logging
 import json
-import firebase_admin
-from firebase_admin import credentials, db
 import time
 
+from config import open_storage
+from plate_index import normalize_plate
+from session_engine import ENTRY, EXIT, SessionEngine
+
 # Set the Tesseract OCR path
 TESSERACT_PATH = os.path.join(os.path.dirname(__file__), 'tesseract', 'tesseract.exe')
 pytesseract.pytesseract.tesseract_cmd = TESSERACT_PATH
 
-# initiate Firebase admin with credentials and URL
-if not firebase_admin._apps:
-    cred = credentials.Certificate("firebase_config.json")
-    firebase_admin.initialize_app(cred, {
-        'databaseURL': 'https://smartparkingapp-1d951-default-rtdb.europe-west1.firebasedatabase.app/'
-    })
-
 def preprocess_plate_image(plate_img):
     """
     preprocess number plate image for better OCR accuracy
@@ -64,7 +59,7 @@ def preprocess_plate_image(plate_img):
 
 
 class LicensePlateRecognizer:
-    def __init__(self, model_path, output_dir='detected_plates'):
+    def __init__(self, model_path, output_dir='detected_plates', storage=None):
         self.conf_threshold = 0.3
         """
         Initialise License Plate Recognition System
@@ -72,6 +67,7 @@ class LicensePlateRecognizer:
         - load YOLOv8 model for plate detection
         - configures logging and output folders
         - set up Tesseract OCR
+        - open the storage backend (config.STORAGE_BACKEND unless one is given)
         """
         self.setup_logging()
 
@@ -85,6 +81,10 @@ class LicensePlateRecognizer:
         self.processed_plates = {}
         self.last_detection_time = time.time()
 
+        # registered plates, active sessions and session writes go through the storage backend
+        self.storage = storage or open_storage()
+        self.session_engine = SessionEngine(self.storage)
+
 
     def setup_logging(self):
         """
@@ -160,23 +160,13 @@ class LicensePlateRecognizer:
     
     def is_registered_user(self, plate_number):
         """
-        Check in Firebase if this plate number belongs to a registered user.
-        look under `users` node and compares against all license_plates fields.
+        Check if this plate number belongs to a registered user.
+        with Firebase the license_plates fields under `users` are mirrored in a local index,
+        kept up to date by a listener, so this is a hash-set lookup.
         returns True if matched, else false.
         """
         try:
-            users_ref = db.reference('users')
-            users_snapshot = users_ref.get()
-
-            if not users_snapshot:
-                return False
-
-            for user_id, user_data in users_snapshot.items():
-                license_plates = user_data.get('license_plates', [])
-                if plate_number in license_plates:
-                    return True
-
-            return False
+            return self.storage.is_registered(normalize_plate(plate_number))
 
         except Exception as e:
             logging.error(f"Error checking registration status: {str(e)}")
@@ -188,95 +178,25 @@ class LicensePlateRecognizer:
         vehicle entry logic
         - if the user is registered and has no active session, create a new one
         - if unregistered, record in `unregistered-entries`(ideally this won't happen, I expect all the users registered before enter the car park)
-        aviod dublicate entry for already parked vehicles.
+        aviod dublicate entry for already parked vehicles: the storage backend opens the session
+        only if the plate has none active, so two cameras cannot both create one.
         """
-        normalized_plate = plate_number.replace(' ', '').upper()
-        
-        if not self.is_registered_user(normalized_plate):
-            logging.warning(f"Plate {plate_number} is not registered")
-
-            unregistered_ref = db.reference(f"unregistered-entries/{normalized_plate}")
-            unregistered_ref.push({
-                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "confidence": float(confidence)
-            })
+        try:
+            return self.session_engine.register_entry(plate_number, confidence, image_name)
+        except Exception as e:
+            logging.error(f"Error processing entry for plate {plate_number} : {str(e)}")
             return False
-            
-        sessions_ref = db.reference(f"parking-records/{normalized_plate}")
-        sessions = sessions_ref.get()
-        
-        if sessions and isinstance(sessions, dict):
-            for session_id, session_data in sessions.items():
-                if session_data.get('paid') == False:
-                    logging.info(f"Plate {plate_number} already has an active session")
-                    return False
-        
-        now = datetime.now()
-        entry_time = now.strftime("%Y-%m-%d %H:%M:%S")
-        
-        new_session_ref = sessions_ref.push()
-        new_session_ref.set({
-            "entryTime": entry_time,
-            "paid": False,
-            "entryMethod": "camera",
-            "confidence": float(confidence),
-            "image": image_name
-        })
-        
-        logging.info(f"Created new entry session for {plate_number} at: {entry_time}")
-        return True
 
     def verify_and_register_exit(self, plate_number, confidence, image_name):
         """
         vehicle exit logic
         - searches for active unpaid sessions
         - computes duration and fee (free ≤10min (just in case if no parking space can be found), £2/hr, capped at £10)
-        - updates Firebase session as completed
+        - marks the session as completed with a conditional write, so it is only charged once
         
         """
         try:
-            normalized_plate = plate_number.replace(' ', '').upper()
-            records_ref = db.reference(f'parking-records/{normalized_plate}')
-            records_snapshot = records_ref.get()
-
-            if not records_snapshot:
-                logging.info(f"No session found for plate {plate_number} ")
-                return False
-
-            for session_id, session_data in records_snapshot.items():
-                if session_data.get('paid') == False and session_data.get('exitTime') is None:
-                    now = datetime.now()
-                    exit_time = now.strftime("%Y-%m-%d %H:%M:%S")
-
-                    entry_time_str = session_data.get('entryTime')
-                    entry_time = datetime.strptime(entry_time_str, "%Y-%m-%d %H:%M:%S")
-
-                    duration_minutes = (now - entry_time).total_seconds() / 60.0
-
-                    if duration_minutes <= 10:
-                        amount_due = 0.0
-                    else:
-                        hours = int(duration_minutes / 60) + (1 if duration_minutes % 60 > 0 else 0)
-                        amount_due = hours * 2.0
-                        if amount_due > 10.0:
-                            amount_due = 10.0
-
-                    session_ref = records_ref.child(session_id)
-                    session_ref.update({
-                        "exitTime": exit_time,
-                        "durationMinutes": round(duration_minutes, 1),
-                        "amountDue": round(amount_due, 2),
-                        "exitConfidence": float(confidence),
-                        "exitImage": image_name,
-                        "paid": True 
-                    })
-
-                    logging.info(f"{plate_number} exited, {duration_minutes:.1f} mintues, charged £{amount_due:.2f}")
-                    return True
-
-            logging.info(f"No active session found for{plate_number}")
-            return False
-
+            return self.session_engine.register_exit(plate_number, confidence, image_name)
         except Exception as e:
             logging.error(f"Error processing exit for plate {plate_number} : {str(e)}")
             return False
@@ -286,23 +206,15 @@ class LicensePlateRecognizer:
         determine if the plate is entering or exiting
         - if the status is unpaid, ongoing session exits turns out to be an exit
         else treat as now entry
+        the plate's active session decides, then the entry or exit is written as a conditional write.
+        returns True if a session was opened or closed
         """
-        normalized_plate = plate_number.replace(' ', '').upper()
-        records_ref = db.reference(f'parking-records/{normalized_plate}')
-        records_snapshot = records_ref.get()
-
-        has_active_session = False
-
-        if records_snapshot and isinstance(records_snapshot, dict):
-            for session_id, session_data in records_snapshot.items():
-                if session_data.get('paid') == False and session_data.get('exitTime') is None:
-                    has_active_session = True
-                    break
-
-        if has_active_session:
-            return self.verify_and_register_exit(normalized_plate, confidence, image_name)
-        else:
-            return self.verify_and_register_entry(normalized_plate, confidence, image_name)
+        try:
+            outcome = self.session_engine.process_plate(plate_number, confidence, image_name)
+        except Exception as e:
+            logging.error(f"Error processing plate {plate_number} : {str(e)}")
+            return False
+        return outcome in (ENTRY, EXIT)
 
 
     def save_results(self, image_name, plate_img, plate_number, confidence):
@@ -523,6 +435,12 @@ class LicensePlateRecognizer:
         
         return all_results
 
+    def close(self):
+        """
+        write buffered session data and close the storage backend
+        """
+        self.storage.close()
+
 
 def main():
     """
@@ -581,6 +499,8 @@ def main():
         logging.error(f"Error during execution: {str(e)}")
         import traceback
         traceback.print_exc()
+    finally:
+        recognizer.close()
 
 
 if __name__ == "__main__":
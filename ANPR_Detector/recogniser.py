@@ -10,7 +10,7 @@ from datetime import datetime
 from ultralytics import YOLO
 
 from ocr_utils import recognize_plate_number
-from firebase_utils import register_entry, register_exit
+from firebase_utils import process_plate
 from config import *
 
 class LicensePlateRecognizer:
@@ -58,13 +58,9 @@ class LicensePlateRecognizer:
 
         logging.info(f"Saved result: {result_path}")
 
-        # Upload to Firebase
+        # Upload to Firebase: one read decides entry or exit, the write is a transaction
         if plate_number:
-            plate = plate_number.replace(" ", "").upper()
-            has_active_session = not register_exit(plate, confidence, image_name)
-
-            if has_active_session:
-                register_entry(plate, confidence, image_name)
+            process_plate(plate_number, confidence, image_name)
 
         return result
 
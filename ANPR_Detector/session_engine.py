@@ -0,0 +1,201 @@
+# session_engine.py
+# entry/exit decision from one read, session writes through the storage backend
+
+import logging
+from datetime import datetime
+
+from local_db import generate_push_id
+from plate_index import normalize_plate
+from storage.base import TIME_FORMAT, archive_partition, is_active  # noqa: F401 (re-exported)
+
+# outcomes of SessionEngine.process_plate
+ENTRY = "entry"
+EXIT = "exit"
+ALREADY_ACTIVE = "already_active"
+ALREADY_CLOSED = "already_closed"
+UNREGISTERED = "unregistered"
+
+# reads of one car within this window are the same pass (the recognisers skip repeats for 30s too)
+DUPLICATE_READ_SECONDS = 30
+
+
+def calculate_fee(duration_minutes):
+    """
+    free ≤10min (just in case if no parking space can be found), £2 per started hour, capped at £10
+    """
+    if duration_minutes <= 10:
+        return 0.0
+    hours = int(duration_minutes / 60) + (1 if duration_minutes % 60 > 0 else 0)
+    return min(hours * 2.0, 10.0)
+
+
+class SessionEngine:
+    """
+    Gate logic on top of a storage.Storage backend.
+
+    - one read per plate event: the plate's active session (a pointer read,
+      a local cache hit or an indexed SQLite lookup, depending on the backend)
+    - opening and closing are conditional writes in the backend, so two
+      cameras reading the same plate at once cannot open two sessions or
+      close one twice
+    """
+
+    def __init__(self, storage, debounce_seconds=DUPLICATE_READ_SECONDS):
+        """
+        Args:
+            storage: storage.Storage, e.g. FirebaseStorage or SQLiteStorage
+            debounce_seconds: entries/exits this recent are taken as the same
+                car read by another camera, not as a stale decision
+        """
+        self.storage = storage
+        self.debounce_seconds = debounce_seconds
+        # plate -> exitTime of the sessions this engine closed, a backend with a
+        # cache does not return the last completed session
+        self.recent_exits = {}
+        self.stats = {ENTRY: 0, EXIT: 0, ALREADY_ACTIVE: 0, ALREADY_CLOSED: 0, UNREGISTERED: 0}
+
+    def active_session(self, plate, fresh=False):
+        """(session_id, session) of the active session, (None, None) if there is none"""
+        return self.storage.get_active_session(plate, fresh=fresh)
+
+    def process_plate(self, plate_number, confidence, image_name, now=None):
+        """
+        an active session means the car is leaving, otherwise it is entering.
+        returns one of ENTRY, EXIT, ALREADY_ACTIVE, ALREADY_CLOSED, UNREGISTERED
+
+        an entry or exit less than debounce_seconds old means another camera
+        read the same car at the same moment, so the read changes nothing.
+
+        the first read may come from a local cache that another gate has made
+        stale; when the write then conflicts, the plate is read again from the
+        database and decided once more, with the same debounce
+        """
+        now = now or datetime.now()
+        plate = normalize_plate(plate_number)
+        session_id, session = self.active_session(plate)
+
+        if session_id is not None:
+            if not self._settled(session.get('entryTime'), now):
+                return self._duplicate(plate, ALREADY_ACTIVE)
+            result = self.close_session(plate, session_id, confidence, image_name, now)
+            if result != ALREADY_CLOSED:
+                return result
+            logging.info(f"Stale active session read for {plate}, deciding again from the database")
+        else:
+            if not self._settled(self._exit_time(plate, session), now):
+                return self._duplicate(plate, ALREADY_CLOSED)
+            result = self.open_session(plate, confidence, image_name, now)
+            if result != ALREADY_ACTIVE:
+                return result
+            logging.info(f"Stale active session read for {plate}, deciding again from the database")
+
+        session_id, session = self.active_session(plate, fresh=True)
+        if session_id is not None:
+            if self._settled(session.get('entryTime'), now):
+                return self.close_session(plate, session_id, confidence, image_name, now)
+            return ALREADY_ACTIVE
+        if self._settled(self._exit_time(plate, session), now):
+            return self.open_session(plate, confidence, image_name, now)
+        return ALREADY_CLOSED
+
+    def _settled(self, time_text, now):
+        """True if time_text (TIME_FORMAT) is missing or at least debounce_seconds before now"""
+        if not time_text:
+            return True
+        return (now - datetime.strptime(time_text, TIME_FORMAT)).total_seconds() >= self.debounce_seconds
+
+    def _exit_time(self, plate, last_session):
+        """exit time of the plate's last completed session, from the backend or this engine's own exits"""
+        if last_session and last_session.get('exitTime'):
+            return last_session['exitTime']
+        return self.recent_exits.get(plate)
+
+    def _remember_exit(self, plate, now):
+        if len(self.recent_exits) >= 1024:
+            # only exits inside the debounce window matter
+            self.recent_exits = {key: value for key, value in self.recent_exits.items()
+                                 if not self._settled(value, now)}
+        self.recent_exits[plate] = now.strftime(TIME_FORMAT)
+
+    def _duplicate(self, plate, result):
+        logging.info(f"Repeated read of {plate} within {self.debounce_seconds}s, ignored")
+        self.stats[result] += 1
+        return result
+
+    def register_entry(self, plate_number, confidence, image_name, now=None):
+        """open a session unless one is active, returns True if one was opened"""
+        plate = normalize_plate(plate_number)
+        if self.active_session(plate)[0] is not None:
+            logging.info(f"Plate {plate} already has an active session")
+            self.stats[ALREADY_ACTIVE] += 1
+            return False
+        return self.open_session(plate, confidence, image_name, now) == ENTRY
+
+    def register_exit(self, plate_number, confidence, image_name, now=None):
+        """close the active session, returns True if one was closed"""
+        plate = normalize_plate(plate_number)
+        session_id, _ = self.active_session(plate)
+        if session_id is None:
+            logging.info(f"No active session found for {plate}")
+            return False
+        return self.close_session(plate, session_id, confidence, image_name, now) == EXIT
+
+    def open_session(self, plate, confidence, image_name, now=None):
+        now = now or datetime.now()
+        if not self.storage.is_registered(plate):
+            logging.warning(f"Plate {plate} is not registered")
+            self.storage.add_unregistered_entry(plate, {
+                "timestamp": now.strftime(TIME_FORMAT),
+                "confidence": float(confidence)
+            })
+            self.stats[UNREGISTERED] += 1
+            return UNREGISTERED
+
+        entry_time = now.strftime(TIME_FORMAT)
+        session_id = generate_push_id()
+        active_id, _ = self.storage.open_session(plate, session_id, {
+            "entryTime": entry_time,
+            "paid": False,
+            "entryMethod": "camera",
+            "confidence": float(confidence),
+            "image": image_name
+        })
+
+        result = ENTRY if active_id == session_id else ALREADY_ACTIVE
+        self.stats[result] += 1
+        if result == ENTRY:
+            logging.info(f"Created new entry session for {plate} at: {entry_time}")
+        else:
+            logging.info(f"Plate {plate} already has an active session")
+        return result
+
+    def close_session(self, plate, session_id, confidence, image_name, now=None):
+        now = now or datetime.now()
+        outcome = {}
+
+        def close(session):
+            # may run again with fresh data if another writer got in between
+            duration_minutes = (now - datetime.strptime(session['entryTime'], TIME_FORMAT)).total_seconds() / 60.0
+            amount_due = calculate_fee(duration_minutes)
+            outcome.update(duration_minutes=duration_minutes, amount_due=amount_due)
+            return {
+                **session,
+                "exitTime": now.strftime(TIME_FORMAT),
+                "durationMinutes": round(duration_minutes, 1),
+                "amountDue": round(amount_due, 2),
+                "exitConfidence": float(confidence),
+                "exitImage": image_name,
+                "paid": True
+            }
+
+        closed = self.storage.close_session(plate, session_id, close)
+        result = EXIT if closed is not None else ALREADY_CLOSED
+        self.stats[result] += 1
+        if result == EXIT:
+            self._remember_exit(plate, now)
+            logging.info(f"{plate} exited, {outcome['duration_minutes']:.1f} minutes, "
+                         f"charged £{outcome['amount_due']:.2f}")
+        else:
+            # closed by another camera since the read
+            logging.info(f"Session {session_id} of {plate} was already closed")
+        return result
@@ -0,0 +1,23 @@
+# storage/__init__.py
+# storage backends: Firebase Realtime Database or a local SQLite file
+
+from storage.base import TIME_FORMAT, Storage, archive_partition, is_active
+
+BACKENDS = ('firebase', 'sqlite')
+
+
+def open_storage(backend, **options):
+    """
+    create a storage backend, implementations are imported on demand so the
+    SQLite backend runs without firebase_admin installed
+
+    open_storage('firebase', database=db, cache_path=...)
+    open_storage('sqlite', path='cache/anpr.db')
+    """
+    if backend == 'firebase':
+        from storage.firebase_storage import FirebaseStorage
+        return FirebaseStorage(**options)
+    if backend == 'sqlite':
+        from storage.sqlite_storage import SQLiteStorage
+        return SQLiteStorage(**options)
+    raise ValueError(f"Unknown storage backend '{backend}', expected one of {BACKENDS}")
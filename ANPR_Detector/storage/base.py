@@ -0,0 +1,103 @@
+# storage/base.py
+# storage interface shared by the ANPR gates and the occupancy uploads
+
+from abc import ABC, abstractmethod
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def archive_partition(entry_time):
+    """'2025-04-12 09:30:00' -> '2025-04'"""
+    return str(entry_time)[:7]
+
+
+def is_active(session):
+    return isinstance(session, dict) and session.get('paid') is False and session.get('exitTime') is None
+
+
+class Storage(ABC):
+    """
+    Data the system keeps: users and their plates, parking sessions,
+    unregistered entries and lot availability.
+
+    Session writes are conditional (one active session per plate) and
+    applied immediately, including the completed record of an exit;
+    unregistered entries, app copies and lot updates may be buffered and
+    written in batches until flush().
+    """
+
+    # users
+
+    @abstractmethod
+    def is_registered(self, plate):
+        """True if a user has this (normalised) plate"""
+
+    @abstractmethod
+    def add_user(self, uid, user):
+        """create or replace a user record ({"name", "email", "license_plates": [...]})"""
+
+    # sessions
+
+    @abstractmethod
+    def get_active_session(self, plate, fresh=False):
+        """
+        (session_id, session) of the plate's active session. without one,
+        (None, last completed session) when the backend has it at hand
+        without another read, else (None, None).
+        fresh=True bypasses any local cache (and corrects it)
+        """
+
+    @abstractmethod
+    def open_session(self, plate, session_id, session):
+        """
+        make session the plate's active session unless it already has one.
+        returns (session_id, session) of the active session afterwards, the
+        session was opened if the returned id is session_id
+        """
+
+    @abstractmethod
+    def close_session(self, plate, session_id, close):
+        """
+        end the active session session_id: close(session) returns the completed
+        record, which is archived. returns it, or None if session_id was no
+        longer active (closed by another gate)
+        """
+
+    @abstractmethod
+    def active_sessions(self):
+        """plate -> active session (with its sessionId)"""
+
+    @abstractmethod
+    def session_history(self, plate):
+        """session_id -> completed session of the plate"""
+
+    # unregistered entries
+
+    @abstractmethod
+    def add_unregistered_entry(self, plate, entry):
+        """record a read of an unregistered plate ({"timestamp", "confidence"})"""
+
+    # lot availability
+
+    @abstractmethod
+    def update_lot(self, lot_id, changes):
+        """
+        apply the changes of a lot, in the multi-path form CloudUploader.build_changes
+        produces: {"spaces/<id>/status": "occupied", "availability": {"occupied", "empty", "timestamp"}}
+        """
+
+    @abstractmethod
+    def get_lot(self, lot_id):
+        """{"spaces": {id: {"status"}}, "availability": {...}} of a lot"""
+
+    def flush(self):
+        """write buffered changes"""
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
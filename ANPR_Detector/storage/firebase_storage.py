@@ -0,0 +1,247 @@
+# storage/firebase_storage.py
+# Storage on the Firebase Realtime Database (or the local_db stand-in)
+
+import logging
+import threading
+import time
+
+from active_session_cache import ActiveSessionCache
+from local_db import generate_push_id
+from plate_index import RegisteredPlateIndex
+from storage.base import Storage, archive_partition, is_active
+
+
+class _Conflict(Exception):
+    """raised in a transaction function to leave the pointer unchanged (aborts the transaction)"""
+
+
+class FirebaseStorage(Storage):
+    """
+    Firebase implementation on the indexed session layout:
+
+      users/{uid}                                     license_plates, mirrored in a RegisteredPlateIndex
+      active-sessions/{plate}                         the active session with its sessionId, after
+                                                      an exit the completed record until the next entry
+      parking-records/{plate}/{session_id}            the active session, as shown in the app
+      parking-history/{plate}/{YYYY-MM}/{session_id}  completed sessions
+      unregistered-entries/{plate}/{push_id}
+      parking-lots/{lot_id}/spaces, availability
+
+    The active-sessions claim/release is a synchronous transaction, and an
+    exit archives the completed session synchronously right after it. The
+    other writes (the app copy at entry, unregistered entries, lot updates)
+    are buffered and sent as one multi-path update every `batch_interval`
+    seconds or `batch_size` paths, from a background thread.
+    """
+
+    def __init__(self, database, plate_index_path=None, plate_index_ttl=300, cache_path=None,
+                 reconcile_interval=60, batch_size=200, batch_interval=1.0):
+        """
+        Args:
+            database: firebase_admin.db or a local_db.LocalDatabase
+            plate_index_path: warm-start file of the registered plate index
+            plate_index_ttl: poll interval of the index when streaming is unavailable
+            cache_path: SQLite file of the ActiveSessionCache, None to read the pointer per event
+            reconcile_interval: seconds between cache reconciliations
+            batch_size: buffered paths that trigger a write
+            batch_interval: seconds a buffered write may wait
+        """
+        self.database = database
+        self.root_ref = database.reference('/')
+        self.active_ref = database.reference('active-sessions')
+        self.plate_index_path = plate_index_path
+        self.plate_index_ttl = plate_index_ttl
+        self.cache_path = cache_path
+        self.reconcile_interval = reconcile_interval
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+
+        self._plate_index = None
+        self._cache = None
+        self.init_lock = threading.Lock()
+
+        self.pending = {}
+        self.condition = threading.Condition()
+        self.write_lock = threading.Lock()
+        self.stopping = False
+        self.stats = {"batches": 0, "batched_paths": 0}
+        self.flusher = threading.Thread(target=self._run, name="storage-flush", daemon=True)
+        self.flusher.start()
+
+    @property
+    def plate_index(self):
+        # built on first use, so creating the storage needs no network access
+        with self.init_lock:
+            if self._plate_index is None:
+                self._plate_index = RegisteredPlateIndex(self.database.reference('users'),
+                                                         cache_path=self.plate_index_path,
+                                                         ttl=self.plate_index_ttl).start()
+        return self._plate_index
+
+    @property
+    def cache(self):
+        with self.init_lock:
+            if self._cache is None and self.cache_path:
+                self._cache = ActiveSessionCache(self.active_ref, self.cache_path,
+                                                 reconcile_interval=self.reconcile_interval).start()
+        return self._cache
+
+    def is_registered(self, plate):
+        return self.plate_index.contains(plate)
+
+    def add_user(self, uid, user):
+        self.database.reference('users').child(uid).set(user)
+
+    def get_active_session(self, plate, fresh=False):
+        cache = self.cache
+        if cache is not None and not fresh:
+            cached = cache.get(plate)
+            if cached is None:
+                return None, None
+            session_id, entry_time = cached
+            return session_id, {"entryTime": entry_time, "paid": False}
+
+        session = self.active_ref.child(plate).get()
+        if not is_active(session):
+            if cache is not None:
+                cache.remove(plate)
+            # the tombstone of the last exit, if any
+            return None, session if isinstance(session, dict) else None
+        if cache is not None:
+            cache.put(plate, session.get('sessionId'), session.get('entryTime'))
+        return session.get('sessionId'), session
+
+    def open_session(self, plate, session_id, session):
+        outcome = {}
+
+        def claim(current):
+            # runs again with fresh data if another writer got in between
+            if is_active(current):
+                outcome.update(session_id=current.get('sessionId'), session=current)
+                raise _Conflict()
+            # replaces nothing or the tombstone of the plate's last session
+            outcome.update(session_id=session_id, session=session)
+            return {**session, "sessionId": session_id}
+
+        try:
+            self.active_ref.child(plate).transaction(claim)
+        except _Conflict:
+            pass
+        if self.cache is not None:
+            # write-through, also learns sessions opened by another gate
+            self.cache.put(plate, outcome["session_id"], outcome["session"].get('entryTime'))
+        if outcome["session_id"] == session_id:
+            # copy shown by the app; the pointer already holds the whole session
+            self._queue({f"parking-records/{plate}/{session_id}": session})
+        return outcome["session_id"], outcome["session"]
+
+    def close_session(self, plate, session_id, close):
+        outcome = {}
+
+        def release(current):
+            if not is_active(current) or current.get('sessionId') != session_id:
+                outcome["closed"] = None
+                raise _Conflict()
+            outcome["closed"] = close({key: value for key, value in current.items() if key != 'sessionId'})
+            # the SDK cannot delete in a transaction: the pointer keeps the
+            # completed record (paid, with exitTime), which is_active rejects
+            return {**outcome["closed"], "sessionId": session_id}
+
+        try:
+            self.active_ref.child(plate).transaction(release)
+        except _Conflict:
+            pass
+        if self.cache is not None:
+            # closed now or already closed elsewhere, either way no longer active
+            self.cache.remove(plate, session_id)
+
+        closed = outcome["closed"]
+        if closed is not None:
+            self._archive(plate, session_id, closed)
+        return closed
+
+    def _archive(self, plate, session_id, closed):
+        """
+        write the completed session to parking-history and drop its app copy,
+        synchronously: it is the billing record. if the write fails, the
+        pointer tombstone still holds the record and the paths are retried
+        with the next batch
+        """
+        record_path = f"parking-records/{plate}/{session_id}"
+        paths = {
+            f"parking-history/{plate}/{archive_partition(closed['entryTime'])}/{session_id}": closed,
+            record_path: None
+        }
+        # one writer at a time, so a batch holding the entry's app copy cannot land after its delete
+        with self.write_lock:
+            with self.condition:
+                self.pending.pop(record_path, None)
+            try:
+                self.root_ref.update(paths)
+            except Exception as e:
+                logging.error(f"Archiving session {session_id} of {plate} failed, queued for retry: {str(e)}")
+                self._queue(paths)
+
+    def active_sessions(self):
+        pointers = self.active_ref.get() or {}
+        return {plate: session for plate, session in pointers.items() if is_active(session)}
+
+    def session_history(self, plate):
+        months = self.database.reference('parking-history').child(plate).get() or {}
+        return {session_id: session for sessions in months.values() for session_id, session in sessions.items()}
+
+    def add_unregistered_entry(self, plate, entry):
+        self._queue({f"unregistered-entries/{plate}/{generate_push_id()}": entry})
+
+    def update_lot(self, lot_id, changes):
+        self._queue({f"parking-lots/{lot_id}/{path}": value for path, value in changes.items()})
+
+    def get_lot(self, lot_id):
+        return self.database.reference('parking-lots').child(lot_id).get() or {}
+
+    def _queue(self, paths):
+        with self.condition:
+            self.pending.update(paths)
+            if len(self.pending) >= self.batch_size:
+                self.condition.notify_all()
+
+    def flush(self):
+        with self.write_lock:
+            with self.condition:
+                batch, self.pending = self.pending, {}
+            if not batch:
+                return
+            try:
+                self.root_ref.update(batch)
+            except Exception:
+                # keep the paths for the next attempt, newer values win
+                with self.condition:
+                    self.pending = {**batch, **self.pending}
+                raise
+            else:
+                self.stats["batches"] += 1
+                self.stats["batched_paths"] += len(batch)
+
+    def _run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.stopping or len(self.pending) >= self.batch_size,
+                                        timeout=self.batch_interval)
+                if self.stopping:
+                    return
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"Batched write failed, retrying in {self.batch_interval}s: {str(e)}")
+                time.sleep(self.batch_interval)
+
+    def close(self):
+        with self.condition:
+            self.stopping = True
+            self.condition.notify_all()
+        self.flusher.join(timeout=5)
+        self.flush()
+        if self._cache is not None:
+            self._cache.stop()
+        if self._plate_index is not None:
+            self._plate_index.stop()
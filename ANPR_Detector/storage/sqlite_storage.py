@@ -0,0 +1,223 @@
+# storage/sqlite_storage.py
+# Storage in a local SQLite file (WAL mode), for offline gates and load tests
+
+import json
+import os
+import sqlite3
+import threading
+
+from storage.base import Storage, is_active
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (uid TEXT PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS user_plates (plate TEXT NOT NULL, uid TEXT NOT NULL, PRIMARY KEY (plate, uid));
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    plate TEXT NOT NULL,
+    active INTEGER NOT NULL,
+    entry_time TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_by_plate ON sessions (plate, active);
+CREATE UNIQUE INDEX IF NOT EXISTS one_active_session ON sessions (plate) WHERE active = 1;
+CREATE TABLE IF NOT EXISTS unregistered_entries (
+    id INTEGER PRIMARY KEY,
+    plate TEXT NOT NULL,
+    timestamp TEXT,
+    confidence REAL
+);
+CREATE INDEX IF NOT EXISTS unregistered_by_plate ON unregistered_entries (plate);
+CREATE TABLE IF NOT EXISTS lot_spaces (lot_id TEXT NOT NULL, space_id TEXT NOT NULL, status TEXT,
+                                       PRIMARY KEY (lot_id, space_id));
+CREATE TABLE IF NOT EXISTS lot_availability (lot_id TEXT PRIMARY KEY, occupied INTEGER, empty INTEGER,
+                                             timestamp INTEGER);
+"""
+
+
+class SQLiteStorage(Storage):
+    """
+    SQLite implementation: sessions are rows indexed by (plate, active), and a
+    partial unique index allows one active session per plate, so opening a
+    session is a single conditional INSERT.
+
+    Session writes commit immediately. Unregistered entries and lot updates
+    are buffered and written with executemany in one transaction every
+    `batch_size` rows (or on flush / the next session commit).
+    """
+
+    def __init__(self, path, batch_size=500):
+        """
+        Args:
+            path: database file, ':memory:' for a throwaway store
+            batch_size: buffered rows that trigger a write
+        """
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.batch_size = batch_size
+
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+
+        self.pending_unregistered = []
+        self.pending_spaces = []
+        self.pending_availability = []
+
+    def is_registered(self, plate):
+        with self.lock:
+            row = self.connection.execute("SELECT 1 FROM user_plates WHERE plate = ? LIMIT 1", (plate,)).fetchone()
+        return row is not None
+
+    def add_user(self, uid, user):
+        plates = user.get('license_plates') or []
+        if isinstance(plates, dict):
+            plates = list(plates.values())
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                self.connection.execute("INSERT OR REPLACE INTO users VALUES (?, ?)", (uid, json.dumps(user)))
+                self.connection.execute("DELETE FROM user_plates WHERE uid = ?", (uid,))
+                self.connection.executemany("INSERT OR IGNORE INTO user_plates VALUES (?, ?)",
+                                            [(str(plate).replace(" ", "").upper(), uid) for plate in plates])
+                self.connection.execute("COMMIT")
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                raise
+
+    def get_active_session(self, plate, fresh=False):
+        # always read from the database file, fresh has nothing to bypass;
+        # without an active session the plate's last completed one comes back
+        with self.lock:
+            row = self.connection.execute("SELECT session_id, active, data FROM sessions WHERE plate = ? "
+                                          "ORDER BY active DESC, session_id DESC LIMIT 1", (plate,)).fetchone()
+        if row is None:
+            return None, None
+        session_id, active, data = row
+        return (session_id if active else None), json.loads(data)
+
+    def open_session(self, plate, session_id, session):
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                self._write_pending()
+                self.connection.execute("INSERT INTO sessions VALUES (?, ?, 1, ?, ?)",
+                                        (session_id, plate, session['entryTime'], json.dumps(session)))
+                self.connection.execute("COMMIT")
+                self._clear_pending()
+                return session_id, session
+            except sqlite3.IntegrityError:
+                # the plate already has an active session
+                self.connection.execute("ROLLBACK")
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                raise
+            return self.get_active_session(plate)
+
+    def close_session(self, plate, session_id, close):
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                self._write_pending()
+                row = self.connection.execute("SELECT data FROM sessions WHERE session_id = ? AND plate = ? "
+                                              "AND active = 1", (session_id, plate)).fetchone()
+                session = json.loads(row[0]) if row else None
+                if not is_active(session):
+                    self.connection.execute("COMMIT")
+                    self._clear_pending()
+                    return None
+                closed = close(session)
+                self.connection.execute("UPDATE sessions SET active = 0, data = ? WHERE session_id = ?",
+                                        (json.dumps(closed), session_id))
+                self.connection.execute("COMMIT")
+                self._clear_pending()
+                return closed
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                raise
+
+    def active_sessions(self):
+        with self.lock:
+            rows = self.connection.execute("SELECT plate, session_id, data FROM sessions WHERE active = 1").fetchall()
+        return {plate: {**json.loads(data), "sessionId": session_id} for plate, session_id, data in rows}
+
+    def session_history(self, plate):
+        with self.lock:
+            rows = self.connection.execute("SELECT session_id, data FROM sessions WHERE plate = ? AND active = 0 "
+                                           "ORDER BY session_id", (plate,)).fetchall()
+        return {session_id: json.loads(data) for session_id, data in rows}
+
+    def add_unregistered_entry(self, plate, entry):
+        with self.lock:
+            self.pending_unregistered.append((plate, entry.get('timestamp'), entry.get('confidence')))
+            self._maybe_flush()
+
+    def update_lot(self, lot_id, changes):
+        with self.lock:
+            for path, value in changes.items():
+                parts = path.split('/')
+                if parts[0] == 'spaces' and len(parts) == 3 and parts[2] == 'status':
+                    self.pending_spaces.append((lot_id, parts[1], value))
+                elif path == 'availability':
+                    self.pending_availability.append((lot_id, value.get('occupied'), value.get('empty'),
+                                                      value.get('timestamp')))
+                else:
+                    raise ValueError(f"Unsupported lot change path: {path}")
+            self._maybe_flush()
+
+    def get_lot(self, lot_id):
+        with self.lock:
+            self.flush()
+            spaces = self.connection.execute("SELECT space_id, status FROM lot_spaces WHERE lot_id = ?",
+                                             (lot_id,)).fetchall()
+            availability = self.connection.execute("SELECT occupied, empty, timestamp FROM lot_availability "
+                                                   "WHERE lot_id = ?", (lot_id,)).fetchone()
+        lot = {}
+        if spaces:
+            lot["spaces"] = {space_id: {"status": status} for space_id, status in spaces}
+        if availability:
+            lot["availability"] = dict(zip(("occupied", "empty", "timestamp"), availability))
+        return lot
+
+    def _pending_rows(self):
+        return len(self.pending_unregistered) + len(self.pending_spaces) + len(self.pending_availability)
+
+    def _maybe_flush(self):
+        if self._pending_rows() >= self.batch_size:
+            self.flush()
+
+    def _write_pending(self):
+        """write the buffered rows inside the caller's transaction, cleared once it commits"""
+        if self.pending_unregistered:
+            self.connection.executemany("INSERT INTO unregistered_entries (plate, timestamp, confidence) "
+                                        "VALUES (?, ?, ?)", self.pending_unregistered)
+        if self.pending_spaces:
+            self.connection.executemany("INSERT OR REPLACE INTO lot_spaces VALUES (?, ?, ?)", self.pending_spaces)
+        if self.pending_availability:
+            self.connection.executemany("INSERT OR REPLACE INTO lot_availability VALUES (?, ?, ?, ?)",
+                                        self.pending_availability)
+
+    def _clear_pending(self):
+        self.pending_unregistered, self.pending_spaces, self.pending_availability = [], [], []
+
+    def flush(self):
+        with self.lock:
+            if not self._pending_rows() or self.connection is None:
+                return
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                self._write_pending()
+                self.connection.execute("COMMIT")
+                self._clear_pending()
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                raise
+
+    def close(self):
+        with self.lock:
+            self.flush()
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
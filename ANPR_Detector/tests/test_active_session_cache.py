@@ -0,0 +1,42 @@
+from active_session_cache import ActiveSessionCache
+from local_db import LocalDatabase
+
+SESSION = {"sessionId": "-s1", "entryTime": "2025-01-01 08:00:00", "paid": False}
+
+
+def test_restart_after_local_writes_loads_the_file(tmp_path):
+    database = LocalDatabase()
+    active_ref = database.reference('active-sessions')
+    active_ref.child("AB12CDE").set(SESSION)
+    db_path = str(tmp_path / "cache.db")
+
+    cache = ActiveSessionCache(active_ref, db_path, reconcile_interval=None).start()
+    cache.put("CD34EFG", "-s2", "2025-01-01 09:00:00")
+    cache.stop()
+
+    bytes_read = database.stats["bytes_read"]
+    restarted = ActiveSessionCache(active_ref, db_path, reconcile_interval=None).start()
+    # no download in start(), the local write is left to the background reconcile
+    assert database.stats["bytes_read"] == bytes_read
+    assert restarted.etag is not None and restarted.dirty
+    assert restarted.get("CD34EFG") == ("-s2", "2025-01-01 09:00:00")
+    restarted.stop()
+
+
+def test_local_writes_force_one_download(tmp_path):
+    database = LocalDatabase()
+    active_ref = database.reference('active-sessions')
+    active_ref.child("AB12CDE").set(SESSION)
+    cache = ActiveSessionCache(active_ref, str(tmp_path / "cache.db"), reconcile_interval=None).start()
+
+    # a write the database never saw: the etag is unchanged, the cache is not
+    cache.put("CD34EFG", "-s2", "2025-01-01 09:00:00")
+    assert cache.reconcile() == 1
+    assert cache.get("CD34EFG") is None
+    assert not cache.dirty and cache.written_at == {}
+
+    # clean again: an unchanged etag downloads nothing
+    bytes_read = database.stats["bytes_read"]
+    assert cache.reconcile() == 0
+    assert database.stats["bytes_read"] == bytes_read
+    cache.stop()
@@ -0,0 +1,138 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from local_db import LocalDatabase
+from session_engine import ALREADY_ACTIVE, ALREADY_CLOSED, ENTRY, EXIT, SessionEngine
+from storage.firebase_storage import FirebaseStorage
+from storage.sqlite_storage import SQLiteStorage
+
+PLATE = "AB12CDE"
+NOW = datetime(2025, 1, 1, 8, 0, 0)
+
+
+def make_database(latency=0.0):
+    database = LocalDatabase(latency=latency)
+    database.reference('users').child('u1').set({"license_plates": [PLATE]})
+    return database
+
+
+@pytest.fixture
+def cached_gates(tmp_path):
+    """two gate processes on one database, each with its own active session cache"""
+    database = make_database()
+    storages = [FirebaseStorage(database, cache_path=str(tmp_path / f"gate{i}.db"), reconcile_interval=None)
+                for i in range(2)]
+    for storage in storages:
+        storage.cache  # populated now, before the other gate writes
+    yield database, [SessionEngine(storage) for storage in storages]
+    for storage in storages:
+        storage.close()
+
+
+def read_together(engines, now):
+    """both cameras read the plate at the same moment"""
+    outcomes = []
+    barrier = threading.Barrier(len(engines))
+
+    def read(engine):
+        barrier.wait()
+        outcomes.append(engine.process_plate(PLATE, 0.9, "frame.jpg", now=now))
+
+    threads = [threading.Thread(target=read, args=(engine,)) for engine in engines]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(outcomes)
+
+
+def test_simultaneous_reads_are_one_entry_and_one_exit_firebase():
+    database = make_database(latency=0.02)
+    storages = [FirebaseStorage(database) for _ in range(2)]
+    engines = [SessionEngine(storage) for storage in storages]
+
+    assert read_together(engines, NOW) == [ALREADY_ACTIVE, ENTRY]
+    assert list(storages[0].active_sessions()) == [PLATE]
+    assert read_together(engines, NOW + timedelta(hours=1)) == [ALREADY_CLOSED, EXIT]
+    assert storages[0].active_sessions() == {}
+    assert len(storages[0].session_history(PLATE)) == 1
+    for storage in storages:
+        storage.close()
+
+
+def test_simultaneous_reads_are_one_entry_and_one_exit_sqlite(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "anpr.db"))
+    storage.add_user('u1', {"license_plates": [PLATE]})
+    engines = [SessionEngine(storage) for _ in range(2)]
+
+    assert read_together(engines, NOW) == [ALREADY_ACTIVE, ENTRY]
+    assert list(storage.active_sessions()) == [PLATE]
+    assert read_together(engines, NOW + timedelta(hours=1)) == [ALREADY_CLOSED, EXIT]
+    assert storage.active_sessions() == {}
+    storage.close()
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "firebase", "firebase_cache"])
+def test_repeated_reads_within_the_debounce_are_ignored(tmp_path, backend):
+    if backend == "sqlite":
+        storage = SQLiteStorage(str(tmp_path / "anpr.db"))
+        storage.add_user('u1', {"license_plates": [PLATE]})
+    else:
+        cache_path = str(tmp_path / "gate.db") if backend == "firebase_cache" else None
+        storage = FirebaseStorage(make_database(), cache_path=cache_path, reconcile_interval=None)
+    engine = SessionEngine(storage)
+
+    outcomes = [engine.process_plate(PLATE, 0.9, "frame.jpg", now=NOW + offset) for offset in
+                (timedelta(0), timedelta(seconds=2), timedelta(hours=1), timedelta(hours=1, seconds=2))]
+    assert outcomes == [ENTRY, ALREADY_ACTIVE, EXIT, ALREADY_CLOSED]
+    assert storage.active_sessions() == {}
+    assert len(storage.session_history(PLATE)) == 1
+    storage.close()
+
+
+def test_recent_conflict_on_a_stale_cache_is_a_duplicate_read(cached_gates):
+    _, (gate_a, gate_b) = cached_gates
+
+    assert gate_a.process_plate(PLATE, 0.9, "a.jpg", now=NOW) == ENTRY
+    # gate B's cache missed the entry, but it was a moment ago: the same car, not an exit
+    assert gate_b.process_plate(PLATE, 0.9, "b.jpg", now=NOW + timedelta(seconds=2)) == ALREADY_ACTIVE
+    assert list(gate_a.storage.active_sessions()) == [PLATE]
+
+
+def test_stale_caches_do_not_drop_later_gate_events(cached_gates):
+    database, (gate_a, gate_b) = cached_gates
+
+    assert gate_a.process_plate(PLATE, 0.9, "a1.jpg", now=NOW) == ENTRY
+    # gate B's cache missed an entry made an hour ago: its open conflicts, the session is closed instead
+    assert gate_b.process_plate(PLATE, 0.9, "b1.jpg", now=NOW + timedelta(hours=1)) == EXIT
+    # gate A's cache still holds the closed session: its close conflicts, a new session is opened
+    assert gate_a.process_plate(PLATE, 0.9, "a2.jpg", now=NOW + timedelta(hours=2)) == ENTRY
+    assert gate_b.process_plate(PLATE, 0.9, "b2.jpg", now=NOW + timedelta(hours=3)) == EXIT
+
+    assert gate_a.storage.active_sessions() == {}
+    history = gate_a.storage.session_history(PLATE)
+    assert sorted(session["image"] for session in history.values()) == ["a1.jpg", "a2.jpg"]
+    assert sorted(session["exitImage"] for session in history.values()) == ["b1.jpg", "b2.jpg"]
+    # gate A still holds the last session until it conflicts or reconciles
+    assert gate_b.storage.cache.get(PLATE) is None
+    assert gate_a.storage.cache.reconcile() == 1
+    assert gate_a.storage.cache.get(PLATE) is None
+
+
+def test_exit_archives_without_waiting_for_the_batch():
+    database = make_database()
+    # the batch would only go out on close
+    storage = FirebaseStorage(database, batch_size=10 ** 6, batch_interval=3600)
+    engine = SessionEngine(storage)
+
+    assert engine.process_plate(PLATE, 0.9, "in.jpg", now=NOW) == ENTRY
+    assert engine.process_plate(PLATE, 0.9, "out.jpg", now=NOW + timedelta(hours=2)) == EXIT
+
+    history = database.reference('parking-history').child(PLATE).child('2025-01').get()
+    assert [session["amountDue"] for session in history.values()] == [4.0]
+    assert database.reference('parking-records').child(PLATE).get() is None
+    # the entry's app copy was still pending and must not come back after the exit
+    storage.close()
+    assert database.reference('parking-records').child(PLATE).get() is None
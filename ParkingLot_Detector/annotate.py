@@ -1,8 +1,8 @@
 # annotate.py
 import argparse
 import cv2
-import json
-import os
+
+from utils.spot_config import parse_spots
 
 # Global variables
 parking_spots = {}
@@ -48,9 +48,8 @@ def annotate_parking_spots(image_path, output_json_path):
 
     cv2.destroyAllWindows()
 
-    # 保存JSON
-    with open(output_json_path, 'w') as f:
-        json.dump(parking_spots, f, indent=4)
+    # 保存为 ParkingDetector 直接读取的 [{"id", "coords"}] 格式
+    parse_spots(parking_spots).save(output_json_path)
     print(f"Annotations saved to {output_json_path}")
 
 if __name__ == "__main__":
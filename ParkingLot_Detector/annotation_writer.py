@@ -0,0 +1,203 @@
+import os
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+# BGR overlay colours
+EMPTY_COLOR = (0, 255, 0)
+OCCUPIED_COLOR = (0, 0, 255)
+
+ENCODE_PARAMS = {
+    'jpg': lambda quality: [cv2.IMWRITE_JPEG_QUALITY, quality],
+    'webp': lambda quality: [cv2.IMWRITE_WEBP_QUALITY, quality],
+    # png is lossless, quality 0-100 maps to compression level 9-0
+    'png': lambda quality: [cv2.IMWRITE_PNG_COMPRESSION, max(0, min(9, (100 - quality) // 10))]
+}
+
+# file extensions naming one of the formats above
+FORMAT_ALIASES = {'jpeg': 'jpg'}
+
+DEFAULT_FORMAT = 'jpg'
+
+
+class AnnotationWriter:
+    """
+    Background stage that renders and saves annotated frames, so drawing,
+    JPEG encoding and disk writes never add to inference latency.
+
+    - rate: only every `every_n`-th frame per key (camera) is kept
+    - preview: the frame is downscaled to `preview_width` before drawing,
+      overlays are drawn on the preview only
+    - backpressure: at most `max_pending` frames wait; when full the oldest
+      is dropped instead of blocking the caller
+    - files are written atomically (temporary file + rename), so a reader
+      never sees a half-written image
+
+    Frames are referenced, not copied: callers must not modify a frame
+    after submitting it (ParkingDetector never draws on its input).
+    """
+
+    def __init__(self, every_n=1, quality=85, image_format=None, preview_width=960, max_pending=4):
+        """
+        Args:
+            every_n: write one of every N submitted frames per key
+            quality: encoder quality 0-100 (JPEG / WebP quality, PNG compression)
+            image_format: 'jpg', 'png' or 'webp'; replaces the extension of output
+                paths. None keeps the caller's path and encodes by its
+                extension, adding '.jpg' only when it has none
+            preview_width: width of the written preview, larger frames are
+                downscaled first; None keeps the full resolution
+            max_pending: frames waiting for the writer thread before old ones are dropped
+        """
+        if image_format is not None and image_format not in ENCODE_PARAMS:
+            raise ValueError(f"Unknown image format '{image_format}', expected one of {list(ENCODE_PARAMS)}")
+        self.every_n = max(1, every_n)
+        self.quality = quality
+        self.image_format = image_format
+        self.preview_width = preview_width
+        self.max_pending = max_pending
+
+        self.counters = {}
+        self.pending = deque()
+        self.busy = False
+        self.stats = {"submitted": 0, "skipped": 0, "dropped": 0, "written": 0, "failed": 0, "render_seconds": 0.0}
+
+        self.condition = threading.Condition()
+        self.stopping = False
+        self.worker = threading.Thread(target=self._run, name="annotation-writer", daemon=True)
+        self.worker.start()
+
+    def output_path(self, output_path):
+        """the file actually written for output_path"""
+        return self.output_target(output_path)[0]
+
+    def output_target(self, output_path):
+        """returns (file path, format) a frame requested at output_path is written as"""
+        root, extension = os.path.splitext(output_path)
+        if self.image_format is not None:
+            return root + '.' + self.image_format, self.image_format
+        extension = extension[1:].lower()
+        if not extension:
+            return output_path + '.' + DEFAULT_FORMAT, DEFAULT_FORMAT
+        return output_path, FORMAT_ALIASES.get(extension, extension)
+
+    def submit(self, frame, polygons, occupied, confidences, output_path, key=None):
+        """
+        Queue one annotated frame, returns immediately.
+
+        Args:
+            frame: BGR frame
+            polygons: (N, 4, 2) spot corners in frame pixels
+            occupied: (N,) bool, True for occupied spots
+            confidences: (N,) confidence of each status
+            output_path: target file, its extension is replaced by image_format when one was set
+            key: rate-limiting key, e.g. the camera id
+
+        returns True if the frame was queued, False if skipped by the rate
+        """
+        with self.condition:
+            self.stats["submitted"] += 1
+            count = self.counters.get(key, 0)
+            self.counters[key] = count + 1
+            if count % self.every_n:
+                self.stats["skipped"] += 1
+                return False
+
+            if len(self.pending) >= self.max_pending:
+                self.pending.popleft()
+                self.stats["dropped"] += 1
+            self.pending.append((frame, polygons, occupied, confidences, *self.output_target(output_path)))
+            # flush() may be waiting on the same condition, wake everyone
+            self.condition.notify_all()
+        return True
+
+    def render(self, frame, polygons, occupied, confidences):
+        """
+        returns the downscaled preview with the spot overlays drawn on it
+        """
+        polygons = np.asarray(polygons, dtype=np.float32)
+        height, width = frame.shape[:2]
+        if self.preview_width and width > self.preview_width:
+            scale = self.preview_width / width
+            preview = cv2.resize(frame, (self.preview_width, round(height * scale)), interpolation=cv2.INTER_AREA)
+            polygons = polygons * scale
+        else:
+            preview = frame.copy()
+
+        pts = polygons.round().astype(np.int32)
+        occupied = np.asarray(occupied, dtype=bool)
+        # one polylines call per colour instead of one per spot
+        for mask, color in ((~occupied, EMPTY_COLOR), (occupied, OCCUPIED_COLOR)):
+            if mask.any():
+                cv2.polylines(preview, list(pts[mask]), True, color, 2)
+        for (x, y), is_occupied, confidence in zip(pts[:, 0], occupied, confidences):
+            cv2.putText(preview, f"conf: {confidence:.2f}", (int(x), int(y) - 10), cv2.FONT_HERSHEY_SIMPLEX,
+                        0.5, OCCUPIED_COLOR if is_occupied else EMPTY_COLOR, 2)
+        return preview
+
+    def _write(self, item):
+        frame, polygons, occupied, confidences, output_path, image_format = item
+        start = time.perf_counter()
+        preview = self.render(frame, polygons, occupied, confidences)
+        # other extensions cv2 can encode (bmp, tiff, ...) use the encoder defaults
+        params = ENCODE_PARAMS[image_format](self.quality) if image_format in ENCODE_PARAMS else []
+        ok, encoded = cv2.imencode('.' + image_format, preview, params)
+        if not ok:
+            raise RuntimeError(f"cv2.imencode failed for {output_path}")
+
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        tmp_path = output_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(encoded.tobytes())
+        os.replace(tmp_path, output_path)
+        return time.perf_counter() - start
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.stopping:
+                    self.condition.wait()
+                if not self.pending:
+                    return
+                item = self.pending.popleft()
+                self.busy = True
+
+            try:
+                elapsed = self._write(item)
+                with self.condition:
+                    self.stats["written"] += 1
+                    self.stats["render_seconds"] += elapsed
+            except (OSError, RuntimeError, cv2.error) as e:
+                print(f"Failed to write annotated frame {item[4]}: {e}")
+                with self.condition:
+                    self.stats["failed"] += 1
+            finally:
+                with self.condition:
+                    self.busy = False
+                    self.condition.notify_all()
+
+    def flush(self, timeout=None):
+        """
+        wait until every queued frame is written, returns False on timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            while self.pending or self.busy:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.condition.wait(remaining)
+        return True
+
+    def close(self, timeout=10.0):
+        """
+        write the queued frames (up to timeout seconds), then stop the thread
+        """
+        self.flush(timeout)
+        with self.condition:
+            self.stopping = True
+            self.condition.notify_all()
+        self.worker.join(timeout)
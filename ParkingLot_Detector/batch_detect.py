@@ -3,7 +3,7 @@ import os
 import glob
 import json
 from detector import ParkingDetector
-from utils.cloud_utils import CloudUploader
+from utils.upload_queue import UploadQueue
 
 def batch_detect(args):
     """
@@ -19,7 +19,9 @@ def batch_detect(args):
 
     args.api_url = "https://smartparkingapp-1d951-default-rtdb.europe-west1.firebasedatabase.app/"
 
-    uploader = CloudUploader(api_url=args.api_url, lot_id=args.lot_id)
+    # uploads run in a background worker so a slow network never stalls detection
+    upload_queue = UploadQueue(api_url=args.api_url,
+                               spool_path=os.path.join(args.output_dir, "upload_spool.json"))
     
     os.makedirs(args.output_dir, exist_ok=True)
 
@@ -37,16 +39,16 @@ def batch_detect(args):
         output_path = os.path.join(args.output_dir, f"result_{os.path.basename(image_path)}")
         results = detector.detect_image(image_path, output_path)
 
-        occupied_count = sum(1 for spot in results.values() if spot["status"] == "occupied")
-        empty_count = sum(1 for spot in results.values() if spot["status"] == "empty")
+        # only spots whose status changed are sent, in one PATCH with the counts
+        if upload_queue.submit(args.lot_id, results):
+            print(f" {os.path.basename(image_path)} queued for upload")
 
-        success = uploader.upload_parking_status(occupied_count, empty_count)
-        if success:
-            print(f" {os.path.basename(image_path)} upload successful")
+    # annotated results are written by a background thread
+    detector.close()
 
-            uploader.upload_spaces_status(results)
-        else:
-            print(f" Failed to upload {os.path.basename(image_path)}")
+    print(f"Waiting for {upload_queue.pending_count()} pending upload(s)...")
+    upload_queue.close()
+    print(f"Upload stats: {upload_queue.stats}")
 
     # In the future, if you also need to process license plate recognition, call the process_plate method of plate_recognise.py here
     # plate_number, confidence = recognizer.recognize_plate_number(image_path)
@@ -5,7 +5,7 @@ import glob
 import json
 import time
 from detector import ParkingDetector
-from utils.cloud_utils import CloudUploader
+from utils.upload_queue import UploadQueue
 
 def batch_detect_with_interval(args):
     """
@@ -20,7 +20,9 @@ def batch_detect_with_interval(args):
 
     args.api_url = "https://smartparkingapp-1d951-default-rtdb.europe-west1.firebasedatabase.app/"
 
-    uploader = CloudUploader(api_url=args.api_url, lot_id=args.lot_id)
+    # uploads run in a background worker so a slow network never stalls detection
+    upload_queue = UploadQueue(api_url=args.api_url,
+                               spool_path=os.path.join(args.output_dir, "upload_spool.json"))
     
     os.makedirs(args.output_dir, exist_ok=True)
 
@@ -38,26 +40,28 @@ def batch_detect_with_interval(args):
     print(f"Starting batch detection, {len(image_files)} images,interval = {args.interval} seconds\n")
 
     for idx, image_path in enumerate(image_files):
+        started_at = time.monotonic()
         print(f"[{idx+1}/{len(image_files)}] Processing: {os.path.basename(image_path)}")
         output_path = os.path.join(args.output_dir, f"result_{os.path.basename(image_path)}")
         results = detector.detect_image(image_path, output_path)
 
 
-        occupied_count = sum(1 for spot in results.values() if spot["status"] == "occupied")
-        empty_count = sum(1 for spot in results.values() if spot["status"] == "empty")
-
-        success = uploader.upload_parking_status(occupied_count, empty_count)
-        if success:
-            uploader.upload_spaces_status(results)
-            print(f" {os.path.basename(image_path)} status successfully updated")
-        else:
-            print(f" Failed to upload {os.path.basename(image_path)} status")
+        # only spots whose status changed are sent, in one PATCH with the counts
+        if upload_queue.submit(args.lot_id, results):
+            print(f" {os.path.basename(image_path)} status queued for upload")
 
         if idx != len(image_files) - 1:
-            print(f"Waiting {args.interval} seconds...\n")
-            time.sleep(args.interval)
+            # keep a fixed cadence: only wait for what is left of the interval
+            remaining = args.interval - (time.monotonic() - started_at)
+            if remaining > 0:
+                print(f"Waiting {remaining:.1f} seconds...\n")
+                time.sleep(remaining)
 
     print("All images has been processed!")
+    # annotated results are written by a background thread
+    detector.close()
+    upload_queue.close()
+    print(f"Upload stats: {upload_queue.stats}")
 
     # In the future, if the user need to process license plate recognition, call the process_plate method of plate_recognise.py here
     # plate_number, confidence = recognizer.recognize_plate_number(image_path)
@@ -0,0 +1,68 @@
+# benchmark_data.py
+import argparse
+import time
+
+import torch
+
+from data_processing.augment import BatchAugment
+from data_processing.dataset import ParkingDataset, get_data_loaders
+
+
+def benchmark_loader(loader, epochs, device, augment=None):
+    """
+    iterate the loader and bring every batch to the normalized float form train_model uses,
+    through the batched augmentation when one is given
+    returns images per second of the fastest epoch (the first also pays worker start-up)
+    """
+    rates = []
+    for _ in range(epochs):
+        count = 0
+        start = time.perf_counter()
+        for inputs, labels in loader:
+            inputs = inputs.to(device, non_blocking=True)
+            if augment is not None:
+                inputs = augment(inputs)
+            elif inputs.dtype == torch.uint8:
+                inputs = ParkingDataset.preprocess_batch(inputs, size=inputs.shape[1])
+            count += len(labels)
+        if device.type == 'cuda':
+            torch.cuda.synchronize()
+        rates.append(count / (time.perf_counter() - start))
+    return max(rates), rates[0]
+
+
+def run_benchmark(args):
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    modes = [("jpeg", args.data_dir)]
+    if args.packed_dir:
+        modes.append(("packed", args.packed_dir))
+
+    print(f"Batch size {args.batch_size}, device {device}")
+    for name, data_dir in modes:
+        for num_workers in args.num_workers:
+            train_loader, val_loader, _ = get_data_loaders(data_dir, batch_size=args.batch_size,
+                                                           num_workers=num_workers)
+            device_train_loader, _, _ = get_data_loaders(data_dir, batch_size=args.batch_size,
+                                                         num_workers=num_workers, device_augment=True)
+            if train_loader is None:
+                return
+            # per-sample augmentation in the workers, batched augmentation on the
+            # device, and val without augmentation to isolate decode and collation
+            settings = (("train, per-sample augment", train_loader, None),
+                        ("train, device augment", device_train_loader, BatchAugment()),
+                        ("val, no augment", val_loader, None))
+            for label, loader, augment in settings:
+                best, first = benchmark_loader(loader, args.epochs, device, augment)
+                print(f"{name:>7} {label:>26}, {num_workers} workers: {best:9.1f} images/s "
+                      f"(first epoch {first:9.1f})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data_dir', required=True, help="Dataset folder with empty/occupied subfolders")
+    parser.add_argument('--packed_dir', default=None, help="Output of pack_dataset.py for the same dataset")
+    parser.add_argument('--batch_size', type=int, default=64, help="Batch size")
+    parser.add_argument('--num_workers', type=int, nargs='+', default=[0, 4], help="Worker counts to compare")
+    parser.add_argument('--epochs', type=int, default=3, help="Epochs per setting")
+    args = parser.parse_args()
+
+    run_benchmark(args)
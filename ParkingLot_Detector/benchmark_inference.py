@@ -0,0 +1,180 @@
+# benchmark_inference.py
+import argparse
+import glob
+import os
+import time
+
+import cv2
+import numpy as np
+import torch
+import torchvision.transforms as transforms
+from PIL import Image
+
+from detector import BACKBONES, ParkingDetector
+from data_processing.dataset import ParkingDataset, IMAGENET_MEAN, IMAGENET_STD
+
+
+def benchmark_detect(detector, image_path, repeats):
+    """
+    time the full detect_image path (decode, warp, preprocess, classify)
+    returns (spots per second, seconds per frame)
+    """
+    results = detector.detect_image(image_path)  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        results = detector.detect_image(image_path)
+    elapsed = time.perf_counter() - start
+    return len(results) * repeats / elapsed, elapsed / repeats
+
+
+def benchmark_classify(detector, num_spots, repeats):
+    """
+    time classify_spots alone on random crops, isolating the model cost
+    returns spots per second
+    """
+    crops = np.random.randint(0, 256, (num_spots, 224, 224, 3), dtype=np.uint8)
+    detector.classify_spots(crops)  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        detector.classify_spots(crops)
+    elapsed = time.perf_counter() - start
+    return num_spots * repeats / elapsed
+
+
+def legacy_preprocess(crop):
+    """
+    the original per-crop path: resize to 150, back to 224, PIL round-trip
+    and a freshly built transforms.Compose
+    """
+    image = cv2.resize(crop, (150, 150))
+    image = cv2.resize(image, (224, 224))
+    image = Image.fromarray(image.astype('uint8'))
+    transform = transforms.Compose([
+        transforms.ToTensor(),
+        transforms.Normalize(mean=IMAGENET_MEAN, std=IMAGENET_STD)
+    ])
+    return transform(image)
+
+
+def benchmark_preprocess(num_spots, repeats, intermediate_size=150):
+    """
+    compare the legacy per-crop preprocessing with ParkingDataset.preprocess_batch
+    returns (legacy spots/s, batched spots/s, max absolute difference)
+    """
+    crops = np.random.randint(0, 256, (num_spots, 224, 224, 3), dtype=np.uint8)
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        legacy = torch.stack([legacy_preprocess(crop) for crop in crops])
+    legacy_rate = num_spots * repeats / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        batched = ParkingDataset.preprocess_batch(crops, intermediate_size=intermediate_size)
+    batched_rate = num_spots * repeats / (time.perf_counter() - start)
+
+    return legacy_rate, batched_rate, (legacy - batched).abs().max().item()
+
+
+def benchmark_sequence(detector, image_paths):
+    """
+    run detect_image over an ordered image sequence
+    returns (seconds per frame, status flips across all spots, tracker or None)
+    """
+    previous = {}
+    flips = 0
+    start = time.perf_counter()
+    for image_path in image_paths:
+        results = detector.detect_image(image_path)
+        for spot_id, spot in results.items():
+            if spot_id in previous and previous[spot_id] != spot["status"]:
+                flips += 1
+            previous[spot_id] = spot["status"]
+    elapsed = time.perf_counter() - start
+    return elapsed / len(image_paths), flips, detector._get_tracker(detector.config_path)
+
+
+def run_sequence_benchmark(detector, args):
+    """
+    compare classifying every spot with the change gate and vote filter
+    """
+    image_paths = sorted(glob.glob(os.path.join(args.sequence_dir, '*.jpg')) +
+                         glob.glob(os.path.join(args.sequence_dir, '*.png')))
+    settings = [
+        ("every spot", None, 1),
+        (f"gated (threshold {args.change_threshold}, votes {args.vote_window})",
+         args.change_threshold, args.vote_window)
+    ]
+    for label, change_threshold, vote_window in settings:
+        detector.change_threshold = change_threshold
+        detector.vote_window = vote_window
+        detector._trackers = {}
+        frame_time, flips, tracker = benchmark_sequence(detector, image_paths)
+        line = f"{label}: {frame_time * 1000:8.1f} ms/frame, {flips} status flips"
+        if tracker is not None:
+            total = tracker.classified + tracker.skipped
+            line += f", skipped {tracker.skipped}/{total} spot inferences"
+        print(line)
+
+
+def run_benchmark(args):
+    """
+    compare per-spot (batch_size=1) against batched inference for every backend
+    """
+    backend_paths = {'eager': args.model_path, 'torchscript': args.torchscript_path,
+                     'onnx': args.onnx_path, 'int8': args.int8_path}
+
+    for backend in args.backends:
+        detector = ParkingDetector(backend_paths[backend], backend=backend, channels_last=args.channels_last,
+                                   backbone=args.backbone, input_size=args.input_size)
+        if args.config_path and not detector.load_parking_spots(args.config_path):
+            print("Failed to load parking spot config.")
+            return
+
+        print(f"Backend: {backend}, device: {detector.device}")
+
+        if args.sequence_dir:
+            run_sequence_benchmark(detector, args)
+            continue
+
+        if backend == args.backends[0]:
+            legacy_rate, batched_rate, max_diff = benchmark_preprocess(args.num_spots, args.repeats)
+            print(f"Preprocess: legacy {legacy_rate:8.1f} spots/s, batched {batched_rate:8.1f} spots/s, "
+                  f"max diff {max_diff:.4f}")
+
+        for batch_size in args.batch_sizes:
+            detector.batch_size = batch_size
+            label = "per-spot" if batch_size == 1 else f"batched ({batch_size})"
+
+            if args.image_path:
+                spots_per_sec, frame_time = benchmark_detect(detector, args.image_path, args.repeats)
+                print(f"{label:>15}: detect_image {spots_per_sec:8.1f} spots/s, {frame_time * 1000:8.1f} ms/frame")
+
+            spots_per_sec = benchmark_classify(detector, args.num_spots, args.repeats)
+            print(f"{label:>15}: classify_spots {spots_per_sec:8.1f} spots/s, "
+                  f"{1000 * batch_size / spots_per_sec:8.2f} ms/batch")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model_path', default=None, help="Path to trained model")
+    parser.add_argument('--torchscript_path', default=None, help="TorchScript model from export_model.py")
+    parser.add_argument('--onnx_path', default=None, help="ONNX model from export_model.py")
+    parser.add_argument('--int8_path', default=None, help="Quantized model from quantize_model.py")
+    parser.add_argument('--backends', nargs='+', default=['eager'], choices=['eager', 'torchscript', 'onnx', 'int8'],
+                        help="Inference backends to compare")
+    parser.add_argument('--backbone', default='resnet18', choices=list(BACKBONES), help="Backbone of the checkpoint")
+    parser.add_argument('--input_size', type=int, default=None, help="Model input size, defaults to the backbone's")
+    parser.add_argument('--channels_last', action='store_true', help="Run eager/torchscript models on NHWC batches")
+    parser.add_argument('--config_path', default=None, help="Path to parking spots config JSON")
+    parser.add_argument('--image_path', default=None, help="Image used for the end-to-end benchmark")
+    parser.add_argument('--num_spots', type=int, default=200, help="Number of synthetic crops per frame")
+    parser.add_argument('--batch_sizes', type=int, nargs='+', default=[1, 16, 64, 200], help="Batch sizes to compare")
+    parser.add_argument('--sequence_dir', default=None,
+                        help="Folder of consecutive frames, benchmarks the change gate instead")
+    parser.add_argument('--change_threshold', type=float, default=4.0, help="Change gate threshold (0-255)")
+    parser.add_argument('--vote_window', type=int, default=3, help="Readings needed before a status flips")
+    parser.add_argument('--repeats', type=int, default=5, help="Timed repetitions per setting")
+    args = parser.parse_args()
+
+    run_benchmark(args)
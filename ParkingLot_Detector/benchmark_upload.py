@@ -0,0 +1,175 @@
+# benchmark_upload.py
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from utils.cloud_utils import CloudUploader
+from utils.upload_queue import UploadQueue
+
+
+class FirebaseStandIn(ThreadingHTTPServer):
+    """
+    Minimal local stand-in for the Firebase Realtime Database REST API.
+    Applies PUT/PATCH to an in-memory tree and counts requests, bytes and connections.
+    """
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0):
+        super().__init__(address, StandInHandler)
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.tree = {}
+        self.requests = 0
+        self.bytes = 0
+        self.connections = 0
+
+    def write(self, path, value):
+        keys = [key for key in path.split('/') if key]
+        node = self.tree
+        for key in keys[:-1]:
+            node = node.setdefault(key, {})
+        node[keys[-1]] = value
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # headers and body go out in separate writes; without this keep-alive
+    # connections stall on delayed ACKs and skew the timings
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        with self.server.lock:
+            self.server.requests += 1
+            self.server.bytes += length + sum(len(k) + len(v) + 4 for k, v in self.headers.items())
+        return json.loads(body or b'null')
+
+    def _reply(self, value):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        payload = json.dumps(value).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_PUT(self):
+        value = self._read_body()
+        with self.server.lock:
+            self.server.write(self.path[:-len('.json')], value)
+        self._reply(value)
+
+    def do_PATCH(self):
+        value = self._read_body()
+        base = self.path[:-len('.json')]
+        with self.server.lock:
+            for path, child in value.items():
+                self.server.write(f"{base}/{path}", child)
+        self._reply(value)
+
+
+def simulate_frames(num_spots, num_frames, change_rate, seed=0):
+    """
+    yield detect_image-style results where roughly change_rate of spots flip per frame
+    """
+    rng = random.Random(seed)
+    statuses = {str(i): rng.choice(["empty", "occupied"]) for i in range(num_spots)}
+    for _ in range(num_frames):
+        for spot_id in statuses:
+            if rng.random() < change_rate:
+                statuses[spot_id] = "empty" if statuses[spot_id] == "occupied" else "occupied"
+        yield {spot_id: {"status": status, "confidence": 0.9} for spot_id, status in statuses.items()}
+
+
+def run_queued(server, api_url, args):
+    """
+    submit through UploadQueue; only the time spent inside submit() blocks detection
+    """
+    server.reset()
+    upload_queue = UploadQueue(api_url)
+    blocked = 0.0
+    for results in simulate_frames(args.num_spots, args.num_frames, args.change_rate):
+        start = time.perf_counter()
+        upload_queue.submit(args.lot_id, results)
+        blocked += time.perf_counter() - start
+        # stand-in for inference time between frames
+        time.sleep(args.frame_gap_ms / 1000.0)
+    upload_queue.close()
+
+    spaces = server.tree["parking-lots"][args.lot_id]["spaces"]
+    return blocked, {spot_id: node["status"] for spot_id, node in spaces.items()}
+
+
+def run_strategy(server, api_url, strategy, args):
+    server.reset()
+    if strategy == "queued":
+        return run_queued(server, api_url, args)
+    if strategy == "legacy":
+        # the module-level functions open a fresh connection per call, as before
+        uploader = CloudUploader(api_url, args.lot_id, session=requests)
+    else:
+        uploader = CloudUploader(api_url, args.lot_id)
+
+    start = time.perf_counter()
+    for results in simulate_frames(args.num_spots, args.num_frames, args.change_rate):
+        if strategy == "diff":
+            uploader.publish_changes(results)
+        else:
+            occupied = sum(1 for spot in results.values() if spot["status"] == "occupied")
+            uploader.upload_parking_status(occupied, len(results) - occupied)
+            uploader.upload_spaces_status(results)
+    elapsed = time.perf_counter() - start
+
+    spaces = server.tree["parking-lots"][args.lot_id]["spaces"]
+    return elapsed, {spot_id: node["status"] for spot_id, node in spaces.items()}
+
+
+def run_benchmark(args):
+    server = FirebaseStandIn(('127.0.0.1', 0), latency=args.latency_ms / 1000.0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    api_url = f"http://127.0.0.1:{server.server_address[1]}/"
+
+    print(f"{args.num_frames} frames x {args.num_spots} spots, change rate {args.change_rate:.0%}, "
+          f"latency {args.latency_ms} ms")
+
+    final_states = {}
+    for strategy in ("legacy", "session", "diff", "queued"):
+        elapsed, final_states[strategy] = run_strategy(server, api_url, strategy, args)
+        print(f"{strategy:>8}: {server.requests:6d} requests, {server.bytes / 1024:9.1f} KiB, "
+              f"{server.connections:5d} connections, {elapsed:7.2f} s blocking the detection loop")
+
+    same = all(state == final_states["legacy"] for state in final_states.values())
+    print(f"Final spaces state identical: {same}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--num_spots', type=int, default=200, help="Spots per frame")
+    parser.add_argument('--num_frames', type=int, default=20, help="Frames to upload")
+    parser.add_argument('--change_rate', type=float, default=0.02, help="Fraction of spots flipping per frame")
+    parser.add_argument('--latency_ms', type=float, default=0.0, help="Simulated server latency per request")
+    parser.add_argument('--frame_gap_ms', type=float, default=0.0,
+                        help="Simulated inference time between frames for the queued strategy")
+    parser.add_argument('--lot_id', default="lot-c", help="Lot id used in the paths")
+    args = parser.parse_args()
+
+    run_benchmark(args)
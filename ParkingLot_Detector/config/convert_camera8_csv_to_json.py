@@ -1,30 +1,15 @@
-import pandas as pd
-import json
+import os
+import sys
 
-# 读取csv
-csv_file = "camera8.csv"
-df = pd.read_csv(csv_file)
+# 从 config 目录运行时也能导入 utils
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# 定义缩放比例
-scale_x = 0.3858
-scale_y = 0.3858
+from utils.csv_utils import convert_camera_csv_to_config
 
-# 构建字典
-spots = {}
+config_dir = os.path.dirname(os.path.abspath(__file__))
 
-for idx, row in df.iterrows():
-    slot_id = str(int(row['SlotId']))  # ← ← ← ← 注意是 SlotId
-    x, y, w, h = row['X'], row['Y'], row['W'], row['H']
-
-    spots[slot_id] = [
-        [int(x * scale_x), int(y * scale_y)],
-        [int((x + w) * scale_x), int(y * scale_y)],
-        [int((x + w) * scale_x), int((y + h) * scale_y)],
-        [int(x * scale_x), int((y + h) * scale_y)]
-    ]
-
-# 保存为json
-with open("camera8_spots.json", "w") as f:
-    json.dump(spots, f, indent=4)
+# 缩放比例由 CSV 的原始分辨率 (2592x1944) 和检测帧的分辨率 (1000x750) 计算，输出标准格式
+spots = convert_camera_csv_to_config(os.path.join(config_dir, "camera_data_csv", "camera8.csv"),
+                                     os.path.join(config_dir, "camera8_spots.json"))
 
 print(f"✅ Successfully converted {len(spots)} parking spots to camera8_spots.json with scaling and 4-point conversion!")
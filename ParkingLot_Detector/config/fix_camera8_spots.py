@@ -1,19 +1,29 @@
-import json
+import argparse
+import os
+import sys
 
-# 读取旧版camera8_spots.json
-with open("C:/Users/yushi/SmartParkingFinalProject/ParkingLot_Detector/config/camera8_spots.json", "r") as f:
-    old_data = json.load(f)
+# 从 config 目录运行时也能导入 utils
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# 转换格式
-new_data = []
-for spot_id, coords in old_data.items():
-    new_data.append({
-        "id": str(spot_id),
-        "coords": coords
-    })
+from utils.spot_config import load_spot_table
 
-# 保存新文件
-with open("C:/Users/yushi/SmartParkingFinalProject/ParkingLot_Detector/config/camera8_spots_fixed.json", "w") as f:
-    json.dump(new_data, f, indent=4)
 
-print("✅ camera8_spots.json 转换完成，输出到 camera8_spots_fixed.json！")
+def fix_spots(input_path, output_path, csv_scale=1.0):
+    """
+    将任意格式的车位配置（旧的 {id: coords}、annotate.py 的 {id: {"points"}}、
+    CSV 或标准格式）统一保存为 ParkingDetector 使用的 [{"id", "coords"}] 格式
+    """
+    spots = load_spot_table(input_path, csv_scale=csv_scale)
+    spots.save(output_path)
+    print(f"{input_path} 转换完成：{len(spots)} 个车位，输出到 {output_path}")
+    return spots
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--input_path', default="config/camera8_spots.json", help="任意格式的车位配置")
+    parser.add_argument('--output_path', default="config/camera8_spots_fixed.json", help="标准格式的输出文件")
+    parser.add_argument('--csv_scale', type=float, default=1.0, help="CSV 输入的坐标缩放比例")
+    args = parser.parse_args()
+
+    fix_spots(args.input_path, args.output_path, args.csv_scale)
@@ -3,20 +3,91 @@
 import argparse
 import cv2
 import os
-import json
+
+from ground_truth import GroundTruth, load_ground_truth
+from utils.spot_config import load_spot_table
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+# BGR colours of empty / occupied / unknown spots
+COLORS = {'empty': (0, 255, 0), 'occupied': (0, 0, 255), 'unknown': (160, 160, 160)}
+
+
+def load_spots(config_path):
+    spots = load_spot_table(config_path)
+    return list(zip(spots.ids, spots.int_coords()))
+
+
+def label_frame(image, spots, statuses):
+    """
+    Step through the spots of one frame; the current spot is outlined in yellow.
+
+    SPACE = occupied, 'e' = empty, 'n' = unknown, ENTER = keep the current label,
+    'b' = back one spot, 'q' = quit
+
+    returns the labelled statuses, or None when labelling was aborted
+    """
+    index = 0
+    while index < len(spots):
+        canvas = image.copy()
+        for spot_id, pts in spots:
+            cv2.polylines(canvas, [pts], True, COLORS[statuses.get(spot_id, 'unknown')], 2)
+        spot_id, pts = spots[index]
+        cv2.polylines(canvas, [pts], True, (0, 255, 255), 4)
+        x, y = pts[0]
+        cv2.putText(canvas, f"{spot_id} ({index + 1}/{len(spots)})", (int(x), int(y) - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+
+        cv2.imshow('Label Spots', canvas)
+        key = cv2.waitKey(0) & 0xFF
+        if key == ord(' '):
+            statuses[spot_id] = 'occupied'
+        elif key == ord('e'):
+            statuses[spot_id] = 'empty'
+        elif key == ord('n'):
+            statuses[spot_id] = 'unknown'
+        elif key == ord('b'):
+            index = max(0, index - 1)
+            continue
+        elif key == ord('q'):
+            return None
+        elif key not in (13, 10):
+            continue
+        index += 1
+    return statuses
+
 
 def create_ground_truth(args):
     """
-    Manually label parking space status by viewing each image one-by-one.
+    Manually label the occupancy of every parking spot in a sequence of frames.
+
+    Labels are stored in one compact file per camera (see ground_truth.py),
+    saved after every frame; frames already in the file are skipped, so
+    labelling can be resumed.
     """
+    spots = load_spots(args.config_path)
 
-    images = [img for img in os.listdir(args.image_dir) if img.lower().endswith(('.jpg', '.jpeg', '.png'))]
-    print(f"Found {len(images)} images for labeling")
+    if os.path.exists(args.output_path):
+        ground_truth = load_ground_truth(args.output_path)
+        if ground_truth.spot_ids != [spot_id for spot_id, _ in spots]:
+            print(f"Spot ids in {args.output_path} do not match {args.config_path}")
+            return
+    else:
+        ground_truth = GroundTruth([spot_id for spot_id, _ in spots], camera_id=args.camera_id,
+                                   config_path=args.config_path, image_dir=args.image_dir)
 
-    if not os.path.exists(args.output_dir):
-        os.makedirs(args.output_dir)
+    detector = None
+    if args.model_path:
+        # model predictions are the starting labels, so mostly only mistakes need a key press
+        from detector import ParkingDetector
+        detector = ParkingDetector(args.model_path)
+        detector.load_parking_spots(args.config_path)
 
-    for img_name in images:
+    images = sorted(img for img in os.listdir(args.image_dir) if img.lower().endswith(IMAGE_EXTENSIONS))
+    todo = [img for img in images if img not in ground_truth.frames]
+    print(f"Found {len(images)} images, {len(todo)} left to label")
+    print("Press SPACE = Occupied, 'e' = Empty, 'n' = Unknown, ENTER = Keep, 'b' = Back, 'q' = Quit")
+
+    for img_name in todo:
         img_path = os.path.join(args.image_dir, img_name)
         img = cv2.imread(img_path)
 
@@ -25,39 +96,56 @@ def create_ground_truth(args):
             continue
 
         print(f" Current image: {img_name}")
-        print("Press SPACE = Occupied, 'e' = Empty, 'n' = Skip")
-
-        status = None
-        while True:
-            cv2.imshow('Label Image', img)
-            key = cv2.waitKey(0) & 0xFF
-            if key == ord(' '):
-                status = 'occupied'
-                break
-            elif key == ord('e'):
-                status = 'empty'
-                break
-            elif key == ord('n'):
-                status = 'unknown'
-                break
-
-        cv2.destroyAllWindows()
-
-        label_data = {
-            "image": img_name,
-            "status": status
-        }
-
-        output_path = os.path.join(args.output_dir, img_name.replace('.jpg', '.json'))
-        with open(output_path, 'w') as f:
-            json.dump(label_data, f, indent=4)
-
-        print(f"Saved label: {output_path}")
+        statuses = {}
+        if detector is not None:
+            # detect_frame draws onto the frame, keep the original clean
+            results = detector.detect_frame(img)
+            statuses = {spot_id: spot["status"] for spot_id, spot in results.items()}
+        statuses = label_frame(img, spots, statuses)
+        if statuses is None:
+            break
+
+        ground_truth.set_frame(img_name, statuses)
+        ground_truth.save(args.output_path)
+        print(f"Saved labels of {img_name}: {args.output_path}")
+
+    cv2.destroyAllWindows()
+
+
+def convert_ground_truth(args):
+    """
+    Convert an older {image: {spot_id: status}} file to the compact format,
+    using the spot order of config_path.
+    """
+    spot_ids = [spot_id for spot_id, _ in load_spots(args.config_path)]
+    ground_truth = load_ground_truth(args.convert, camera_id=args.camera_id,
+                                     config_path=args.config_path, image_dir=args.image_dir)
+    converted = GroundTruth(spot_ids, camera_id=ground_truth.camera_id, config_path=args.config_path,
+                            image_dir=ground_truth.image_dir)
+    for index, frame in enumerate(ground_truth.frames):
+        converted.set_frame(frame, ground_truth.frame_statuses(index))
+
+    dropped = set(ground_truth.spot_ids) - set(spot_ids)
+    if dropped:
+        print(f"Warning: {len(dropped)} labelled spots are not in {args.config_path}: {sorted(dropped)}")
+    converted.save(args.output_path)
+    print(f"Converted {len(converted.frames)} frames to {args.output_path}")
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument('--image_dir', required=True, help="Folder with images to labe")
-    parser.add_argument('--output_dir', required=True, help="Folder to save label JSON files")
+    parser.add_argument('--image_dir', default=None, help="Folder with the frames to label")
+    parser.add_argument('--config_path', required=True, help="Spot config of the camera")
+    parser.add_argument('--output_path', required=True, help="Ground truth JSON of the camera")
+    parser.add_argument('--camera_id', default=None, help="Camera name stored in the file")
+    parser.add_argument('--model_path', default=None, help="Optional model whose predictions pre-fill the labels")
+    parser.add_argument('--convert', default=None,
+                        help="Convert this {image: {spot: status}} file instead of labelling")
     args = parser.parse_args()
 
-    create_ground_truth(args)
+    if args.convert:
+        convert_ground_truth(args)
+    elif not args.image_dir:
+        parser.error("--image_dir is required for labelling")
+    else:
+        create_ground_truth(args)
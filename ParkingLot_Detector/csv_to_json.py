@@ -1,20 +1,48 @@
 # csv_to_json.py
 
 import argparse
-from utils.csv_utils import csv_to_parking_spots_json
+import os
+import time
+
+from utils.csv_utils import SOURCE_RESOLUTION, TARGET_RESOLUTION, convert_csv_files, image_resolution
 
 def convert(args):
     """
-    Convert a CSV file of parking spot coordinates into JSON format.
-    
+    Convert CSV files of parking spot rectangles into the spot config JSON format.
+
+    Coordinates are scaled from the resolution the CSV was annotated at to
+    the resolution frames are detected at.
     """
-    csv_to_parking_spots_json(args.csv_path, args.output_path)
-    print(f" Generated {args.output_path}")
+    target_size = image_resolution(args.target_image) if args.target_image else tuple(args.target_size)
+
+    start = time.perf_counter()
+    tables = convert_csv_files(args.csv_paths, tuple(args.source_size), target_size)
+    for csv_path, spots in zip(args.csv_paths, tables):
+        if args.output_path:
+            output_path = args.output_path
+        else:
+            name = os.path.splitext(os.path.basename(csv_path))[0]
+            output_path = os.path.join(args.output_dir, f"{name}_spots.json")
+        spots.save(output_path)
+        print(f" Generated {output_path} ({len(spots)} spots)")
+
+    total = sum(len(spots) for spots in tables)
+    print(f" Converted {total} spots from {len(tables)} CSV files at {args.source_size[0]}x{args.source_size[1]} -> "
+          f"{target_size[0]}x{target_size[1]} in {time.perf_counter() - start:.2f}s")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument('--csv_path', required=True, help="Input CSV file path")
-    parser.add_argument('--output_path', required=True, help="Output JSON file path")
+    parser.add_argument('--csv_paths', nargs='+', required=True, help="Input CSV files (SlotId,X,Y,W,H)")
+    parser.add_argument('--output_path', default=None, help="Output JSON file, for a single CSV")
+    parser.add_argument('--output_dir', default="config", help="Output folder for <name>_spots.json files")
+    parser.add_argument('--source_size', type=int, nargs=2, default=list(SOURCE_RESOLUTION),
+                        metavar=('WIDTH', 'HEIGHT'), help="Resolution the CSV coordinates refer to")
+    parser.add_argument('--target_size', type=int, nargs=2, default=list(TARGET_RESOLUTION),
+                        metavar=('WIDTH', 'HEIGHT'), help="Resolution of the frames used for detection")
+    parser.add_argument('--target_image', default=None, help="Frame whose resolution overrides --target_size")
     args = parser.parse_args()
 
+    if args.output_path and len(args.csv_paths) > 1:
+        parser.error("--output_path takes a single CSV, use --output_dir for several")
+
     convert(args)
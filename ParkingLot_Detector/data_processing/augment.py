@@ -0,0 +1,101 @@
+import math
+
+import torch
+import torch.nn.functional as F
+
+from data_processing.dataset import IMAGENET_MEAN, IMAGENET_STD
+
+
+class BatchAugment:
+    """
+    批量数据增强：在训练设备上对整批 uint8 图像一次完成
+    水平翻转、小角度旋转、亮度/对比度抖动和归一化
+
+    与 train_transform 中逐张 PIL 增强的参数一致（翻转概率 0.5、旋转 ±10 度、
+    亮度和对比度 ±0.2），每张图像的随机参数独立采样
+    """
+
+    def __init__(self, flip_prob=0.5, max_rotation=10.0, brightness=0.2, contrast=0.2,
+                 mean=IMAGENET_MEAN, std=IMAGENET_STD, generator=None):
+        """
+        Args:
+            flip_prob: 水平翻转概率
+            max_rotation: 最大旋转角度（度），0 表示不旋转
+            brightness: 亮度系数在 [1 - brightness, 1 + brightness] 中均匀采样
+            contrast: 对比度系数在 [1 - contrast, 1 + contrast] 中均匀采样
+            mean, std: 归一化参数
+            generator: 可选的 torch.Generator，需与图像在同一设备上
+        """
+        self.flip_prob = flip_prob
+        self.max_rotation = max_rotation
+        self.brightness = brightness
+        self.contrast = contrast
+        self.mean = mean
+        self.std = std
+        self.generator = generator
+        # (H, W, device) -> 目标像素的齐次归一化坐标 (H * W, 3)
+        self._base_grids = {}
+
+    def _base_grid(self, height, width, device):
+        key = (height, width, device)
+        if key not in self._base_grids:
+            # 与 affine_grid(align_corners=False) 相同的像素中心坐标
+            xs = (torch.arange(width, device=device) * 2 + 1) / width - 1
+            ys = (torch.arange(height, device=device) * 2 + 1) / height - 1
+            self._base_grids[key] = torch.stack([xs.repeat(height), ys.repeat_interleave(width),
+                                                 torch.ones(height * width, device=device)], dim=1)
+        return self._base_grids[key]
+
+    def _uniform(self, n, low, high, device):
+        return torch.rand(n, device=device, generator=self.generator) * (high - low) + low
+
+    def __call__(self, images):
+        """
+        Args:
+            images: (N, H, W, 3) uint8 张量，RGB，位于训练设备上
+
+        Returns:
+            归一化后的 (N, 3, H, W) float32 张量
+        """
+        n = images.shape[0]
+        device = images.device
+        # NHWC 转为 NCHW；旋转时 grid_sample 直接读 channels_last 视图并输出连续张量，
+        # 否则先转为连续布局，后面的逐样本运算在连续布局上更快
+        batch = images.permute(0, 3, 1, 2)
+        batch = batch.float() if self.max_rotation else batch.contiguous().float()
+
+        # 翻转和旋转合并为一次仿射采样：theta = R(angle) @ diag(flip, 1)
+        flip = torch.where(self._uniform(n, 0, 1, device) < self.flip_prob, -1.0, 1.0)
+        if self.max_rotation:
+            angle = self._uniform(n, -self.max_rotation, self.max_rotation, device) * (math.pi / 180.0)
+            cos, sin = torch.cos(angle), torch.sin(angle)
+            zero = torch.zeros_like(cos)
+            theta = torch.stack([
+                torch.stack([cos * flip, -sin, zero], dim=1),
+                torch.stack([sin * flip, cos, zero], dim=1)
+            ], dim=1)
+            # 用缓存的坐标网格做一次矩阵乘法，比 affine_grid 每次重建网格快得多
+            height, width = batch.shape[-2:]
+            grid = torch.matmul(self._base_grid(height, width, device), theta.transpose(1, 2))
+            grid = grid.view(n, height, width, 2)
+            # 旋转后超出原图的区域填 0，与 RandomRotation 的默认行为一致
+            batch = F.grid_sample(batch, grid, mode='bilinear', padding_mode='zeros', align_corners=False)
+        else:
+            batch = torch.where((flip < 0).view(n, 1, 1, 1), batch.flip(3), batch)
+
+        # 除以 255 与亮度系数合并为一次逐样本乘法
+        scale = torch.full((n,), 1.0 / 255.0, device=device)
+        if self.brightness:
+            scale = scale * self._uniform(n, 1 - self.brightness, 1 + self.brightness, device)
+        batch = batch.mul_(scale.view(n, 1, 1, 1)).clamp_(0, 1)
+
+        if self.contrast:
+            # 与 ColorJitter 相同，以灰度图均值为中心缩放；灰度均值由各通道均值线性组合得到
+            weights = torch.tensor([0.299, 0.587, 0.114], device=device)
+            gray = (batch.mean(dim=(2, 3)) * weights).sum(dim=1)
+            factor = self._uniform(n, 1 - self.contrast, 1 + self.contrast, device)
+            batch = batch.mul_(factor.view(n, 1, 1, 1)).add_((gray * (1 - factor)).view(n, 1, 1, 1)).clamp_(0, 1)
+
+        std = torch.tensor(self.std, device=device)
+        mean = torch.tensor(self.mean, device=device)
+        return batch.sub_(mean.view(1, 3, 1, 1)).div_(std.view(1, 3, 1, 1))
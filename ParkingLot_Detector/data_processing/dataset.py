@@ -1,5 +1,6 @@
 import os
 import torch
+import torch.nn.functional as F
 from torch.utils.data import Dataset, DataLoader
 from PIL import Image
 import torchvision.transforms as transforms
@@ -7,12 +8,17 @@ import numpy as np
 import cv2
 
 
+# ImageNet 归一化参数（与预训练 ResNet18 一致）
+IMAGENET_MEAN = [0.485, 0.456, 0.406]
+IMAGENET_STD = [0.229, 0.224, 0.225]
+
+
 class ParkingDataset(Dataset):
     """
     停车位数据集类
     """
 
-    def __init__(self, root_dir, transform=None, split='train'):
+    def __init__(self, root_dir, transform=None, split='train', sample_list=None):
         """
         初始化数据集
 
@@ -20,6 +26,8 @@ class ParkingDataset(Dataset):
             root_dir: 数据集根目录，应包含 occupied 和 empty 两个子文件夹
             transform: 图像变换
             split: 数据集分割 ('train', 'val', 或 'test')
+            sample_list: 可选的样本列表文件（dedup_dataset.py 生成），
+                只使用其中的样本而不扫描整个目录
         """
         self.root_dir = root_dir
         self.transform = transform
@@ -28,29 +36,37 @@ class ParkingDataset(Dataset):
 
         # 收集所有图像路径和标签
         self.samples = []
-        for class_name in self.classes:
-            class_path = os.path.join(self.root_dir, class_name)
-            if os.path.exists(class_path):
-                for img_name in os.listdir(class_path):
-                    if img_name.endswith(('.jpg', '.jpeg', '.png')):
-                        img_path = os.path.join(class_path, img_name)
-                        self.samples.append((img_path, self.class_to_idx[class_name]))
+        if sample_list:
+            from data_processing.dedup import load_sample_list
+            self.samples = load_sample_list(sample_list, root_dir)
+        else:
+            for class_name in self.classes:
+                class_path = os.path.join(self.root_dir, class_name)
+                if os.path.exists(class_path):
+                    for img_name in os.listdir(class_path):
+                        if img_name.endswith(('.jpg', '.jpeg', '.png')):
+                            img_path = os.path.join(class_path, img_name)
+                            self.samples.append((img_path, self.class_to_idx[class_name]))
 
         # 如果需要分割数据集
         if split != 'all' and len(self.samples) > 0:
-            # 按照训练集:验证集:测试集 = 7:1.5:1.5的比例划分
-            np.random.seed(42)  # 固定随机种子以确保可重复性
-            indices = np.random.permutation(len(self.samples))
-            if split == 'train':
-                split_indices = indices[:int(0.7 * len(indices))]
-            elif split == 'val':
-                split_indices = indices[int(0.7 * len(indices)):int(0.85 * len(indices))]
-            elif split == 'test':
-                split_indices = indices[int(0.85 * len(indices)):]
-            else:
-                raise ValueError(f"Invalid split: {split}")
-
-            self.samples = [self.samples[i] for i in split_indices]
+            self.samples = [self.samples[i] for i in self.split_indices(len(self.samples), split)]
+
+    @staticmethod
+    def split_indices(num_samples, split):
+        """
+        按照训练集:验证集:测试集 = 7:1.5:1.5的比例划分，返回该分割的样本下标
+        """
+        np.random.seed(42)  # 固定随机种子以确保可重复性
+        indices = np.random.permutation(num_samples)
+        if split == 'train':
+            return indices[:int(0.7 * len(indices))]
+        elif split == 'val':
+            return indices[int(0.7 * len(indices)):int(0.85 * len(indices))]
+        elif split == 'test':
+            return indices[int(0.85 * len(indices)):]
+        else:
+            raise ValueError(f"Invalid split: {split}")
 
     def __len__(self):
         return len(self.samples)
@@ -74,38 +90,117 @@ class ParkingDataset(Dataset):
             image = cv2.imread(image)
             image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
 
-        # 调整大小
-        image = cv2.resize(image, (224, 224))
+        return ParkingDataset.preprocess_batch(image[np.newaxis])[0]
+
+    @staticmethod
+    def preprocess_batch(images, size=224, intermediate_size=None, memory_format=torch.contiguous_format):
+        """
+        批量预处理：uint8 图像 (N, H, W, 3) 直接转换为归一化的 float 张量 (N, 3, size, size)
+
+        Args:
+            images: uint8 的 numpy 数组或张量，RGB 通道顺序；张量可以已经在目标设备上
+            size: 模型输入大小
+            intermediate_size: 可选的中间分辨率，先缩放到该大小再缩放到 size，
+                用于与训练时的 150x150 缩放流程保持一致
+            memory_format: 输出张量的内存布局；torch.channels_last 时省去最后一次 NHWC 到 NCHW 的拷贝
+
+        Returns:
+            与输入在同一设备上的 float32 张量
+        """
+        if isinstance(images, np.ndarray):
+            images = torch.from_numpy(np.ascontiguousarray(images))
 
-        # 转换为PIL图像以便使用torchvision变换
-        image = Image.fromarray(image.astype('uint8'))
+        # NHWC 转为 NCHW 视图（即 channels_last 布局），不拷贝数据
+        batch = images.permute(0, 3, 1, 2)
+        if batch.device.type != 'cpu':
+            # uint8 双线性插值只在 CPU 上可用
+            batch = batch.float()
 
-        # 应用标准变换
-        transform = transforms.Compose([
-            transforms.ToTensor(),
-            transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
-        ])
+        if intermediate_size:
+            batch = F.interpolate(batch, size=(intermediate_size, intermediate_size),
+                                  mode='bilinear', align_corners=False)
+            if batch.is_floating_point():
+                # 旧流程的中间结果是 uint8 图像，这里同样取整
+                batch = batch.round_().clamp_(0, 255)
 
-        return transform(image)
+        if batch.shape[-2:] != (size, size):
+            # 缩小到轻量模型的输入大小时抗锯齿，与 train_model 中的缩放一致
+            batch = F.interpolate(batch, size=(size, size), mode='bilinear', align_corners=False,
+                                  antialias=size < batch.shape[-1])
 
+        # (x / 255 - mean) / std 合并为一次乘加
+        std = torch.tensor(IMAGENET_STD, device=batch.device).view(1, 3, 1, 1)
+        mean = torch.tensor(IMAGENET_MEAN, device=batch.device).view(1, 3, 1, 1)
+        batch = batch.contiguous(memory_format=memory_format).float()
+        return batch.mul_(1.0 / (255.0 * std)).sub_(mean / std)
 
-def get_data_loaders(data_dir, batch_size=32, img_size=224):
+
+def loader_options(num_workers=None, pin_memory=None, persistent_workers=True, prefetch_factor=4):
+    """
+    DataLoader 的并行参数：多个 worker、锁页内存、常驻 worker
+
+    Args:
+        num_workers: worker 进程数，默认 min(4, CPU 核心数)，0 表示在主进程中加载
+        pin_memory: 是否使用锁页内存，默认在有 CUDA 时开启
+        persistent_workers: 各 epoch 之间保留 worker 进程，避免重复启动
+        prefetch_factor: 每个 worker 预取的批次数
+    """
+    if num_workers is None:
+        num_workers = min(4, os.cpu_count() or 1)
+    if pin_memory is None:
+        pin_memory = torch.cuda.is_available()
+
+    options = {"num_workers": num_workers, "pin_memory": pin_memory}
+    if num_workers > 0:
+        options["persistent_workers"] = persistent_workers
+        options["prefetch_factor"] = prefetch_factor
+    return options
+
+
+def to_hwc_tensor(image):
+    """PIL 图像转为 (H, W, 3) uint8 张量，不做归一化"""
+    return torch.from_numpy(np.array(image, dtype=np.uint8))
+
+
+def get_data_loaders(data_dir, batch_size=32, img_size=224, num_workers=None, pin_memory=None,
+                     persistent_workers=True, device_augment=False, sample_list=None):
     """
     创建训练、验证和测试数据加载器
 
     Args:
-        data_dir: 数据集目录
+        data_dir: 数据集目录，或 pack_dataset 打包后的目录
         batch_size: 批次大小
         img_size: 输入图像大小
+        num_workers: DataLoader worker 进程数，见 loader_options
+        pin_memory: 是否使用锁页内存，见 loader_options
+        persistent_workers: 各 epoch 之间保留 worker 进程
+        device_augment: 为 True 时 DataLoader 不做逐张增强和归一化，
+            增强改由 train_model 在训练设备上用 BatchAugment 批量完成
+        sample_list: 可选的样本列表文件（dedup_dataset.py 生成），打包目录时忽略，
+            打包前把它传给 pack_dataset
 
     Returns:
-        train_loader, val_loader, test_loader
+        train_loader, val_loader, test_loader；打包目录或 device_augment 时批次是
+        (N, H, W, 3) uint8 张量，由 train_model 在训练设备上归一化
     """
+    from data_processing.packed_dataset import PackedParkingDataset, TensorAugment, is_packed
+
     # 检查数据集目录是否存在
     if not os.path.exists(data_dir):
         print(f"错误：数据目录不存在: {data_dir}")
         return None, None, None
 
+    options = loader_options(num_workers, pin_memory, persistent_workers)
+
+    if is_packed(data_dir):
+        train_dataset = PackedParkingDataset(data_dir, transform=None if device_augment else TensorAugment(),
+                                             split='train')
+        val_dataset = PackedParkingDataset(data_dir, split='val')
+        test_dataset = PackedParkingDataset(data_dir, split='test')
+        if train_dataset.index["img_size"] != img_size:
+            print(f"警告：打包图像大小为 {train_dataset.index['img_size']}，与 img_size={img_size} 不一致")
+        return _create_loaders(train_dataset, val_dataset, test_dataset, batch_size, options)
+
     # 检查empty和occupied文件夹是否存在
     empty_dir = os.path.join(data_dir, 'empty')
     occupied_dir = os.path.join(data_dir, 'occupied')
@@ -121,32 +216,43 @@ def get_data_loaders(data_dir, batch_size=32, img_size=224):
         transforms.RandomRotation(10),
         transforms.ColorJitter(brightness=0.2, contrast=0.2),
         transforms.ToTensor(),
-        transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
+        transforms.Normalize(mean=IMAGENET_MEAN, std=IMAGENET_STD)
     ])
 
     val_test_transform = transforms.Compose([
         transforms.Resize((img_size, img_size)),
         transforms.ToTensor(),
-        transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
+        transforms.Normalize(mean=IMAGENET_MEAN, std=IMAGENET_STD)
     ])
 
+    if device_augment:
+        # 只缩放，保持 uint8，批量增强和归一化在训练设备上完成
+        train_transform = val_test_transform = transforms.Compose([
+            transforms.Resize((img_size, img_size)),
+            to_hwc_tensor
+        ])
+
     # 创建数据集
-    train_dataset = ParkingDataset(data_dir, transform=train_transform, split='train')
-    val_dataset = ParkingDataset(data_dir, transform=val_test_transform, split='val')
-    test_dataset = ParkingDataset(data_dir, transform=val_test_transform, split='test')
+    train_dataset = ParkingDataset(data_dir, transform=train_transform, split='train', sample_list=sample_list)
+    val_dataset = ParkingDataset(data_dir, transform=val_test_transform, split='val', sample_list=sample_list)
+    test_dataset = ParkingDataset(data_dir, transform=val_test_transform, split='test', sample_list=sample_list)
+
+    return _create_loaders(train_dataset, val_dataset, test_dataset, batch_size, options)
+
 
+def _create_loaders(train_dataset, val_dataset, test_dataset, batch_size, options):
     # 检查数据集是否为空
     if len(train_dataset) == 0:
         print("警告：训练集为空，请确保数据目录中有图像文件")
         return None, None, None
 
     # 创建数据加载器
-    train_loader = DataLoader(train_dataset, batch_size=batch_size, shuffle=True, num_workers=0)
-    val_loader = DataLoader(val_dataset, batch_size=batch_size, shuffle=False, num_workers=0)
-    test_loader = DataLoader(test_dataset, batch_size=batch_size, shuffle=False, num_workers=0)
+    train_loader = DataLoader(train_dataset, batch_size=batch_size, shuffle=True, **options)
+    val_loader = DataLoader(val_dataset, batch_size=batch_size, shuffle=False, **options)
+    test_loader = DataLoader(test_dataset, batch_size=batch_size, shuffle=False, **options)
 
     print(f"训练集大小: {len(train_dataset)}")
     print(f"验证集大小: {len(val_dataset)}")
     print(f"测试集大小: {len(test_dataset)}")
 
-    return train_loader, val_loader, test_loader
\ No newline at end of file
+    return train_loader, val_loader, test_loader
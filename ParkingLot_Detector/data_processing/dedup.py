@@ -0,0 +1,205 @@
+import json
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from data_processing.dataset import ParkingDataset
+
+
+HASH_BITS = 64
+
+
+def dhash(img_path):
+    """
+    计算图像的 64 位差值哈希 (dHash)：灰度缩放到 9x8，比较水平相邻像素
+
+    JPEG 以 1/4 分辨率解码（DCT 缩放），比完整解码快得多，对 9x8 的哈希没有影响
+
+    Returns:
+        uint64 哈希值，图像无法读取时返回 None
+    """
+    image = cv2.imread(img_path, cv2.IMREAD_REDUCED_GRAYSCALE_4)
+    if image is None:
+        image = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        return None
+    small = cv2.resize(image, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+class HashCache:
+    """
+    磁盘上的哈希缓存，按相对路径保存 (mtime_ns, size, hash)；
+    文件的 mtime 或大小不变时直接复用缓存，重复运行只会哈希新增或修改过的文件
+    """
+
+    def __init__(self, cache_path):
+        self.cache_path = cache_path
+        self.entries = {}
+        if os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'r') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"读取哈希缓存失败，将重新计算：{e}")
+
+    def hash_files(self, root_dir, rel_paths, num_threads=None):
+        """
+        返回与 rel_paths 对应的哈希列表（无法读取的图像为 None），以及新计算的数量
+        """
+        stats = [os.stat(os.path.join(root_dir, path)) for path in rel_paths]
+        stale = [i for i, (path, stat) in enumerate(zip(rel_paths, stats))
+                 if self.entries.get(path, [None, None])[:2] != [stat.st_mtime_ns, stat.st_size]]
+
+        # cv2 解码时释放 GIL，线程池即可并行
+        with ThreadPoolExecutor(max_workers=num_threads or os.cpu_count()) as pool:
+            hashes = pool.map(lambda i: dhash(os.path.join(root_dir, rel_paths[i])), stale)
+            for i, value in zip(stale, hashes):
+                self.entries[rel_paths[i]] = [stats[i].st_mtime_ns, stats[i].st_size,
+                                              None if value is None else format(value, '016x')]
+
+        # 已删除的文件不再保留在缓存中
+        wanted = set(rel_paths)
+        self.entries = {path: entry for path, entry in self.entries.items() if path in wanted}
+
+        hashes = [self.entries[path][2] for path in rel_paths]
+        return [None if value is None else int(value, 16) for value in hashes], len(stale)
+
+    def save(self):
+        tmp_path = self.cache_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.cache_path)
+
+
+def band_edges(max_distance):
+    """把 64 位哈希分成 max_distance + 1 段的边界"""
+    return np.linspace(0, HASH_BITS, max_distance + 2).astype(int)
+
+
+def cluster_hashes(hashes, max_distance=4):
+    """
+    按输入顺序（路径/时间顺序）贪心聚类：每个哈希加入汉明距离不超过 max_distance
+    的最近的簇首，否则自己成为新的簇首。簇内每个哈希到簇首的距离都不超过
+    max_distance，簇的直径因此有界，渐变的近似重复链不会合并成一个簇
+
+    64 位哈希分成 max_distance + 1 段：按抽屉原理，距离不超过 max_distance
+    的两个哈希至少有一段完全相同，因此只需与同一段取值相同的簇首比较，
+    避免与全部簇首逐一比较
+
+    Args:
+        hashes: uint64 哈希数组，按路径/时间排序
+        max_distance: 最大汉明距离
+
+    Returns:
+        与 hashes 等长的簇编号数组（簇首在 hashes 中的下标）
+    """
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    # 完全相同的哈希只处理一次，按首次出现的顺序
+    unique, first, inverse = np.unique(hashes, return_index=True, return_inverse=True)
+    order = np.argsort(first, kind='stable')
+
+    edges = band_edges(max_distance)
+    masks = [np.uint64((1 << int(high - low)) - 1) for low, high in zip(edges[:-1], edges[1:])]
+    bands = np.stack([(unique >> np.uint64(low)) & mask for low, mask in zip(edges[:-1], masks)], axis=1)
+
+    # 每段：取值 -> 该取值下的簇首（unique 的下标）
+    buckets = [defaultdict(list) for _ in masks]
+    leader_of = np.empty(len(unique), dtype=np.int64)
+    for row in order:
+        candidates = {leader for band, value in enumerate(bands[row]) for leader in buckets[band].get(int(value), ())}
+        best = row
+        if candidates:
+            candidates = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+            distances = np.bitwise_count(unique[candidates] ^ unique[row])
+            # 距离相同时取较早的簇首
+            nearest = np.lexsort((first[candidates], distances))[0]
+            if distances[nearest] <= max_distance:
+                best = candidates[nearest]
+        if best == row:
+            for band, value in enumerate(bands[row]):
+                buckets[band][int(value)].append(row)
+        leader_of[row] = best
+
+    return first[leader_of][inverse]
+
+
+def build_sample_list(root_dir, cache_path=None, max_distance=4, per_cluster=1, num_threads=None):
+    """
+    哈希 root_dir 中的全部样本，在每个类别内聚类近似重复图像，
+    每个簇最多保留 per_cluster 个样本（按路径排序后均匀抽取）
+
+    Args:
+        root_dir: 数据集根目录，应包含 occupied 和 empty 两个子文件夹
+        cache_path: 哈希缓存文件，默认 root_dir/.dhash_cache.json
+        max_distance: 视为近似重复的最大汉明距离
+        per_cluster: 每个簇保留的样本数，1 为去重，大于 1 为分层抽样
+        num_threads: 哈希线程数
+
+    Returns:
+        (samples, report)：samples 为 [(相对路径, 标签)]，report 为统计信息
+    """
+    cache = HashCache(cache_path or os.path.join(root_dir, '.dhash_cache.json'))
+    all_samples = ParkingDataset(root_dir, split='all').samples
+    rel_paths = [os.path.relpath(path, root_dir) for path, _ in all_samples]
+    labels = [label for _, label in all_samples]
+
+    hashes, hashed = cache.hash_files(root_dir, rel_paths, num_threads)
+    cache.save()
+    print(f"哈希完成：{len(rel_paths)} 个样本，新计算 {hashed} 个，其余来自缓存")
+
+    samples = []
+    report = {"total": len(rel_paths), "hashed": hashed, "unreadable": 0, "classes": {}}
+    for label, class_name in enumerate(['empty', 'occupied']):
+        # 按路径（即时间）顺序聚类，簇首是各段中最早的样本
+        indices = sorted((i for i in range(len(rel_paths)) if labels[i] == label and hashes[i] is not None),
+                         key=lambda i: rel_paths[i])
+        report["unreadable"] += sum(1 for i in range(len(rel_paths)) if labels[i] == label and hashes[i] is None)
+        if not indices:
+            continue
+
+        clusters = defaultdict(list)
+        for index, cluster in zip(indices, cluster_hashes([hashes[i] for i in indices], max_distance)):
+            clusters[cluster].append(index)
+
+        kept = 0
+        for members in clusters.values():
+            members.sort(key=lambda i: rel_paths[i])
+            if len(members) > per_cluster:
+                # 在时间/文件名顺序上均匀抽取，保留簇内的变化
+                members = [members[int(k)] for k in np.linspace(0, len(members) - 1, per_cluster)]
+            samples.extend((rel_paths[i], label) for i in members)
+            kept += len(members)
+
+        sizes = [len(members) for members in clusters.values()]
+        report["classes"][class_name] = {
+            "samples": len(indices),
+            "clusters": len(clusters),
+            "largest_cluster": max(sizes),
+            "kept": kept
+        }
+
+    samples.sort()
+    report["kept"] = len(samples)
+    return samples, report
+
+
+def save_sample_list(samples, output_path, root_dir=None, report=None):
+    """
+    保存样本列表，ParkingDataset(sample_list=...) 可直接读取；路径相对于数据集根目录
+    """
+    with open(output_path, 'w') as f:
+        json.dump({"root_dir": root_dir, "report": report, "samples": samples}, f, indent=1)
+
+
+def load_sample_list(sample_list, root_dir):
+    """
+    读取 save_sample_list 写出的样本列表，返回 [(绝对路径, 标签)]
+    """
+    with open(sample_list, 'r') as f:
+        samples = json.load(f)["samples"]
+    return [(os.path.join(root_dir, path), int(label)) for path, label in samples]
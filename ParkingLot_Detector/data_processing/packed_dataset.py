@@ -0,0 +1,147 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+import torchvision.transforms as transforms
+from PIL import Image
+from torch.utils.data import Dataset
+
+from data_processing.dataset import ParkingDataset
+
+
+IMAGES_FILE = 'images.npy'
+LABELS_FILE = 'labels.npy'
+INDEX_FILE = 'index.json'
+
+
+def _load_resized(img_path, img_size):
+    # 与 val_test_transform 相同的 PIL 双线性缩放，保证打包前后像素一致
+    image = Image.open(img_path).convert('RGB').resize((img_size, img_size), Image.BILINEAR)
+    return np.asarray(image)
+
+
+def pack_dataset(root_dir, output_dir, img_size=224, num_threads=None, sample_list=None):
+    """
+    将 empty/occupied 图像一次性解码、缩放并打包成内存映射的 uint8 数组
+
+    输出目录包含：
+        images.npy: (N, img_size, img_size, 3) uint8，RGB
+        labels.npy: (N,) int64
+        index.json: 图像路径、类别和图像大小，样本顺序与 ParkingDataset(split='all') 一致
+
+    Args:
+        root_dir: 数据集根目录，应包含 occupied 和 empty 两个子文件夹
+        output_dir: 打包输出目录
+        img_size: 打包的图像大小
+        num_threads: 解码线程数，默认使用 CPU 核心数
+        sample_list: 可选的样本列表文件（dedup_dataset.py 生成），只打包其中的样本
+
+    Returns:
+        打包的样本数量
+    """
+    samples = ParkingDataset(root_dir, split='all', sample_list=sample_list).samples
+    if not samples:
+        print(f"错误：数据目录中没有图像: {root_dir}")
+        return 0
+
+    os.makedirs(output_dir, exist_ok=True)
+    images = np.lib.format.open_memmap(os.path.join(output_dir, IMAGES_FILE), mode='w+', dtype=np.uint8,
+                                       shape=(len(samples), img_size, img_size, 3))
+
+    # PIL 解码和缩放时会释放 GIL，线程池即可并行
+    with ThreadPoolExecutor(max_workers=num_threads or os.cpu_count()) as pool:
+        for i, image in enumerate(pool.map(lambda sample: _load_resized(sample[0], img_size), samples)):
+            images[i] = image
+            if (i + 1) % 1000 == 0:
+                print(f"已打包 {i + 1}/{len(samples)} 张图像")
+    images.flush()
+    del images
+
+    np.save(os.path.join(output_dir, LABELS_FILE), np.array([label for _, label in samples], dtype=np.int64))
+    with open(os.path.join(output_dir, INDEX_FILE), 'w') as f:
+        json.dump({
+            "root_dir": root_dir,
+            "img_size": img_size,
+            "classes": ['empty', 'occupied'],
+            "paths": [path for path, _ in samples]
+        }, f)
+
+    print(f"打包完成：{len(samples)} 张图像 -> {output_dir}")
+    return len(samples)
+
+
+def is_packed(path):
+    return os.path.exists(os.path.join(path, IMAGES_FILE)) and os.path.exists(os.path.join(path, INDEX_FILE))
+
+
+class TensorAugment:
+    """
+    作用于 (H, W, 3) uint8 张量的训练增强：水平翻转、小角度旋转、亮度/对比度抖动
+    """
+
+    def __init__(self):
+        self.transform = transforms.Compose([
+            transforms.RandomHorizontalFlip(),
+            transforms.RandomRotation(10),
+            transforms.ColorJitter(brightness=0.2, contrast=0.2)
+        ])
+
+    def __call__(self, image):
+        return self.transform(image.permute(2, 0, 1)).permute(1, 2, 0)
+
+
+class PackedParkingDataset(Dataset):
+    """
+    从 pack_dataset 的输出读取样本的数据集类
+
+    图像以内存映射方式打开，__getitem__ 返回指向映射页面的 (H, W, 3) uint8 张量，
+    不解码也不拷贝；归一化在 DataLoader 拼接批次之后于训练设备上完成
+    （见 ParkingDataset.preprocess_batch）
+    """
+
+    def __init__(self, packed_dir, transform=None, split='train'):
+        """
+        Args:
+            packed_dir: pack_dataset 的输出目录
+            transform: 可选的张量变换，输入输出均为 (H, W, 3) uint8 张量
+            split: 数据集分割 ('train', 'val', 'test' 或 'all')，与 ParkingDataset 的划分相同
+        """
+        self.packed_dir = packed_dir
+        self.transform = transform
+        with open(os.path.join(packed_dir, INDEX_FILE), 'r') as f:
+            self.index = json.load(f)
+        self.classes = self.index["classes"]
+        self.class_to_idx = {cls: i for i, cls in enumerate(self.classes)}
+
+        labels = np.load(os.path.join(packed_dir, LABELS_FILE))
+        if split == 'all':
+            self.indices = np.arange(len(labels))
+        else:
+            self.indices = ParkingDataset.split_indices(len(labels), split)
+        self.labels = labels[self.indices]
+        self.images = None
+
+    def _open(self):
+        # 每个 worker 进程各自打开映射；'c' 模式可写但不会写回文件，避免只读数组的警告
+        self.images = np.load(os.path.join(self.packed_dir, IMAGES_FILE), mmap_mode='c')
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, idx):
+        if self.images is None:
+            self._open()
+        image = torch.from_numpy(self.images[self.indices[idx]])
+
+        if self.transform:
+            image = self.transform(image)
+
+        return image, int(self.labels[idx])
+
+    def __getstate__(self):
+        # 不把映射对象序列化到 worker 进程
+        state = self.__dict__.copy()
+        state["images"] = None
+        return state
@@ -0,0 +1,24 @@
+# dedup_dataset.py
+import argparse
+import json
+
+from data_processing.dedup import build_sample_list, save_sample_list
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data_dir', required=True, help="Dataset folder with empty/occupied subfolders")
+    parser.add_argument('--output_path', required=True, help="Sample list JSON for ParkingDataset(sample_list=...)")
+    parser.add_argument('--cache_path', default=None, help="Hash cache, defaults to <data_dir>/.dhash_cache.json")
+    parser.add_argument('--max_distance', type=int, default=4,
+                        help="Maximum Hamming distance (of 64 bits) between near-duplicate crops")
+    parser.add_argument('--per_cluster', type=int, default=1,
+                        help="Samples kept per cluster: 1 deduplicates, more keeps a spread of each cluster")
+    parser.add_argument('--num_threads', type=int, default=None, help="Hashing threads, defaults to the CPU count")
+    args = parser.parse_args()
+
+    samples, report = build_sample_list(args.data_dir, cache_path=args.cache_path, max_distance=args.max_distance,
+                                        per_cluster=args.per_cluster, num_threads=args.num_threads)
+    save_sample_list(samples, args.output_path, root_dir=args.data_dir, report=report)
+    print(json.dumps(report, indent=4))
+    print(f"Kept {report['kept']} of {report['total']} samples, sample list saved: {args.output_path}")
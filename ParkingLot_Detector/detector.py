@@ -8,38 +8,177 @@ import cv2
 
 
 import os
-import json
+import random
+
+from inference_backends import create_backend
+from temporal_filter import SpotStateTracker, crop_signatures
+from utils.csv_utils import SOURCE_RESOLUTION, TARGET_RESOLUTION, resolution_scale
+from utils.spot_config import load_spot_table
+from annotation_writer import AnnotationWriter
+
+# size of the top-down crop each spot is warped to
+WARP_SIZE = (224, 224)
+
+# cv2.remap only accepts maps with fewer than SHRT_MAX rows
+MAX_REMAP_ROWS = 32767
+
+
+# backbone name -> default input size; the lightweight ones are meant for reduced inputs
+BACKBONES = {
+    'resnet18': 224,
+    'mobilenet_v3_small': 96,
+    'shufflenet_v2': 96,
+    'tiny_cnn': 64
+}
+
+
+class TinyCNN(nn.Module):
+    """
+    A four-block conv net for low resolution spot crops (64x64 or 96x96).
+    """
+
+    def __init__(self, widths=(16, 32, 64, 128)):
+        super(TinyCNN, self).__init__()
+        layers = []
+        in_channels = 3
+        for width in widths:
+            layers += [
+                nn.Conv2d(in_channels, width, 3, stride=2, padding=1, bias=False),
+                nn.BatchNorm2d(width),
+                nn.ReLU(inplace=True)
+            ]
+            in_channels = width
+        self.features = nn.Sequential(*layers)
+        self.pool = nn.AdaptiveAvgPool2d(1)
+        self.fc = nn.Identity()
+        self.num_features = in_channels
+
+    def forward(self, x):
+        return self.fc(torch.flatten(self.pool(self.features(x)), 1))
+
+
+def build_backbone(backbone, pretrained=True):
+    """
+    returns (trunk, name of its classifier attribute, number of features feeding it)
+    """
+    weights = 'DEFAULT' if pretrained else None
+    if backbone == 'resnet18':
+        trunk = models.resnet18(pretrained=pretrained)
+        return trunk, 'fc', trunk.fc.in_features
+    if backbone == 'mobilenet_v3_small':
+        trunk = models.mobilenet_v3_small(weights=weights)
+        return trunk, 'classifier', trunk.classifier[0].in_features
+    if backbone == 'shufflenet_v2':
+        trunk = models.shufflenet_v2_x0_5(weights=weights)
+        return trunk, 'fc', trunk.fc.in_features
+    if backbone == 'tiny_cnn':
+        trunk = TinyCNN()
+        return trunk, 'fc', trunk.num_features
+    raise ValueError(f"Unknown backbone '{backbone}', expected one of {list(BACKBONES)}")
 
 
 class ParkingSpaceClassifier(nn.Module):
     """
-    A classifier based on ResNet18 to classify parking spaces as occupied or empty.
+    A classifier to classify parking spaces as occupied or empty, built on
+    ResNet18 by default or on a lightweight backbone (see BACKBONES).
 
     """
 
-    def __init__(self, num_classes=2):
+    def __init__(self, num_classes=2, backbone='resnet18', pretrained=True):
         super(ParkingSpaceClassifier, self).__init__()
-        # load the resnet18 model
-        self.resnet = models.resnet18(pretrained=True)
+        self.backbone = backbone
+        trunk, head_name, num_features = build_backbone(backbone, pretrained)
 
-        # replace the early layers to reduce training time
-        for param in list(self.resnet.parameters())[:-10]:
-            param.requires_grad = False
+        # replace the early layers to reduce training time, the lightweight
+        # backbones are small enough to fine-tune completely
+        if backbone == 'resnet18':
+            for param in list(trunk.parameters())[:-10]:
+                param.requires_grad = False
 
         # replace final layer with a custom classifier
-        num_features = self.resnet.fc.in_features
-        self.resnet.fc = nn.Sequential(
+        setattr(trunk, head_name, nn.Sequential(
             nn.Linear(num_features, 256),
             nn.ReLU(),
             nn.Dropout(0.5),
             nn.Linear(256, num_classes)
-        )
+        ))
+
+        # resnet18 keeps the "resnet" attribute so existing checkpoints still load
+        self.trunk_name = 'resnet' if backbone == 'resnet18' else 'trunk'
+        self.head_name = head_name
+        setattr(self, self.trunk_name, trunk)
 
     def forward(self, x):
-        return self.resnet(x)
+        return getattr(self, self.trunk_name)(x)
+
+
+def distillation_loss(student_logits, teacher_logits, labels, alpha=0.5, temperature=4.0):
+    """
+    Hinton distillation: alpha * soft target KL at the given temperature
+    (scaled by T^2 to keep gradient magnitudes) + (1 - alpha) * hard label CE
+    """
+    soft = F.kl_div(F.log_softmax(student_logits / temperature, dim=1),
+                    F.softmax(teacher_logits / temperature, dim=1),
+                    reduction='batchmean') * temperature ** 2
+    return alpha * soft + (1 - alpha) * F.cross_entropy(student_logits, labels)
+
+
+def capture_rng_state():
+    state = {
+        'python': random.getstate(),
+        'numpy': np.random.get_state(),
+        'torch': torch.get_rng_state()
+    }
+    if torch.cuda.is_available():
+        state['cuda'] = torch.cuda.get_rng_state_all()
+    return state
+
+
+def restore_rng_state(state):
+    random.setstate(state['python'])
+    np.random.set_state(state['numpy'])
+    torch.set_rng_state(state['torch'])
+    if 'cuda' in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state['cuda'])
 
 
-def train_model(model, train_loader, val_loader, epochs=10, learning_rate=0.001, model_save_path=None):
+def save_checkpoint(checkpoint_path, model, optimizer, scheduler, scaler, epoch, best_val_accuracy, history):
+    """
+    write everything needed to resume training after the given epoch;
+    written to a temporary file first so an interrupted save keeps the previous checkpoint
+    """
+    os.makedirs(os.path.dirname(checkpoint_path) or '.', exist_ok=True)
+    tmp_path = checkpoint_path + '.tmp'
+    torch.save({
+        'model': model.state_dict(),
+        'optimizer': optimizer.state_dict(),
+        'scheduler': scheduler.state_dict(),
+        'scaler': scaler.state_dict(),
+        'epoch': epoch,
+        'best_val_accuracy': best_val_accuracy,
+        'history': history,
+        'rng': capture_rng_state()
+    }, tmp_path)
+    os.replace(tmp_path, checkpoint_path)
+
+
+def load_checkpoint(checkpoint_path, model, optimizer, scheduler, scaler, device):
+    """
+    restore a checkpoint written by save_checkpoint in place, returns the checkpoint dict
+    """
+    # the checkpoint holds numpy / python RNG state, so it is not a weights-only file
+    checkpoint = torch.load(checkpoint_path, map_location=device, weights_only=False)
+    model.load_state_dict(checkpoint['model'])
+    optimizer.load_state_dict(checkpoint['optimizer'])
+    scheduler.load_state_dict(checkpoint['scheduler'])
+    scaler.load_state_dict(checkpoint['scaler'])
+    restore_rng_state(checkpoint['rng'])
+    return checkpoint
+
+
+def train_model(model, train_loader, val_loader, epochs=10, learning_rate=0.001, model_save_path=None,
+                input_size=None, teacher=None, distill_alpha=0.5, temperature=4.0, augment=None,
+                amp=False, accumulation_steps=1, checkpoint_path=None, resume=False, save_module=None):
     """
     train the parking space classification mode;l
 
@@ -50,12 +189,52 @@ def train_model(model, train_loader, val_loader, epochs=10, learning_rate=0.001,
         epochs: number of training epochs
         learning_rate: learning rate for optimiser
         model_save_path: optional path to save the best model
+        input_size: optional student input size, batches are resized on the
+            device so the teacher can still see the full resolution loader output
+        teacher: optional trained model (e.g. the ResNet18 checkpoint) whose
+            softened predictions the model is distilled from
+        distill_alpha: weight of the distillation term against the label loss
+        temperature: softmax temperature for the distillation term
+        augment: optional batched augmentation (data_processing.augment.BatchAugment)
+            applied on the device to uint8 training batches, use with
+            get_data_loaders(..., device_augment=True)
+        amp: autocast the forward passes, bf16 on the CPU and fp16 with loss
+            scaling on CUDA
+        accumulation_steps: batches whose gradients are summed before each
+            optimizer step, the effective batch is batch_size * accumulation_steps
+        checkpoint_path: optional path of a full checkpoint (model, optimizer,
+            scheduler, scaler, epoch, history, RNG state) written every epoch
+        resume: continue from checkpoint_path when it exists
+        save_module: module whose state_dict is saved as the best model instead
+            of model, e.g. the full classifier when model is only its tail
 
     returns the hsitory distionary with training and validation loss & accuracyy
     """
+    from data_processing.dataset import ParkingDataset
+
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
     print(f"Using device: {device}")
     model = model.to(device)
+    if teacher is not None:
+        teacher = teacher.to(device).eval()
+        print(f"Distilling from teacher, alpha = {distill_alpha}, temperature = {temperature}")
+
+    def to_device(inputs, labels, train=False):
+        # pinned batches copy asynchronously; uint8 (N, H, W, 3) batches are
+        # augmented and normalized here, on the device
+        inputs = inputs.to(device, non_blocking=True)
+        if inputs.dtype == torch.uint8:
+            if train and augment is not None:
+                inputs = augment(inputs)
+            else:
+                inputs = ParkingDataset.preprocess_batch(inputs, size=inputs.shape[1])
+        return inputs, labels.to(device, non_blocking=True)
+
+    def resize(inputs):
+        if input_size and inputs.shape[-1] != input_size:
+            return F.interpolate(inputs, size=(input_size, input_size), mode='bilinear',
+                                 align_corners=False, antialias=True)
+        return inputs
 
     criterion = nn.CrossEntropyLoss()
     optimizer = torch.optim.Adam(model.parameters(), lr=learning_rate)
@@ -64,62 +243,87 @@ def train_model(model, train_loader, val_loader, epochs=10, learning_rate=0.001,
         optimizer, mode='min', factor=0.1, patience=2, min_lr=1e-6
     )
 
+    # bf16 autocast on the CPU needs no loss scaling, fp16 on CUDA does
+    amp_dtype = torch.float16 if device.type == 'cuda' else torch.bfloat16
+    scaler = torch.amp.GradScaler(device.type, enabled=amp and device.type == 'cuda')
+    if amp:
+        print(f"Mixed precision enabled ({amp_dtype})")
+    accumulation_steps = max(1, accumulation_steps)
+
     best_val_accuracy = 0.0
     history = {'train_loss': [], 'train_acc': [], 'val_loss': [], 'val_acc': []}
+    start_epoch = 0
+
+    if resume and checkpoint_path and os.path.exists(checkpoint_path):
+        checkpoint = load_checkpoint(checkpoint_path, model, optimizer, scheduler, scaler, device)
+        start_epoch = checkpoint['epoch'] + 1
+        best_val_accuracy = checkpoint['best_val_accuracy']
+        history = checkpoint['history']
+        print(f"Resumed from {checkpoint_path} after epoch {start_epoch}")
 
     print(f"Training started for {epochs} epochs...")
 
-    for epoch in range(epochs):
+    for epoch in range(start_epoch, epochs):
         model.train()
-        train_loss = 0.0
-        train_correct = 0
+        # metrics stay on the device, one host sync per epoch
+        train_loss = torch.zeros((), device=device)
+        train_correct = torch.zeros((), dtype=torch.long, device=device)
         train_total = 0
 
         print(f"Epoch {epoch + 1}/{epochs} training...")
+        optimizer.zero_grad(set_to_none=True)
         for i, (inputs, labels) in enumerate(train_loader):
-            inputs, labels = inputs.to(device), labels.to(device)
-            optimizer.zero_grad()
-
-            outputs = model(inputs)
-            loss = criterion(outputs, labels)
-            loss.backward()
-            optimizer.step()
-
-
-            train_loss += loss.item() * inputs.size(0)
-            _, predicted = torch.max(outputs, 1)
+            inputs, labels = to_device(inputs, labels, train=True)
+
+            with torch.autocast(device.type, dtype=amp_dtype, enabled=amp):
+                outputs = model(resize(inputs))
+                if teacher is not None:
+                    with torch.no_grad():
+                        teacher_outputs = teacher(inputs)
+                    loss = distillation_loss(outputs.float(), teacher_outputs.float(), labels,
+                                             distill_alpha, temperature)
+                else:
+                    loss = criterion(outputs.float(), labels)
+
+            # average the gradients over the accumulation window
+            scaler.scale(loss / accumulation_steps).backward()
+            if (i + 1) % accumulation_steps == 0 or i + 1 == len(train_loader):
+                scaler.step(optimizer)
+                scaler.update()
+                optimizer.zero_grad(set_to_none=True)
+
+            train_loss += loss.detach() * inputs.size(0)
             train_total += labels.size(0)
-            train_correct += (predicted == labels).sum().item()
+            train_correct += (outputs.argmax(1) == labels).sum()
 
             # Progress printout every 10 batches
             if (i + 1) % 10 == 0:
                 print(f"  Batch {i + 1}/{len(train_loader)}, loss: {loss.item():.4f}")
 
-        train_loss = train_loss / train_total
-        train_accuracy = train_correct / train_total
+        train_loss = train_loss.item() / train_total
+        train_accuracy = train_correct.item() / train_total
         history['train_loss'].append(train_loss)
         history['train_acc'].append(train_accuracy)
 
         model.eval()
-        val_loss = 0.0
-        val_correct = 0
+        val_loss = torch.zeros((), device=device)
+        val_correct = torch.zeros((), dtype=torch.long, device=device)
         val_total = 0
 
         print(f"Epoch {epoch + 1}/{epochs} validating...")
-        with torch.no_grad():
+        with torch.no_grad(), torch.autocast(device.type, dtype=amp_dtype, enabled=amp):
             for inputs, labels in val_loader:
-                inputs, labels = inputs.to(device), labels.to(device)
+                inputs, labels = to_device(inputs, labels)
 
-                outputs = model(inputs)
+                outputs = model(resize(inputs)).float()
                 loss = criterion(outputs, labels)
 
-                val_loss += loss.item() * inputs.size(0)
-                _, predicted = torch.max(outputs, 1)
+                val_loss += loss * inputs.size(0)
                 val_total += labels.size(0)
-                val_correct += (predicted == labels).sum().item()
+                val_correct += (outputs.argmax(1) == labels).sum()
 
-        val_loss = val_loss / val_total
-        val_accuracy = val_correct / val_total
+        val_loss = val_loss.item() / val_total
+        val_accuracy = val_correct.item() / val_total
         history['val_loss'].append(val_loss)
         history['val_acc'].append(val_accuracy)
 
@@ -133,10 +337,14 @@ def train_model(model, train_loader, val_loader, epochs=10, learning_rate=0.001,
         if val_accuracy > best_val_accuracy:
             best_val_accuracy = val_accuracy
             if model_save_path:
-                os.makedirs(os.path.dirname(model_save_path), exist_ok=True)
-                torch.save(model.state_dict(), model_save_path)
+                os.makedirs(os.path.dirname(model_save_path) or '.', exist_ok=True)
+                torch.save((save_module or model).state_dict(), model_save_path)
                 print(f'   Best model saved with val accuracy: {val_accuracy:.4f}')
 
+        if checkpoint_path:
+            save_checkpoint(checkpoint_path, model, optimizer, scheduler, scaler, epoch,
+                            best_val_accuracy, history)
+
     print(f"Training complete! Best val accuracy: {best_val_accuracy:.4f}")
     return history
 
@@ -146,35 +354,217 @@ class ParkingDetector:
     A detector class to detect parking spot occupancy based on trained model.
     """
 
-    def __init__(self, model_path=None, device=None):
+    def __init__(self, model_path=None, device=None, batch_size=64, intermediate_size=150,
+                 change_threshold=None, refresh_interval=10, vote_window=1, backend='eager',
+                 channels_last=False, backbone='resnet18', input_size=None, annotation_writer=None):
+        """
+        Args:
+            model_path: path to the trained state_dict
+            device: torch device, defaults to cuda when available
+            batch_size: number of spots classified per forward pass,
+                1 reproduces the per-spot behaviour
+            intermediate_size: resolution crops pass through before the
+                model input size, 150 matches how the model was trained;
+                None feeds the 224x224 warp straight in; ignored when the
+                model input is smaller
+            change_threshold: mean absolute signature difference (0-255)
+                below which a spot reuses its last result; None classifies
+                every spot on every frame
+            refresh_interval: force reclassification after this many skipped frames
+            vote_window: number of consistent readings needed before a
+                published status flips
+            backend: 'eager' loads the state_dict into ParkingSpaceClassifier,
+                'torchscript' / 'onnx' load the files written by export_model.py
+                and 'int8' the quantized model written by quantize_model.py
+                from model_path
+            channels_last: feed eager / torchscript models NHWC batches
+            backbone: ParkingSpaceClassifier backbone the checkpoint was trained with
+            input_size: model input resolution, defaults to the backbone's
+                size in BACKBONES (224 for resnet18)
+            annotation_writer: AnnotationWriter that renders and saves the
+                annotated previews requested with output_path; a default one
+                (every frame, quality 85, format from the output path's
+                extension) is created on first use
+        """
         if device is None:
             self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
         else:
             self.device = device
 
-        self.model = ParkingSpaceClassifier().to(self.device)
-
-        if model_path and os.path.exists(model_path):
+        self.backend_name = backend
+        self.backbone = backbone
+        self.input_size = input_size or BACKBONES[backbone]
+        self.backend = create_backend(backend, model_path, self.device,
+                                      build_model=lambda: self._load_eager_model(model_path),
+                                      channels_last=channels_last)
+        self.device = self.backend.device
+        # the eager module, for callers that need the nn.Module itself
+        self.model = getattr(self.backend, 'model', None)
+        self.batch_size = batch_size
+        self.intermediate_size = intermediate_size if intermediate_size and intermediate_size < self.input_size else None
+        self.change_threshold = change_threshold
+        self.refresh_interval = refresh_interval
+        self.vote_window = vote_window
+        # config_path -> SpotStateTracker, one per camera
+        self._trackers = {}
+        # SpotTable of the active config
+        self.parking_spots = None
+        self.config_path = None
+        # config_path -> {"spots", "mtime", "frame_size", "inverse_homographies"}
+        self._spot_configs = {}
+        # (config_path, config mtime, width, height) -> remap tables
+        self._warp_maps = {}
+        self.annotation_writer = annotation_writer
+
+    def _load_eager_model(self, model_path):
+        has_checkpoint = bool(model_path) and os.path.exists(model_path)
+        # ImageNet weights would be overwritten by the checkpoint anyway
+        model = ParkingSpaceClassifier(backbone=self.backbone, pretrained=not has_checkpoint).to(self.device)
+
+        if has_checkpoint:
             print(f"Loading model from: {model_path}")
-            self.model.load_state_dict(torch.load(model_path, map_location=self.device))
+            model.load_state_dict(torch.load(model_path, map_location=self.device))
         else:
             print(f"Warning: model not found, using untrained model.")
 
-        self.model.eval()
-        self.parking_spots = []
+        return model.eval()
 
     def load_parking_spots(self, config_path):
         """
-        Load parking spot definitions from JSON config.
+        Load parking spot definitions and make them the active config.
+
+        Any format utils.spot_config.load_spot_table understands is accepted
+        (the [{"id", "coords"}] list, annotate.py / legacy id-keyed dicts, or
+        a SlotId,X,Y,W,H CSV); the spots are kept as a SpotTable. CSV
+        rectangles are in camera pixels (SOURCE_RESOLUTION) and are scaled
+        to TARGET_RESOLUTION here, then to the actual frame size on the
+        first frame of another resolution.
+
+        Several configs can be loaded at once (one per camera) and selected
+        per call with detect_frame(config_path=...). The perspective
+        homography of every spot is solved once here; the per-resolution
+        remap tables are built lazily by _get_warp_maps.
+        """
+        config = self._load_spot_config(config_path)
+        if config is None:
+            return False
+
+        self.config_path = config_path
+        self.parking_spots = config["spots"]
+        return True
+
+    def _load_spot_config(self, config_path, frame_size=None):
+        """
+        (Re)load one spot config into the per-config cache, dropping any
+        remap tables built from an older version of it.
+
+        frame_size (width, height) is the resolution CSV coordinates are
+        scaled to, TARGET_RESOLUTION by default; JSON configs are already
+        in frame pixels and ignore it.
         """
         if not os.path.exists(config_path):
             print(f"Error: config file not found: {config_path}")
-            return False
+            return None
 
-        with open(config_path, 'r') as f:
-            self.parking_spots = json.load(f)
-            print(f"Loaded {len(self.parking_spots)} parking spots.")
-            return True
+        if config_path.lower().endswith('.csv'):
+            frame_size = tuple(frame_size or TARGET_RESOLUTION)
+            csv_scale = resolution_scale(SOURCE_RESOLUTION, frame_size)
+        else:
+            frame_size, csv_scale = None, 1.0
+
+        try:
+            spots = load_spot_table(config_path, csv_scale)
+        except (ValueError, KeyError) as e:
+            print(f"Error: invalid spot config {config_path}: {e}")
+            return None
+        print(f"Loaded {len(spots)} parking spots.")
+
+        config = {
+            "spots": spots,
+            "mtime": os.path.getmtime(config_path),
+            "frame_size": frame_size,
+            "inverse_homographies": self._solve_homographies(spots)
+        }
+        self._spot_configs[config_path] = config
+        self._warp_maps = {key: maps for key, maps in self._warp_maps.items() if key[0] != config_path}
+        if config_path == self.config_path:
+            self.parking_spots = spots
+        return config
+
+    @staticmethod
+    def _solve_homographies(spots):
+        """
+        Solve the warp for every spot of a SpotTable, returning an (N, 3, 3)
+        array of inverse homographies mapping crop pixels back to frame pixels.
+        """
+        dst_points = np.array([
+            [0, 0],
+            [WARP_SIZE[0], 0],
+            [WARP_SIZE[0], WARP_SIZE[1]],
+            [0, WARP_SIZE[1]]
+        ], dtype=np.float32)
+
+        inverses = np.empty((len(spots), 3, 3), dtype=np.float64)
+        for i, points in enumerate(spots.coords):
+            inverses[i] = cv2.getPerspectiveTransform(dst_points, points)
+        return inverses
+
+    def _get_warp_maps(self, width, height, config_path=None):
+        """
+        Return the cached remap tables for a loaded config at this frame size,
+        reloading the config if the file changed on disk.
+        """
+        config_path = config_path or self.config_path
+        config = self._spot_configs[config_path]
+        if os.path.exists(config_path) and os.path.getmtime(config_path) != config["mtime"]:
+            print(f"Config changed on disk, reloading: {config_path}")
+            config = self._load_spot_config(config_path, config["frame_size"])
+        if config["frame_size"] is not None and config["frame_size"] != (width, height):
+            # CSV spots are rescaled from the camera resolution to this frame size
+            config = self._load_spot_config(config_path, (width, height))
+
+        key = (config_path, config["mtime"], width, height)
+        if key not in self._warp_maps:
+            self._warp_maps[key] = self._build_warp_maps(config, width, height)
+        return self._warp_maps[key]
+
+    @staticmethod
+    def _build_warp_maps(config, width, height):
+        """
+        Build remap tables for every in-bounds spot at the given frame size.
+
+        The per-spot tables are stacked vertically so a single cv2.remap call
+        warps a whole chunk of spots into an (n * 224, 224) strip.
+
+        returns a dict with the row indices of the valid spots in the
+        SpotTable and the remap chunks
+        """
+        spots = config["spots"]
+        in_bounds = spots.in_bounds(width, height)
+        if not in_bounds.all():
+            print(f"Warning: {int((~in_bounds).sum())} spots out of image bounds ({width}x{height}): "
+                  f"{[spots.ids[i] for i in np.flatnonzero(~in_bounds)]}")
+        valid_index = np.flatnonzero(in_bounds)
+
+        # homogeneous pixel grid of the destination crop, shape (3, H * W)
+        grid_x, grid_y = np.meshgrid(np.arange(WARP_SIZE[0]), np.arange(WARP_SIZE[1]))
+        grid = np.stack([grid_x.ravel(), grid_y.ravel(), np.ones(grid_x.size)])
+
+        chunks = []
+        chunk_size = max(1, MAX_REMAP_ROWS // WARP_SIZE[1] - 1)
+        for start in range(0, len(valid_index), chunk_size):
+            inverses = config["inverse_homographies"][valid_index[start:start + chunk_size]]
+            src = inverses @ grid
+            map_x = (src[:, 0] / src[:, 2]).astype(np.float32)
+            map_y = (src[:, 1] / src[:, 2]).astype(np.float32)
+            count = len(inverses)
+            map_x = map_x.reshape(count * WARP_SIZE[1], WARP_SIZE[0])
+            map_y = map_y.reshape(count * WARP_SIZE[1], WARP_SIZE[0])
+            # fixed-point tables make cv2.remap noticeably faster than float maps
+            map1, map2 = cv2.convertMaps(map_x, map_y, cv2.CV_16SC2)
+            chunks.append((map1, map2, count))
+
+        return {"valid_index": valid_index, "chunks": chunks}
 
     def detect_image(self, image_path, output_path=None, camera_id=None):
         """
@@ -182,8 +572,8 @@ class ParkingDetector:
 
         Args:
             image_path: path to input image
-            output_path: path to save annotated image
-            camera_id: optional camera identifier for output naming
+            output_path: path to save the annotated preview, see detect_frame
+            camera_id: optional camera identifier, see detect_frame
 
         returns the dictionary of spot status results
         """
@@ -196,94 +586,126 @@ class ParkingDetector:
             print(f"Error: no parking spots loaded: {image_path}")
             return {}
 
-        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        original_height, original_width = image.shape[:2]
-
-        if len(self.parking_spots) == 0:
-            print("Error: no parking spots loaded")
-            return {}
-
-        from data_processing.dataset import ParkingDataset
+        return self.detect_frame(image, output_path, camera_id)
 
-        results = {}
-        for spot in self.parking_spots:
-            pts = np.array(spot["coords"], np.int32)
-
-            valid_points = True
-            for pt in pts:
-                if pt[0] < 0 or pt[0] >= original_width or pt[1] < 0 or pt[1] >= original_height:
-                    print(f"Warning: Spot {spot['id']} out of image bounds")
-                    valid_points = False
-                    break
+    def detect_frame(self, image, output_path=None, camera_id=None, config_path=None):
+        """
+        Detect parking spot status from a decoded BGR frame.
 
-            if not valid_points:
-                continue
+        Args:
+            image: BGR frame as returned by cv2.imread / VideoCapture.read,
+                it is not modified
+            output_path: where to save an annotated preview; it is rendered
+                and written asynchronously by the annotation writer, which
+                may skip frames (every_n); the default writer keeps the
+                path and encodes by its extension
+            camera_id: optional camera identifier, the writer's rate key
+            config_path: which loaded spot config to use, defaults to the
+                one from the last load_parking_spots call
 
-            warped = self._perspective_transform(image_rgb, pts)
+        returns the dictionary of spot status results
+        """
+        config_path = config_path or self.config_path
+        if config_path is not None and config_path not in self._spot_configs:
+            self._load_spot_config(config_path)
 
-            warped_resized = cv2.resize(warped, (150, 150))
+        if config_path not in self._spot_configs or len(self._spot_configs[config_path]["spots"]) == 0:
+            print("Error: no parking spots loaded")
+            return {}
 
-            processed = ParkingDataset.preprocess_image(warped_resized)
-            processed = processed.unsqueeze(0).to(self.device) 
+        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        original_height, original_width = image.shape[:2]
 
-            with torch.no_grad():
-                outputs = self.model(processed)
-                probabilities = F.softmax(outputs, dim=1)
-                predicted_class = torch.argmax(probabilities, dim=1).item()
-                confidence = probabilities[0, predicted_class].item()
+        warp_maps = self._get_warp_maps(original_width, original_height, config_path)
+        spots = self._spot_configs[config_path]["spots"]
+        valid_index = warp_maps["valid_index"]
+        spot_ids = [spots.ids[i] for i in valid_index]
+        spot_pts = spots.coords[valid_index]
+
+        tracker = self._get_tracker(config_path)
+        strips = []
+        signatures = []
+        for map1, map2, count in warp_maps["chunks"]:
+            strip = cv2.remap(image_rgb, map1, map2, cv2.INTER_LINEAR)
+            if tracker is not None:
+                signatures.append(crop_signatures(strip, count))
+            strips.append(strip.reshape(count, WARP_SIZE[1], WARP_SIZE[0], 3))
+        crops = np.concatenate(strips) if strips else np.empty((0, WARP_SIZE[1], WARP_SIZE[0], 3), np.uint8)
+
+        if tracker is None or len(crops) == 0:
+            predictions = self.classify_spots(crops)
+        else:
+            signatures = np.concatenate(signatures)
+            indices = tracker.select(spot_ids, signatures)
+            predictions = tracker.update(indices, self.classify_spots(crops[indices]), signatures)
 
-            status = "occupied" if predicted_class == 1 else "empty"
-            results[spot["id"]] = {
-                "status": status,
+        results = {}
+        for spot_id, (predicted_class, confidence) in zip(spot_ids, predictions):
+            results[spot_id] = {
+                "status": "occupied" if predicted_class == 1 else "empty",
                 "confidence": float(confidence)
             }
 
-            color = (0, 255, 0) if status == "empty" else (0, 0, 255)
-            cv2.polylines(image, [pts], True, color, 2)
-            x, y = pts[0]
-            confidence_text = f"conf: {confidence:.2f}" 
-            cv2.putText(image, confidence_text, (x, y - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-
         if output_path:
-            kernel = np.array([[-1, -1, -1],
-                               [-1, 9, -1],
-                               [-1, -1, -1]])
-            sharpened = cv2.filter2D(image, -1, kernel)
-
-            encode_params = [cv2.IMWRITE_JPEG_QUALITY, 95] 
-            cv2.imwrite(output_path, sharpened, encode_params)
+            # drawing and encoding happen on the writer thread
+            if self.annotation_writer is None:
+                self.annotation_writer = AnnotationWriter()
+            occupied = np.array([predicted_class == 1 for predicted_class, _ in predictions], dtype=bool)
+            confidences = np.array([confidence for _, confidence in predictions], dtype=np.float32)
+            self.annotation_writer.submit(image, spot_pts, occupied, confidences, output_path,
+                                          key=camera_id or config_path)
 
+        return results
 
-            # Optional: add camera_id suffix to output file name
-            #if camera_id:
-            #    # 提取文件名和扩展名
-            #    filename, ext = os.path.splitext(os.path.basename(output_path))
-            #    # 创建包含camera_id的新文件名
-            #    new_filename = f"{filename}_{camera_id}{ext}"
-            #    # 构建新的输出路径
-            #    camera_output_path = os.path.join(os.path.dirname(output_path), new_filename)
-            #    output_path = camera_output_path
+    def close(self, timeout=10.0):
+        """
+        wait for pending annotated previews to be written and stop the writer
+        """
+        if self.annotation_writer is not None:
+            self.annotation_writer.close(timeout)
+            print(f"Annotation writer: {self.annotation_writer.stats}")
+            self.annotation_writer = None
 
-            os.makedirs(os.path.dirname(output_path), exist_ok=True)
-            cv2.imwrite(output_path, image)
-            print(f"Saved result imag: {output_path}")
+    def _get_tracker(self, config_path):
+        """
+        returns the temporal tracker of a camera config, or None when neither
+        change gating nor vote smoothing is enabled
+        """
+        if self.change_threshold is None and self.vote_window <= 1:
+            return None
+        if config_path not in self._trackers:
+            self._trackers[config_path] = SpotStateTracker(
+                self.change_threshold, self.refresh_interval, self.vote_window)
+        return self._trackers[config_path]
+
+    def classify_spots(self, crops):
+        """
+        Classify warped spot crops, stacking them into chunks of `batch_size`
+        so each chunk is a single forward pass.
 
-        return results
+        Args:
+            crops: uint8 RGB crops, an (N, H, W, 3) array
 
-    def _perspective_transform(self, image, points):
-        """
-        Apply perspective transform to extract top-down view of a parking spot.
+        returns a list of (predicted_class, confidence) tuples in input order
         """
-        target_size = (224, 224)
-        dst_points = np.array([
-            [0, 0],
-            [target_size[0], 0],
-            [target_size[0], target_size[1]],
-            [0, target_size[1]]
-        ], dtype=np.float32)
+        from data_processing.dataset import ParkingDataset
 
-        points = points.astype(np.float32)
-        matrix = cv2.getPerspectiveTransform(points, dst_points)
-        warped = cv2.warpPerspective(image, matrix, target_size)
-        return warped
\ No newline at end of file
+        predictions = []
+        if len(crops) == 0:
+            return predictions
+
+        batch_size = self.batch_size if self.batch_size and self.batch_size > 0 else len(crops)
+
+        with torch.no_grad():
+            for start in range(0, len(crops), batch_size):
+                # uint8 goes to the device, float conversion happens there
+                chunk = torch.from_numpy(np.ascontiguousarray(crops[start:start + batch_size])).to(self.device)
+                batch = ParkingDataset.preprocess_batch(chunk, size=self.input_size,
+                                                        intermediate_size=self.intermediate_size,
+                                                        memory_format=self.backend.memory_format)
+                probabilities = F.softmax(self.backend(batch), dim=1)
+                confidence, predicted_class = torch.max(probabilities, dim=1)
+                # one host sync per chunk instead of one per spot
+                predictions.extend(zip(predicted_class.tolist(), confidence.tolist()))
+
+        return predictions
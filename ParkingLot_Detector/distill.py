@@ -0,0 +1,82 @@
+# distill.py
+import argparse
+import os
+
+import torch
+
+from detector import BACKBONES, ParkingSpaceClassifier, train_model
+from data_processing.augment import BatchAugment
+from data_processing.dataset import get_data_loaders
+from inference_backends import EagerBackend
+from quantize_model import measure_throughput
+
+
+def count_parameters(model):
+    return sum(p.numel() for p in model.parameters())
+
+
+def distill(args):
+    """
+    train a lightweight student on the dataset, distilled from the ResNet18 checkpoint
+    """
+    input_size = args.input_size or BACKBONES[args.backbone]
+
+    # the loaders keep the teacher's 224 input, train_model downsizes student batches on the device
+    train_loader, val_loader, _ = get_data_loaders(args.data_dir, batch_size=args.batch_size, img_size=224,
+                                                   device_augment=args.device_augment)
+    if train_loader is None:
+        return None
+
+    teacher = None
+    if args.teacher_path:
+        if not os.path.exists(args.teacher_path):
+            print(f"Error: teacher checkpoint not found: {args.teacher_path}")
+            return None
+        teacher = ParkingSpaceClassifier(pretrained=False)
+        teacher.load_state_dict(torch.load(args.teacher_path, map_location='cpu'))
+        teacher.eval()
+
+    student = ParkingSpaceClassifier(backbone=args.backbone, pretrained=not args.no_pretrained)
+    print(f"Student: {args.backbone} at {input_size}x{input_size}, {count_parameters(student):,} parameters")
+
+    history = train_model(student, train_loader, val_loader, epochs=args.epochs, learning_rate=args.learning_rate,
+                          model_save_path=args.output_model_path, input_size=input_size, teacher=teacher,
+                          distill_alpha=args.alpha, temperature=args.temperature,
+                          augment=BatchAugment() if args.device_augment else None, amp=args.amp,
+                          accumulation_steps=args.accumulation_steps, checkpoint_path=args.checkpoint_path,
+                          resume=args.resume)
+
+    # forward cost of both models on the CPU, the number that decides cameras per box
+    device = torch.device('cpu')
+    models = {args.backbone: (student, input_size)}
+    if teacher is not None:
+        models['resnet18 (teacher)'] = (teacher, 224)
+    for name, (model, size) in models.items():
+        rate = measure_throughput(EagerBackend(model, device), args.batch_size, repeats=3, input_size=size)
+        print(f"{name:>20}: {count_parameters(model):>10,} parameters, {rate:8.1f} spots/s on the CPU")
+
+    return history
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data_dir', required=True, help="Dataset folder with empty/occupied subfolders")
+    parser.add_argument('--teacher_path', default=None, help="Trained ResNet18 state_dict, omit to train without distillation")
+    parser.add_argument('--backbone', default='mobilenet_v3_small', choices=list(BACKBONES), help="Student backbone")
+    parser.add_argument('--input_size', type=int, default=None, help="Student input size, defaults to the backbone's")
+    parser.add_argument('--no_pretrained', action='store_true', help="Do not start from ImageNet weights")
+    parser.add_argument('--device_augment', action='store_true',
+                        help="Augment whole uint8 batches on the training device instead of per image")
+    parser.add_argument('--epochs', type=int, default=10, help="Training epochs")
+    parser.add_argument('--batch_size', type=int, default=32, help="Batch size")
+    parser.add_argument('--learning_rate', type=float, default=0.001, help="Learning rate")
+    parser.add_argument('--alpha', type=float, default=0.5, help="Weight of the distillation loss against the label loss")
+    parser.add_argument('--temperature', type=float, default=4.0, help="Distillation softmax temperature")
+    parser.add_argument('--amp', action='store_true', help="Mixed precision: bf16 on the CPU, fp16 on CUDA")
+    parser.add_argument('--accumulation_steps', type=int, default=1, help="Batches accumulated per optimizer step")
+    parser.add_argument('--checkpoint_path', default=None, help="Full training checkpoint written every epoch")
+    parser.add_argument('--resume', action='store_true', help="Resume from --checkpoint_path")
+    parser.add_argument('--output_model_path', default="model/parking_student.pth", help="Where to save the best student")
+    args = parser.parse_args()
+
+    distill(args)
@@ -1,19 +1,322 @@
 # evaluate_model.py
 import argparse
-from detector import ParkingLotDetector
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+import torch
+import torchvision.transforms as transforms
+
+from detector import BACKBONES, ParkingDetector
+from ground_truth import load_ground_truth
+from inference_backends import BACKENDS
+from data_processing.dataset import ParkingDataset, to_hwc_tensor
+from data_processing.packed_dataset import PackedParkingDataset, is_packed
+
+CLASSES = ['empty', 'occupied']
+
+# per-process state of the evaluation workers
+_worker = {}
+
+
+def _init_worker(detector_options, num_threads):
+    torch.set_num_threads(num_threads)
+    _worker["detector"] = ParkingDetector(**detector_options)
+    _worker["datasets"] = {}
+
+
+def _open_split(data_dir, split, sample_list=None):
+    """
+    returns a dataset of (H, W, 3) uint8 crops resized like the validation
+    transform, from a JPEG folder or a folder written by pack_dataset.py
+    """
+    if is_packed(data_dir):
+        return PackedParkingDataset(data_dir, split=split)
+    transform = transforms.Compose([transforms.Resize((224, 224)), to_hwc_tensor])
+    return ParkingDataset(data_dir, transform=transform, split=split, sample_list=sample_list)
+
+
+def _classify_crops(data_dir, split, sample_list, start, stop):
+    """
+    worker task: decode samples [start, stop) of a split and classify them in one batch
+
+    returns (predicted classes, decode seconds, inference seconds)
+    """
+    key = (data_dir, split, sample_list)
+    if key not in _worker["datasets"]:
+        _worker["datasets"][key] = _open_split(data_dir, split, sample_list)
+    dataset = _worker["datasets"][key]
+
+    begin = time.perf_counter()
+    crops = torch.stack([dataset[i][0] for i in range(start, stop)]).numpy()
+    decoded = time.perf_counter()
+    predictions = _worker["detector"].classify_spots(crops)
+    return [predicted for predicted, _ in predictions], decoded - begin, time.perf_counter() - decoded
+
+
+def _detect_frame(image_path, config_path):
+    """
+    worker task: run the full detection path on one camera frame
+
+    returns ({spot_id: status}, decode seconds, inference seconds)
+    """
+    begin = time.perf_counter()
+    image = cv2.imread(image_path)
+    decoded = time.perf_counter()
+    if image is None:
+        print(f"Cannot read image {image_path}")
+        return {}, decoded - begin, 0.0
+    results = _worker["detector"].detect_frame(image, config_path=config_path)
+    return {spot_id: spot["status"] for spot_id, spot in results.items()}, decoded - begin, time.perf_counter() - decoded
+
+
+def run_pool(tasks, detector_options, num_workers):
+    """
+    Run (function, args) tasks in num_workers processes, each holding its own
+    detector; num_workers=0 runs them in this process. Results keep task order.
+    """
+    if num_workers <= 0:
+        _init_worker(detector_options, torch.get_num_threads())
+        return [function(*task_args) for function, task_args in tasks]
+
+    # split the CPU between the workers instead of letting every process use all cores
+    num_threads = max(1, (os.cpu_count() or 1) // num_workers)
+    # spawn keeps CUDA and the OpenMP pools of the parent out of the workers
+    with ProcessPoolExecutor(max_workers=num_workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker, initargs=(detector_options, num_threads)) as pool:
+        futures = [pool.submit(function, *task_args) for function, task_args in tasks]
+        return [future.result() for future in futures]
+
+
+def summarize(labels, predictions):
+    """
+    accuracy, confusion matrix (rows = true class, columns = predicted class)
+    and per-class precision / recall for integer class labels
+    """
+    labels = np.asarray(labels, dtype=np.int64)
+    predictions = np.asarray(predictions, dtype=np.int64)
+    num_classes = len(CLASSES)
+    matrix = np.bincount(labels * num_classes + predictions,
+                         minlength=num_classes * num_classes).reshape(num_classes, num_classes)
+
+    per_class = {}
+    for index, class_name in enumerate(CLASSES):
+        predicted, support = matrix[:, index].sum(), matrix[index].sum()
+        per_class[class_name] = {
+            "precision": float(matrix[index, index] / predicted) if predicted else None,
+            "recall": float(matrix[index, index] / support) if support else None,
+            "support": int(support)
+        }
+
+    return {
+        "samples": int(len(labels)),
+        "accuracy": float(np.trace(matrix) / len(labels)) if len(labels) else None,
+        "confusion_matrix": {"labels": CLASSES, "matrix": matrix.tolist()},
+        "per_class": per_class
+    }
+
+
+def throughput(count, elapsed, decode_seconds, inference_seconds):
+    return {
+        "wall_seconds": elapsed,
+        "spots_per_second": count / elapsed if elapsed else None,
+        # summed over workers, i.e. what one process sustains on its share of the CPU
+        "inference_spots_per_second_per_worker": count / inference_seconds if inference_seconds else None,
+        "decode_seconds": decode_seconds,
+        "inference_seconds": inference_seconds
+    }
+
+
+def evaluate_crops(args, detector_options):
+    """
+    evaluate the classifier on a split of the crop dataset, chunk_size crops per task
+    """
+    dataset = _open_split(args.data_dir, args.split, args.sample_list)
+    if isinstance(dataset, PackedParkingDataset):
+        labels = dataset.labels.tolist()
+        paths = [dataset.index["paths"][i] for i in dataset.indices]
+    else:
+        labels = [label for _, label in dataset.samples]
+        paths = [path for path, _ in dataset.samples]
+    if not labels:
+        print(f"No samples in the {args.split} split of {args.data_dir}")
+        return None
+
+    tasks = [(_classify_crops, (args.data_dir, args.split, args.sample_list, start,
+                                min(start + args.chunk_size, len(labels))))
+             for start in range(0, len(labels), args.chunk_size)]
+
+    # crops are already at the training resolution, skip the 150x150 detection round trip
+    start = time.perf_counter()
+    results = run_pool(tasks, dict(detector_options, intermediate_size=None), args.num_workers)
+    elapsed = time.perf_counter() - start
+
+    predictions = [predicted for chunk, _, _ in results for predicted in chunk]
+    report = summarize(labels, predictions)
+    report["split"] = args.split
+    report["throughput"] = throughput(len(labels), elapsed, sum(r[1] for r in results), sum(r[2] for r in results))
+    report["misclassified"] = [{"path": path, "label": CLASSES[label], "predicted": CLASSES[predicted]}
+                               for path, label, predicted in zip(paths, labels, predictions) if label != predicted]
+    return report
+
+
+def load_cameras(args):
+    """
+    cameras to evaluate as dicts with camera_id, image_dir, config_path and ground_truth
+    """
+    if args.cameras_path:
+        with open(args.cameras_path, 'r') as f:
+            cameras = json.load(f)["cameras"]
+        # the image folder may be given as "source", as in the occupancy service config
+        return [dict(camera, image_dir=camera.get("image_dir", camera.get("source")))
+                for camera in cameras if camera.get("ground_truth")]
+    if args.ground_truth:
+        # image_dir and config_path may come from a compact ground truth file
+        return [{"camera_id": args.camera_id, "image_dir": args.image_dir,
+                 "config_path": args.config_path, "ground_truth": args.ground_truth}]
+    return []
+
+
+def evaluate_frames(args, detector_options, cameras):
+    """
+    evaluate the full detection path (warp + classify) on labelled camera
+    frames, with per-camera and per-spot breakdowns
+
+    ground truth files are read with ground_truth.load_ground_truth,
+    spots labelled unknown are ignored
+    """
+    tasks, frames = [], []
+    for camera in cameras:
+        ground_truth = load_ground_truth(camera["ground_truth"], camera_id=camera.get("camera_id"),
+                                         config_path=camera.get("config_path"), image_dir=camera.get("image_dir"))
+        # the camera entry overrides the paths stored in the ground truth file
+        image_dir = camera.get("image_dir") or ground_truth.image_dir
+        config_path = camera.get("config_path") or ground_truth.config_path
+        camera_id = (camera.get("camera_id") or ground_truth.camera_id
+                     or os.path.splitext(os.path.basename(camera["ground_truth"]))[0])
+        for index, image_name in enumerate(ground_truth.frames):
+            image_path = ground_truth.image_path(index, image_dir)
+            if not os.path.exists(image_path):
+                print(f"Warning: image not found: {image_path}")
+                continue
+            tasks.append((_detect_frame, (image_path, config_path)))
+            frames.append((camera_id, image_name, ground_truth.frame_statuses(index)))
+    if not tasks:
+        print("No labelled frames found")
+        return None
+
+    start = time.perf_counter()
+    results = run_pool(tasks, detector_options, args.num_workers)
+    elapsed = time.perf_counter() - start
+
+    # (camera_id, spot_id, label, predicted) for every labelled spot the detector reported
+    records = []
+    missing = 0
+    for (camera_id, _, spots), (predicted, _, _) in zip(frames, results):
+        for spot_id, status in spots.items():
+            if status not in CLASSES:
+                continue
+            if str(spot_id) not in predicted:
+                missing += 1
+                continue
+            records.append((camera_id, str(spot_id), CLASSES.index(status),
+                            CLASSES.index(predicted[str(spot_id)])))
+
+    report = summarize([r[2] for r in records], [r[3] for r in records])
+    report["frames"] = len(frames)
+    report["missing_spots"] = missing
+    report["per_camera"] = {}
+    report["per_spot"] = {}
+    for camera_id in dict.fromkeys(r[0] for r in records):
+        camera_records = [r for r in records if r[0] == camera_id]
+        report["per_camera"][camera_id] = summarize([r[2] for r in camera_records], [r[3] for r in camera_records])
+
+        spot_records = {}
+        for _, spot_id, label, predicted in camera_records:
+            spot_records.setdefault(spot_id, []).append((label, predicted))
+        report["per_spot"][camera_id] = {
+            spot_id: {
+                "samples": len(pairs),
+                "errors": sum(1 for label, predicted in pairs if label != predicted),
+                "accuracy": sum(1 for label, predicted in pairs if label == predicted) / len(pairs)
+            }
+            for spot_id, pairs in spot_records.items()
+        }
+
+    # every configured spot is classified, labelled or not
+    report["throughput"] = throughput(sum(len(r[0]) for r in results), elapsed,
+                                      sum(r[1] for r in results), sum(r[2] for r in results))
+    report["throughput"]["frames_per_second"] = len(frames) / elapsed if elapsed else None
+    return report
+
 
 def evaluate(args):
     """
     evaluate the model
     """
-    detector = ParkingLotDetector(args.model_path)
-    accuracy = detector.evaluate(val_dir=args.val_dir)
-    print(f" Model accuracy: {accuracy:.2f}")
+    detector_options = {
+        "model_path": args.model_path,
+        "batch_size": args.chunk_size,
+        "backend": args.backend,
+        "channels_last": args.channels_last,
+        "backbone": args.backbone,
+        "input_size": args.input_size
+    }
+
+    report = {"model_path": args.model_path, "backend": args.backend, "backbone": args.backbone,
+              "num_workers": args.num_workers}
+    if args.data_dir:
+        report["crops"] = evaluate_crops(args, detector_options)
+        if report["crops"]:
+            crops = report["crops"]
+            print(f" Model accuracy on the {args.split} split: {crops['accuracy']:.4f} ({crops['samples']} crops, "
+                  f"{crops['throughput']['spots_per_second']:.1f} crops/s)")
+            print(f" Confusion matrix (rows = true {CLASSES}): {crops['confusion_matrix']['matrix']}")
+
+    cameras = load_cameras(args)
+    if cameras:
+        report["frames"] = evaluate_frames(args, detector_options, cameras)
+        if report["frames"]:
+            frames = report["frames"]
+            print(f" Spot accuracy on {frames['frames']} frames: {frames['accuracy']:.4f} ({frames['samples']} spots)")
+            for camera_id, camera in frames["per_camera"].items():
+                print(f"   {camera_id}: {camera['accuracy']:.4f} over {camera['samples']} spots")
+
+    if args.report_path:
+        os.makedirs(os.path.dirname(args.report_path) or '.', exist_ok=True)
+        with open(args.report_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f" Report saved to {args.report_path}")
+    return report
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('--model_path', required=True, help="Path to trained model file")
-    parser.add_argument('--val_dir', required=True, help="Path to validation dataset")
+    parser.add_argument('--backend', default='eager', choices=list(BACKENDS),
+                        help="Inference backend, model_path must match it")
+    parser.add_argument('--backbone', default='resnet18', choices=list(BACKBONES), help="Backbone of the checkpoint")
+    parser.add_argument('--input_size', type=int, default=None, help="Model input size, defaults to the backbone's")
+    parser.add_argument('--channels_last', action='store_true', help="Run eager/torchscript models on NHWC batches")
+    parser.add_argument('--data_dir', default=None,
+                        help="Crop dataset (empty/occupied subfolders or a packed folder) to evaluate")
+    parser.add_argument('--split', default='test', choices=['train', 'val', 'test', 'all'], help="Dataset split")
+    parser.add_argument('--sample_list', default=None, help="Optional sample list from dedup_dataset.py")
+    parser.add_argument('--cameras_path', default=None,
+                        help="Cameras JSON whose entries add image_dir (or source) and ground_truth")
+    parser.add_argument('--ground_truth', default=None, help="Ground truth JSON of a single camera")
+    parser.add_argument('--image_dir', default=None, help="Frames of the single camera")
+    parser.add_argument('--config_path', default=None, help="Spot config of the single camera")
+    parser.add_argument('--camera_id', default=None, help="Name of the single camera in the report")
+    parser.add_argument('--num_workers', type=int, default=min(4, os.cpu_count() or 1),
+                        help="Evaluation processes, 0 evaluates in this process")
+    parser.add_argument('--chunk_size', type=int, default=256, help="Crops per task and forward pass")
+    parser.add_argument('--report_path', default="output/evaluation_report.json", help="JSON report")
     args = parser.parse_args()
 
+    if not args.data_dir and not args.cameras_path and not args.ground_truth:
+        parser.error("nothing to evaluate: pass --data_dir, --cameras_path or --ground_truth")
     evaluate(args)
@@ -0,0 +1,214 @@
+# evaluate_sequence.py
+import argparse
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+from detector import BACKBONES, ParkingDetector
+from ground_truth import load_ground_truth
+from inference_backends import BACKENDS
+
+
+def detection_fingerprint(args, config_path):
+    """
+    everything that changes the cached probabilities; the decision threshold is not part of it
+    """
+    return json.dumps({
+        "model_path": args.model_path,
+        "model_mtime": os.path.getmtime(args.model_path) if os.path.exists(args.model_path) else None,
+        "backend": args.backend,
+        "backbone": args.backbone,
+        "input_size": args.input_size,
+        "channels_last": args.channels_last,
+        "config_path": config_path,
+        "config_mtime": os.path.getmtime(config_path),
+        "change_threshold": args.change_threshold,
+        "refresh_interval": args.refresh_interval,
+        "vote_window": args.vote_window
+    }, sort_keys=True)
+
+
+def predict_sequence(detector, ground_truth, image_dir, config_path, cache_path, fingerprint):
+    """
+    Run detection over the frames of a ground truth file in sequence order
+    and return an (F, S) float32 array of P(occupied), NaN where a spot was
+    not detected or the frame could not be read.
+
+    Probabilities are cached in cache_path (.npz). Without temporal state
+    (change gate / voting) unchanged frames are reused row by row; with it a
+    frame's output depends on the frames before it, so any change reruns the
+    whole sequence.
+    """
+    image_paths = [ground_truth.image_path(i, image_dir) for i in range(len(ground_truth.frames))]
+    mtimes = np.array([os.path.getmtime(path) if os.path.exists(path) else -1.0 for path in image_paths])
+    stateful = detector.change_threshold is not None or detector.vote_window > 1
+
+    probabilities = np.full((len(image_paths), len(ground_truth.spot_ids)), np.nan, dtype=np.float32)
+    todo = np.ones(len(image_paths), dtype=bool)
+    if os.path.exists(cache_path):
+        cached = np.load(cache_path)
+        if (str(cached["fingerprint"]) == fingerprint
+                and cached["spot_ids"].tolist() == ground_truth.spot_ids):
+            rows = {path: row for row, path in enumerate(cached["image_paths"].tolist())}
+            matches = np.array([path in rows and cached["mtimes"][rows[path]] == mtime
+                                for path, mtime in zip(image_paths, mtimes)], dtype=bool)
+            if matches.all() or (matches.any() and not stateful):
+                source = [rows[path] for path, match in zip(image_paths, matches) if match]
+                probabilities[matches] = cached["probabilities"][source]
+                todo = ~matches
+
+    if todo.any():
+        detector.load_parking_spots(config_path)
+        columns = {spot_id: column for column, spot_id in enumerate(ground_truth.spot_ids)}
+        # a stateful detector must see every frame, in order
+        for index in np.flatnonzero(todo | stateful):
+            image = cv2.imread(image_paths[index])
+            if image is None:
+                print(f"Cannot read image {image_paths[index]}")
+                continue
+            results = detector.detect_frame(image, config_path=config_path)
+            for spot_id, spot in results.items():
+                if spot_id in columns:
+                    confidence = spot["confidence"]
+                    probabilities[index, columns[spot_id]] = confidence if spot["status"] == "occupied" else 1 - confidence
+
+        os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+        np.savez(cache_path, fingerprint=fingerprint, spot_ids=np.array(ground_truth.spot_ids),
+                 image_paths=np.array(image_paths), mtimes=mtimes, probabilities=probabilities)
+
+    return probabilities, int(todo.sum())
+
+
+def _ratio(numerator, denominator):
+    # per-spot ratios, NaN where the denominator is 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(denominator > 0, numerator / np.maximum(denominator, 1), np.nan)
+
+
+def _json_value(value):
+    value = float(value)
+    return None if np.isnan(value) else value
+
+
+def score_sequence(labels, probabilities, threshold=0.5):
+    """
+    Score an (F, S) sequence of P(occupied) against ground truth labels
+    (0 empty, 1 occupied, -1 unknown), treating occupied as the positive class.
+
+    Flip rate is the fraction of consecutive labelled frame pairs in which
+    a spot's status changes; spurious flips are predicted changes that the
+    ground truth does not have.
+
+    returns (overall metrics, per-spot metric arrays)
+    """
+    valid = (labels >= 0) & ~np.isnan(probabilities)
+    predicted = np.nan_to_num(probabilities, nan=0.0) >= threshold
+    actual = labels == 1
+
+    true_positive = (valid & predicted & actual).sum(axis=0)
+    false_positive = (valid & predicted & ~actual).sum(axis=0)
+    false_negative = (valid & ~predicted & actual).sum(axis=0)
+    correct = (valid & (predicted == actual)).sum(axis=0)
+    samples = valid.sum(axis=0)
+
+    pairs = valid[1:] & valid[:-1]
+    predicted_flips = pairs & (predicted[1:] != predicted[:-1])
+    actual_flips = pairs & (actual[1:] != actual[:-1])
+    spurious_flips = (predicted_flips & ~actual_flips).sum(axis=0)
+
+    per_spot = {
+        "samples": samples,
+        "accuracy": _ratio(correct, samples),
+        "precision": _ratio(true_positive, true_positive + false_positive),
+        "recall": _ratio(true_positive, true_positive + false_negative),
+        "flip_rate": _ratio(predicted_flips.sum(axis=0), pairs.sum(axis=0)),
+        "true_flip_rate": _ratio(actual_flips.sum(axis=0), pairs.sum(axis=0)),
+        "spurious_flips": spurious_flips
+    }
+    overall = {
+        "threshold": threshold,
+        "samples": int(samples.sum()),
+        "accuracy": _json_value(_ratio(correct.sum(), samples.sum())),
+        "precision": _json_value(_ratio(true_positive.sum(), true_positive.sum() + false_positive.sum())),
+        "recall": _json_value(_ratio(true_positive.sum(), true_positive.sum() + false_negative.sum())),
+        "flip_rate": _json_value(_ratio(predicted_flips.sum(), pairs.sum())),
+        "true_flip_rate": _json_value(_ratio(actual_flips.sum(), pairs.sum())),
+        "spurious_flips": int(spurious_flips.sum())
+    }
+    return overall, per_spot
+
+
+def evaluate_sequence(args):
+    """
+    evaluate detection over labelled image sequences, one ground truth file per camera
+    """
+    detector = ParkingDetector(args.model_path, backend=args.backend, channels_last=args.channels_last,
+                               backbone=args.backbone, input_size=args.input_size,
+                               change_threshold=args.change_threshold, refresh_interval=args.refresh_interval,
+                               vote_window=args.vote_window)
+
+    report = {"model_path": args.model_path, "cameras": {}}
+    for ground_truth_path in args.ground_truth:
+        ground_truth = load_ground_truth(ground_truth_path, image_dir=args.image_dir, config_path=args.config_path)
+        camera_id = ground_truth.camera_id or os.path.splitext(os.path.basename(ground_truth_path))[0]
+        image_dir = args.image_dir or ground_truth.image_dir
+        config_path = args.config_path or ground_truth.config_path
+        if not image_dir or not config_path:
+            print(f"{ground_truth_path}: no image_dir / config_path, pass --image_dir and --config_path")
+            continue
+
+        start = time.perf_counter()
+        probabilities, detected = predict_sequence(detector, ground_truth, image_dir, config_path,
+                                                   os.path.join(args.cache_dir, f"{camera_id}.npz"),
+                                                   detection_fingerprint(args, config_path))
+        print(f"{camera_id}: {len(ground_truth.frames)} frames, {detected} detected, "
+              f"{len(ground_truth.frames) - detected} from cache ({time.perf_counter() - start:.1f}s)")
+
+        camera_report = {"frames": len(ground_truth.frames), "thresholds": []}
+        for threshold in args.thresholds:
+            overall, per_spot = score_sequence(ground_truth.labels, probabilities, threshold)
+            overall["per_spot"] = {
+                spot_id: {name: _json_value(values[column]) for name, values in per_spot.items()}
+                for column, spot_id in enumerate(ground_truth.spot_ids)
+            }
+            camera_report["thresholds"].append(overall)
+            print(f"  threshold {threshold:.2f}: accuracy {overall['accuracy']:.4f}, "
+                  f"precision {overall['precision'] or 0:.4f}, recall {overall['recall'] or 0:.4f}, "
+                  f"flip rate {overall['flip_rate'] or 0:.4f} (true {overall['true_flip_rate'] or 0:.4f}), "
+                  f"{overall['spurious_flips']} spurious flips")
+        report["cameras"][camera_id] = camera_report
+
+    if args.report_path:
+        os.makedirs(os.path.dirname(args.report_path) or '.', exist_ok=True)
+        with open(args.report_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report saved to {args.report_path}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model_path', required=True, help="Path to trained model")
+    parser.add_argument('--ground_truth', nargs='+', required=True, help="Ground truth JSON, one per camera")
+    parser.add_argument('--image_dir', default=None, help="Frame folder, overrides the one in the ground truth")
+    parser.add_argument('--config_path', default=None, help="Spot config, overrides the one in the ground truth")
+    parser.add_argument('--thresholds', type=float, nargs='+', default=[0.5],
+                        help="P(occupied) thresholds to score, rescoring reuses the cached predictions")
+    parser.add_argument('--cache_dir', default="output/sequence_cache", help="Folder for cached predictions")
+    parser.add_argument('--backend', default='eager', choices=list(BACKENDS),
+                        help="Inference backend, model_path must match it")
+    parser.add_argument('--backbone', default='resnet18', choices=list(BACKBONES), help="Backbone of the checkpoint")
+    parser.add_argument('--input_size', type=int, default=None, help="Model input size, defaults to the backbone's")
+    parser.add_argument('--channels_last', action='store_true', help="Run eager/torchscript models on NHWC batches")
+    parser.add_argument('--change_threshold', type=float, default=None,
+                        help="Skip spots whose crop changed less than this (0-255)")
+    parser.add_argument('--refresh_interval', type=int, default=10,
+                        help="Force reclassification after this many skipped frames")
+    parser.add_argument('--vote_window', type=int, default=1, help="Readings needed before a status flips")
+    parser.add_argument('--report_path', default="output/sequence_report.json", help="JSON report")
+    args = parser.parse_args()
+
+    evaluate_sequence(args)
@@ -0,0 +1,121 @@
+# export_model.py
+import argparse
+import os
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+from detector import BACKBONES, ParkingSpaceClassifier
+from data_processing.dataset import ParkingDataset
+from inference_backends import create_backend
+
+
+def load_classifier(model_path, backbone='resnet18'):
+    model = ParkingSpaceClassifier(backbone=backbone, pretrained=False)
+    model.load_state_dict(torch.load(model_path, map_location='cpu'))
+    return model.eval()
+
+
+def export_torchscript(model, output_path, input_size=224):
+    """
+    trace and freeze the classifier (conv/bn folding, constant weights)
+    """
+    example = torch.randn(1, 3, input_size, input_size)
+    with torch.no_grad():
+        frozen = torch.jit.freeze(torch.jit.trace(model, example))
+    frozen.save(output_path)
+    print(f"Saved TorchScript model: {output_path}")
+
+
+def export_onnx(model, output_path, input_size=224, opset=17):
+    """
+    export the classifier to ONNX with a dynamic batch dimension
+    """
+    example = torch.randn(1, 3, input_size, input_size)
+    torch.onnx.export(
+        model, example, output_path,
+        input_names=['input'], output_names=['logits'],
+        dynamic_axes={'input': {0: 'batch'}, 'logits': {0: 'batch'}},
+        opset_version=opset,
+        dynamo=False
+    )
+    print(f"Saved ONNX model: {output_path}")
+
+
+def load_parity_batch(data_dir, num_samples, input_size=224):
+    """
+    real crops from ParkingDataset when a data_dir is given, random crops otherwise
+    """
+    if data_dir:
+        dataset = ParkingDataset(data_dir, split='all')
+        if len(dataset) > 0:
+            indices = np.random.RandomState(0).permutation(len(dataset))[:num_samples]
+            images = [np.asarray(dataset[i][0].resize((input_size, input_size))) for i in indices]
+            return ParkingDataset.preprocess_batch(np.stack(images), size=input_size)
+
+    images = np.random.RandomState(0).randint(0, 256, (num_samples, input_size, input_size, 3), dtype=np.uint8)
+    return ParkingDataset.preprocess_batch(images, size=input_size)
+
+
+def check_parity(backends, batch, reference='eager'):
+    """
+    compare every backend against the reference on the same batch
+    returns {backend: (max absolute probability difference, fraction of equal predictions)}
+    """
+    with torch.no_grad():
+        outputs = {name: F.softmax(backend(batch).float(), dim=1) for name, backend in backends.items()}
+
+    expected = outputs[reference]
+    report = {}
+    for name, probabilities in outputs.items():
+        max_diff = (probabilities - expected).abs().max().item()
+        agreement = (probabilities.argmax(1) == expected.argmax(1)).float().mean().item()
+        report[name] = (max_diff, agreement)
+    return report
+
+
+def export(args):
+    model = load_classifier(args.model_path, args.backbone)
+    input_size = args.input_size or BACKBONES[args.backbone]
+    os.makedirs(args.output_dir, exist_ok=True)
+    name = os.path.splitext(os.path.basename(args.model_path))[0]
+
+    paths = {}
+    if 'torchscript' in args.formats:
+        paths['torchscript'] = os.path.join(args.output_dir, f"{name}.torchscript.pt")
+        export_torchscript(model, paths['torchscript'], input_size)
+    if 'onnx' in args.formats:
+        paths['onnx'] = os.path.join(args.output_dir, f"{name}.onnx")
+        export_onnx(model, paths['onnx'], input_size)
+
+    device = torch.device('cpu')
+    backends = {'eager': create_backend('eager', args.model_path, device, build_model=lambda: model)}
+    for backend, path in paths.items():
+        backends[backend] = create_backend(backend, path, device)
+
+    batch = load_parity_batch(args.data_dir, args.num_samples, input_size)
+    print(f"Parity check on {len(batch)} crops (reference: eager)")
+    passed = True
+    for backend, (max_diff, agreement) in check_parity(backends, batch).items():
+        ok = agreement == 1.0 and max_diff <= args.tolerance
+        passed = passed and ok
+        print(f"  {backend:>12}: max prob diff {max_diff:.2e}, prediction agreement {agreement:.2%} "
+              f"{'OK' if ok else 'MISMATCH'}")
+    return passed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model_path', required=True, help="Path to the trained state_dict")
+    parser.add_argument('--backbone', default='resnet18', choices=list(BACKBONES), help="Backbone of the checkpoint")
+    parser.add_argument('--input_size', type=int, default=None, help="Model input size, defaults to the backbone's")
+    parser.add_argument('--output_dir', default="model", help="Folder for the exported models")
+    parser.add_argument('--formats', nargs='+', default=['torchscript', 'onnx'], choices=['torchscript', 'onnx'])
+    parser.add_argument('--data_dir', default=None, help="Optional dataset folder (empty/occupied) for the parity check")
+    parser.add_argument('--num_samples', type=int, default=64, help="Crops used for the parity check")
+    parser.add_argument('--tolerance', type=float, default=1e-3, help="Maximum allowed probability difference")
+    args = parser.parse_args()
+
+    if not export(args):
+        raise SystemExit(1)
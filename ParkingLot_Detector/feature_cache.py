@@ -0,0 +1,214 @@
+# feature_cache.py
+import argparse
+import copy
+import json
+import os
+import time
+
+import numpy as np
+import torch
+import torch.nn as nn
+import torchvision.transforms as transforms
+from torch.utils.data import DataLoader, Dataset
+
+from detector import BACKBONES, ParkingSpaceClassifier, train_model
+from data_processing.augment import BatchAugment
+from data_processing.dataset import ParkingDataset, loader_options, to_hwc_tensor
+
+FEATURES_FILE = 'features.npy'
+LABELS_FILE = 'labels.npy'
+INDEX_FILE = 'index.json'
+
+
+def split_classifier(model, split='head'):
+    """
+    Split a ParkingSpaceClassifier into a frozen trunk and a trainable tail.
+
+    - 'head': the trunk is everything up to the pooled features, the tail is
+      the custom classifier head; works for every backbone
+    - 'tail': resnet18 only, the trunk ends after layer3 and the tail is
+      layer4 + pooling + head, i.e. every parameter the classifier leaves
+      trainable
+
+    The tail shares its modules with model, so training it updates model in place.
+
+    returns (trunk in eval mode, tail)
+    """
+    network = getattr(model, model.trunk_name)
+    if split == 'head':
+        trunk = copy.deepcopy(network)
+        setattr(trunk, model.head_name, nn.Identity())
+        return trunk.eval(), getattr(network, model.head_name)
+
+    if split == 'tail':
+        if model.backbone != 'resnet18':
+            raise ValueError("split='tail' is only defined for the resnet18 backbone")
+        trunk = nn.Sequential(network.conv1, network.bn1, network.relu, network.maxpool,
+                              network.layer1, network.layer2, network.layer3)
+        tail = nn.Sequential(network.layer4, network.avgpool, nn.Flatten(1), network.fc)
+        return copy.deepcopy(trunk).eval(), tail
+
+    raise ValueError(f"Unknown split '{split}', expected 'head' or 'tail'")
+
+
+def cache_features(trunk, data_dir, cache_dir, fingerprint, num_views=1, img_size=224,
+                   batch_size=64, sample_list=None, device=None):
+    """
+    Run the frozen trunk over the whole dataset once and store the features in
+    cache_dir/features.npy, a memory-mapped (num_views, N, ...) float16 array.
+    Splitting happens when reading (FeatureDataset), because adding files
+    reshuffles the train/val/test split.
+
+    View 0 is the plain crop, views 1..num_views-1 are fixed random
+    augmentations. Rows of files whose path and mtime are unchanged since the
+    last run with the same fingerprint are copied instead of recomputed.
+    Labels are always re-read, so relabelling never needs the trunk.
+
+    returns (number of reused samples, number of computed samples)
+    """
+    device = device or torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    trunk = trunk.to(device).eval()
+    samples = ParkingDataset(data_dir, split='all', sample_list=sample_list).samples
+    paths = [path for path, _ in samples]
+    mtimes = [os.stat(path).st_mtime_ns for path in paths]
+
+    os.makedirs(cache_dir, exist_ok=True)
+    features_path = os.path.join(cache_dir, FEATURES_FILE)
+    index_path = os.path.join(cache_dir, INDEX_FILE)
+
+    old_rows = {}
+    if os.path.exists(index_path) and os.path.exists(features_path):
+        with open(index_path, 'r') as f:
+            old_index = json.load(f)
+        if old_index["fingerprint"] == fingerprint and old_index["num_views"] == num_views:
+            old_rows = {path: (row, mtime) for row, (path, mtime)
+                        in enumerate(zip(old_index["paths"], old_index["mtimes"]))}
+
+    reuse = [i for i, (path, mtime) in enumerate(zip(paths, mtimes))
+             if path in old_rows and old_rows[path][1] == mtime]
+    compute = sorted(set(range(len(paths))) - set(reuse))
+
+    with torch.no_grad():
+        example = torch.zeros(1, 3, img_size, img_size, device=device)
+        feature_shape = tuple(trunk(example).shape[1:])
+
+    tmp_path = os.path.join(cache_dir, 'features.tmp.npy')
+    features = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float16,
+                                         shape=(num_views, len(paths)) + feature_shape)
+    if reuse:
+        old_features = np.load(features_path, mmap_mode='r')
+        features[:, reuse] = old_features[:, [old_rows[paths[i]][0] for i in reuse]]
+        del old_features
+
+    if compute:
+        dataset = ParkingDataset(data_dir, split='all', transform=transforms.Compose([
+            transforms.Resize((img_size, img_size)),
+            to_hwc_tensor
+        ]))
+        dataset.samples = [samples[i] for i in compute]
+        loader = DataLoader(dataset, batch_size=batch_size, shuffle=False,
+                            **loader_options(persistent_workers=False))
+        # a fixed generator per view keeps the augmented views reproducible
+        augments = [None] + [BatchAugment(generator=torch.Generator(device).manual_seed(view))
+                             for view in range(1, num_views)]
+
+        position = 0
+        with torch.no_grad():
+            for inputs, _ in loader:
+                inputs = inputs.to(device, non_blocking=True)
+                rows = compute[position:position + len(inputs)]
+                for view, augment in enumerate(augments):
+                    batch = augment(inputs) if augment else ParkingDataset.preprocess_batch(inputs, size=img_size)
+                    features[view, rows] = trunk(batch).half().cpu().numpy()
+                position += len(inputs)
+                print(f"  Cached {position}/{len(compute)} new samples")
+
+    features.flush()
+    del features
+    os.replace(tmp_path, features_path)
+    np.save(os.path.join(cache_dir, LABELS_FILE), np.array([label for _, label in samples], dtype=np.int64))
+    with open(index_path, 'w') as f:
+        json.dump({"fingerprint": fingerprint, "num_views": num_views, "paths": paths, "mtimes": mtimes}, f)
+
+    return len(reuse), len(compute)
+
+
+class FeatureDataset(Dataset):
+    """
+    Cached trunk features from cache_features for one split (same split as
+    ParkingDataset); every cached view counts as a sample.
+    """
+
+    def __init__(self, cache_dir, split='train', num_views=None):
+        self.features = np.load(os.path.join(cache_dir, FEATURES_FILE), mmap_mode='r')
+        labels = np.load(os.path.join(cache_dir, LABELS_FILE))
+        if split == 'all':
+            self.rows = np.arange(len(labels))
+        else:
+            self.rows = ParkingDataset.split_indices(len(labels), split)
+        self.labels = labels[self.rows]
+        self.num_views = min(num_views or self.features.shape[0], self.features.shape[0])
+
+    def __len__(self):
+        return self.num_views * len(self.rows)
+
+    def __getitem__(self, idx):
+        view, position = divmod(idx, len(self.rows))
+        feature = self.features[view, self.rows[position]].astype(np.float32)
+        return torch.from_numpy(feature), int(self.labels[position])
+
+
+def train_cached(args):
+    input_size = args.input_size or BACKBONES[args.backbone]
+    model = ParkingSpaceClassifier(backbone=args.backbone, pretrained=not args.model_path)
+    if args.model_path:
+        model.load_state_dict(torch.load(args.model_path, map_location='cpu'))
+    trunk, tail = split_classifier(model, args.split)
+
+    # features depend on the trunk weights, the split point and the input size
+    fingerprint = json.dumps({
+        "model_path": args.model_path,
+        "model_mtime": os.path.getmtime(args.model_path) if args.model_path else None,
+        "backbone": args.backbone,
+        "split": args.split,
+        "input_size": input_size,
+        "sample_list": args.sample_list
+    }, sort_keys=True)
+
+    start = time.perf_counter()
+    reused, computed = cache_features(trunk, args.data_dir, args.cache_dir, fingerprint, num_views=args.num_views,
+                                      img_size=input_size, batch_size=args.batch_size, sample_list=args.sample_list)
+    print(f"Feature caching took {time.perf_counter() - start:.1f}s (reused {reused}, computed {computed} samples)")
+
+    # validation only uses the plain view
+    train_loader = DataLoader(FeatureDataset(args.cache_dir, 'train'), batch_size=args.batch_size, shuffle=True)
+    val_loader = DataLoader(FeatureDataset(args.cache_dir, 'val', num_views=1),
+                            batch_size=args.batch_size, shuffle=False)
+
+    start = time.perf_counter()
+    history = train_model(tail, train_loader, val_loader, epochs=args.epochs, learning_rate=args.learning_rate,
+                          model_save_path=args.output_model_path, save_module=model)
+    print(f"Training on cached features took {time.perf_counter() - start:.1f}s")
+    return history
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data_dir', required=True, help="Dataset folder with empty/occupied subfolders")
+    parser.add_argument('--model_path', default=None,
+                        help="Checkpoint providing the trunk weights, ImageNet weights when omitted")
+    parser.add_argument('--backbone', default='resnet18', choices=list(BACKBONES), help="Classifier backbone")
+    parser.add_argument('--input_size', type=int, default=None, help="Model input size, defaults to the backbone's")
+    parser.add_argument('--split', default='head', choices=['head', 'tail'],
+                        help="head: cache pooled features, train the head; tail: cache layer3, train layer4 + head")
+    parser.add_argument('--num_views', type=int, default=1, help="Cached views per training crop, extra views are augmented")
+    parser.add_argument('--cache_dir', default="output/feature_cache", help="Folder for the cached features")
+    parser.add_argument('--sample_list', default=None, help="Optional sample list from dedup_dataset.py")
+    parser.add_argument('--epochs', type=int, default=20, help="Training epochs")
+    parser.add_argument('--batch_size', type=int, default=64, help="Batch size")
+    parser.add_argument('--learning_rate', type=float, default=0.001, help="Learning rate")
+    parser.add_argument('--output_model_path', default="model/parking_detector_head.pth",
+                        help="Where to save the full classifier state_dict")
+    args = parser.parse_args()
+
+    train_cached(args)
@@ -0,0 +1,121 @@
+# ground_truth.py
+import json
+import os
+
+import numpy as np
+
+# one character per spot in a frame row
+STATUS_CODES = {'empty': 'e', 'occupied': 'o', 'unknown': '?'}
+CODE_LABELS = {'e': 0, 'o': 1, '?': -1}
+LABEL_STATUSES = {0: 'empty', 1: 'occupied', -1: 'unknown'}
+
+
+class GroundTruth:
+    """
+    Per-frame, per-spot occupancy labels of one camera.
+
+    Spots are the columns of the spot config (same ids and order that
+    ParkingDetector.load_parking_spots reads), frames are the rows in
+    sequence order. labels is an (F, S) int8 array: 0 empty, 1 occupied,
+    -1 unknown / not labelled.
+
+    On disk every frame is one string with a character per spot:
+
+        {
+            "camera_id": "camera4",
+            "config_path": "config/camera4_spots_scaled.json",
+            "image_dir": "config/camera8_test_images/camera4",
+            "spot_ids": ["606", "607", ...],
+            "frames": {"1.jpg": "eeoo?e...", ...}
+        }
+    """
+
+    def __init__(self, spot_ids, frames=(), labels=None, camera_id=None, config_path=None, image_dir=None):
+        self.spot_ids = [str(spot_id) for spot_id in spot_ids]
+        self.frames = list(frames)
+        if labels is None:
+            labels = np.full((len(self.frames), len(self.spot_ids)), -1, dtype=np.int8)
+        self.labels = np.asarray(labels, dtype=np.int8).reshape(len(self.frames), len(self.spot_ids))
+        self.camera_id = camera_id
+        self.config_path = config_path
+        self.image_dir = image_dir
+
+    @classmethod
+    def from_statuses(cls, statuses, spot_ids=None, **kwargs):
+        """
+        build from {frame: {spot_id: status}}, the format of the older
+        cameraN_ground_truth.json files; spots default to first-seen order
+        """
+        if spot_ids is None:
+            spot_ids = list(dict.fromkeys(str(spot_id) for spots in statuses.values() for spot_id in spots))
+        ground_truth = cls(spot_ids, **kwargs)
+        for frame, spots in statuses.items():
+            ground_truth.set_frame(frame, spots)
+        return ground_truth
+
+    def set_frame(self, frame, statuses):
+        """
+        add or replace the labels of one frame from {spot_id: status};
+        spots that are missing or not in spot_ids stay unknown
+        """
+        row = np.array([CODE_LABELS[STATUS_CODES.get(statuses.get(spot_id), '?')] for spot_id in self.spot_ids],
+                       dtype=np.int8)
+        if frame in self.frames:
+            self.labels[self.frames.index(frame)] = row
+        else:
+            self.frames.append(frame)
+            self.labels = np.vstack([self.labels, row[np.newaxis]])
+
+    def frame_statuses(self, index):
+        """
+        returns {spot_id: status} of the labelled spots of frame `index`
+        """
+        return {spot_id: LABEL_STATUSES[int(label)]
+                for spot_id, label in zip(self.spot_ids, self.labels[index]) if label >= 0}
+
+    def image_path(self, index, image_dir=None):
+        return os.path.join(image_dir or self.image_dir or '', self.frames[index])
+
+    def save(self, path):
+        # label -1 indexes the last code, '?'
+        codes = np.array(['e', 'o', '?'])
+        header = {
+            "camera_id": self.camera_id,
+            "config_path": self.config_path,
+            "image_dir": self.image_dir,
+            "spot_ids": self.spot_ids
+        }
+        # one line per field and per frame keeps the file small and easy to diff
+        lines = [f" {json.dumps(key)}: {json.dumps(value)}," for key, value in header.items()]
+        frames = [f"  {json.dumps(frame)}: \"{''.join(codes[row])}\"" for frame, row in zip(self.frames, self.labels)]
+        text = "{\n" + "\n".join(lines) + "\n \"frames\": {\n" + ",\n".join(frames) + "\n }\n}\n"
+
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+
+def load_ground_truth(path, **defaults):
+    """
+    Load a ground truth file, either the compact per-camera format or the
+    older {frame: {spot_id: status}} dict.
+
+    defaults (camera_id, config_path, image_dir) fill fields the file does not set.
+    """
+    with open(path, 'r') as f:
+        data = json.load(f)
+
+    if "spot_ids" not in data:
+        return GroundTruth.from_statuses(data, **defaults)
+
+    spot_ids = data["spot_ids"]
+    frames = list(data["frames"])
+    labels = np.full((len(frames), len(spot_ids)), -1, dtype=np.int8)
+    for index, row in enumerate(data["frames"].values()):
+        if len(row) != len(spot_ids):
+            raise ValueError(f"{path}: frame {frames[index]} has {len(row)} labels for {len(spot_ids)} spots")
+        labels[index] = [CODE_LABELS[code] for code in row]
+
+    fields = {key: data.get(key) or defaults.get(key) for key in ("camera_id", "config_path", "image_dir")}
+    return GroundTruth(spot_ids, frames, labels, **fields)
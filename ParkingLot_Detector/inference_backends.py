@@ -0,0 +1,110 @@
+import os
+
+import torch
+
+
+BACKENDS = ('eager', 'torchscript', 'onnx', 'int8')
+
+
+class EagerBackend:
+    """
+    Plain PyTorch forward pass of a ParkingSpaceClassifier.
+    """
+
+    def __init__(self, model, device, channels_last=False):
+        self.memory_format = torch.channels_last if channels_last else torch.contiguous_format
+        self.model = model.to(device, memory_format=self.memory_format).eval()
+        self.device = device
+
+    def __call__(self, batch):
+        return self.model(batch)
+
+
+class TorchScriptBackend:
+    """
+    Frozen TorchScript module written by export_model.py. Device-specific
+    graph rewrites are not serializable, so they are applied after loading.
+    """
+
+    def __init__(self, model_path, device, channels_last=False):
+        model = torch.jit.load(model_path, map_location=device).eval()
+        self.model = torch.jit.optimize_for_inference(model)
+        self.memory_format = torch.channels_last if channels_last else torch.contiguous_format
+        self.device = device
+
+    def __call__(self, batch):
+        return self.model(batch)
+
+
+class OnnxBackend:
+    """
+    ONNX Runtime CPU session over the graph written by export_model.py.
+    """
+
+    def __init__(self, model_path, num_threads=None):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("The onnx backend needs onnxruntime: pip install onnxruntime") from e
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        self.memory_format = torch.contiguous_format
+        self.device = torch.device('cpu')
+
+    def __call__(self, batch):
+        inputs = batch.detach().cpu().contiguous().numpy()
+        logits = self.session.run(None, {self.input_name: inputs})[0]
+        return torch.from_numpy(logits)
+
+
+class Int8Backend:
+    """
+    Statically quantized TorchScript module written by quantize_model.py.
+    Quantized kernels are CPU only and prefer channels-last input.
+    """
+
+    def __init__(self, model_path):
+        engines = torch.backends.quantized.supported_engines
+        # the engine must match the one the model was calibrated for
+        torch.backends.quantized.engine = 'x86' if 'x86' in engines else 'qnnpack'
+        self.model = torch.jit.load(model_path, map_location='cpu').eval()
+        self.memory_format = torch.channels_last
+        self.device = torch.device('cpu')
+
+    def __call__(self, batch):
+        return self.model(batch)
+
+
+def create_backend(backend, model_path, device, build_model=None, channels_last=False):
+    """
+    Create an inference backend.
+
+    Args:
+        backend: one of BACKENDS
+        model_path: state_dict for eager, .pt for torchscript, .onnx for onnx
+        device: torch device, the onnx backend always runs on the CPU
+        build_model: callable returning the eager model with weights loaded
+        channels_last: run eager / torchscript convolutions on NHWC tensors,
+            int8 always does and onnx ignores it
+
+    returns a callable mapping a normalized (N, 3, H, W) batch to logits,
+    its memory_format attribute is the layout the batch should arrive in
+    """
+    if backend == 'eager':
+        return EagerBackend(build_model(), device, channels_last)
+
+    if not model_path or not os.path.exists(model_path):
+        raise FileNotFoundError(f"Exported model not found for backend '{backend}': {model_path}")
+    print(f"Loading {backend} model from: {model_path}")
+    if backend == 'torchscript':
+        return TorchScriptBackend(model_path, device, channels_last)
+    if backend == 'onnx':
+        return OnnxBackend(model_path)
+    if backend == 'int8':
+        return Int8Backend(model_path)
+    raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
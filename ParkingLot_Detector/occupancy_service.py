@@ -0,0 +1,353 @@
+# occupancy_service.py
+import argparse
+import glob
+import json
+import os
+import threading
+import time
+
+import cv2
+
+from annotation_writer import ENCODE_PARAMS, AnnotationWriter
+from detector import BACKBONES, ParkingDetector
+from utils.upload_queue import UploadQueue
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+class LatestFrame:
+    """
+    Single-slot mailbox holding only the newest decoded frame of a camera.
+    A frame that is replaced before the scheduler takes it counts as dropped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._frame = None
+        self._captured_at = None
+        self.decoded = 0
+        self.dropped = 0
+
+    def put(self, frame):
+        with self._lock:
+            if self._frame is not None:
+                self.dropped += 1
+            self._frame = frame
+            self._captured_at = time.time()
+            self.decoded += 1
+
+    def take(self):
+        """
+        returns (frame, capture timestamp), or (None, None) if nothing new arrived
+        """
+        with self._lock:
+            frame, captured_at = self._frame, self._captured_at
+            self._frame = None
+            self._captured_at = None
+        return frame, captured_at
+
+
+class CameraSource(threading.Thread):
+    """
+    Background decoder for one camera, feeding a LatestFrame slot.
+    """
+
+    def __init__(self, camera_id, source, config_path, lot_id):
+        super().__init__(name=f"camera-{camera_id}", daemon=True)
+        self.camera_id = camera_id
+        self.source = source
+        self.config_path = config_path
+        self.lot_id = lot_id
+        self.latest = LatestFrame()
+        self.stop_event = threading.Event()
+
+    def stop(self):
+        self.stop_event.set()
+
+
+class StreamSource(CameraSource):
+    """
+    RTSP/HTTP stream or video file read with cv2.VideoCapture.
+    Streams are reopened after a failure; files are paced at their native fps.
+    """
+
+    def __init__(self, camera_id, source, config_path, lot_id, reconnect_delay=5.0):
+        super().__init__(camera_id, source, config_path, lot_id)
+        self.reconnect_delay = reconnect_delay
+        self.is_file = os.path.isfile(source)
+
+    def run(self):
+        while not self.stop_event.is_set():
+            cap = cv2.VideoCapture(self.source)
+            if not cap.isOpened():
+                print(f"[{self.camera_id}] Failed to open source: {self.source}")
+                self.stop_event.wait(self.reconnect_delay)
+                continue
+
+            # keep the driver buffer short so reads return recent frames
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+            frame_period = 1.0 / fps
+            next_frame = time.monotonic()
+
+            while not self.stop_event.is_set():
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                self.latest.put(frame)
+
+                if self.is_file:
+                    next_frame += frame_period
+                    self.stop_event.wait(max(0.0, next_frame - time.monotonic()))
+
+            cap.release()
+            if self.is_file:
+                print(f"[{self.camera_id}] End of video file: {self.source}")
+                return
+            print(f"[{self.camera_id}] Stream interrupted, reconnecting in {self.reconnect_delay}s")
+            self.stop_event.wait(self.reconnect_delay)
+
+
+class DirectorySource(CameraSource):
+    """
+    Watched folder: the newest image file (by mtime) is decoded whenever it changes.
+    """
+
+    def __init__(self, camera_id, source, config_path, lot_id, poll_interval=1.0):
+        super().__init__(camera_id, source, config_path, lot_id)
+        self.poll_interval = poll_interval
+
+    def run(self):
+        last_seen = None
+        while not self.stop_event.is_set():
+            image_files = [path for path in glob.glob(os.path.join(self.source, '*'))
+                           if path.lower().endswith(IMAGE_EXTENSIONS)]
+            if image_files:
+                newest = max(image_files, key=os.path.getmtime)
+                stamp = (newest, os.path.getmtime(newest))
+                if stamp != last_seen:
+                    frame = cv2.imread(newest)
+                    if frame is not None:
+                        self.latest.put(frame)
+                        last_seen = stamp
+            self.stop_event.wait(self.poll_interval)
+
+
+def create_source(camera):
+    """
+    build a camera source from one entry of the cameras config
+    """
+    source_cls = DirectorySource if os.path.isdir(camera["source"]) else StreamSource
+    return source_cls(camera["camera_id"], camera["source"], camera["config_path"], camera["lot_id"])
+
+
+class CameraMetrics:
+    """
+    Per-camera counters and lag (capture time to published result).
+    """
+
+    def __init__(self):
+        self.processed = 0
+        self.last_lag = None
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+        self.last_inference = None
+
+    def record(self, lag, inference_time):
+        self.processed += 1
+        self.last_lag = lag
+        self.max_lag = max(self.max_lag, lag)
+        self.total_lag += lag
+        self.last_inference = inference_time
+
+    def as_dict(self, source):
+        return {
+            "decoded": source.latest.decoded,
+            "dropped": source.latest.dropped,
+            "processed": self.processed,
+            "last_lag_s": self.last_lag,
+            "mean_lag_s": self.total_lag / self.processed if self.processed else None,
+            "max_lag_s": self.max_lag,
+            "last_inference_s": self.last_inference
+        }
+
+
+class OccupancyService:
+    """
+    Long-running occupancy service: N cameras decode in background threads and
+    a single scheduler runs the shared detector over the newest frame of each
+    camera at a fixed cadence, then uploads per-lot results.
+    """
+
+    def __init__(self, detector, sources, interval=10.0, api_url=None, metrics_path=None, spool_path=None,
+                 annotate_dir=None):
+        self.detector = detector
+        self.sources = sources
+        self.interval = interval
+        self.metrics_path = metrics_path
+        # annotated previews are optional, they are rendered off the inference path
+        self.annotate_dir = annotate_dir
+        self.metrics = {source.camera_id: CameraMetrics() for source in sources}
+        self.overruns = 0
+        self.stop_event = threading.Event()
+
+        # latest results per camera, merged per lot before upload
+        self.camera_results = {}
+        # uploads never block the scheduler, they run in the queue's worker thread
+        self.upload_queue = UploadQueue(api_url, spool_path=spool_path) if api_url else None
+
+        for source in sources:
+            detector.load_parking_spots(source.config_path)
+
+    def run(self, max_ticks=None):
+        for source in self.sources:
+            source.start()
+
+        tick = 0
+        next_tick = time.monotonic()
+        try:
+            while not self.stop_event.is_set() and (max_ticks is None or tick < max_ticks):
+                self.run_tick()
+                tick += 1
+
+                # fixed cadence: sleep only for what is left of the interval
+                next_tick += self.interval
+                remaining = next_tick - time.monotonic()
+                if remaining < 0:
+                    self.overruns += 1
+                    print(f"Warning: tick {tick} overran the {self.interval}s interval by {-remaining:.2f}s")
+                    next_tick = time.monotonic()
+                else:
+                    self.stop_event.wait(remaining)
+        except KeyboardInterrupt:
+            print("Stopping occupancy service...")
+        finally:
+            self.stop()
+
+    def run_tick(self):
+        """
+        classify the newest frame of every camera that has one, then upload the changed lots
+        """
+        updated_lots = set()
+        processed = []
+        for source in self.sources:
+            frame, captured_at = source.latest.take()
+            if frame is None:
+                continue
+
+            output_path = os.path.join(self.annotate_dir, f"{source.camera_id}.jpg") if self.annotate_dir else None
+            start = time.perf_counter()
+            results = self.detector.detect_frame(frame, output_path=output_path, camera_id=source.camera_id,
+                                                 config_path=source.config_path)
+            inference_time = time.perf_counter() - start
+
+            self.camera_results[source.camera_id] = results
+            self.metrics[source.camera_id].record(time.time() - captured_at, inference_time)
+            updated_lots.add(source.lot_id)
+            processed.append(source.camera_id)
+
+        for lot_id in updated_lots:
+            self.publish_lot(lot_id)
+
+        self.report_metrics(processed)
+
+    def publish_lot(self, lot_id):
+        lot_results = {}
+        for source in self.sources:
+            if source.lot_id == lot_id:
+                lot_results.update(self.camera_results.get(source.camera_id, {}))
+
+        occupied_count = sum(1 for spot in lot_results.values() if spot["status"] == "occupied")
+        empty_count = sum(1 for spot in lot_results.values() if spot["status"] == "empty")
+        print(f"[{lot_id}] occupied: {occupied_count}, empty: {empty_count}")
+
+        if self.upload_queue is not None:
+            self.upload_queue.submit(lot_id, lot_results)
+
+    def get_metrics(self):
+        return {
+            "overruns": self.overruns,
+            "uploads": dict(self.upload_queue.stats) if self.upload_queue else None,
+            "cameras": {source.camera_id: self.metrics[source.camera_id].as_dict(source)
+                        for source in self.sources}
+        }
+
+    def report_metrics(self, camera_ids):
+        metrics = self.get_metrics()
+        for camera_id in camera_ids:
+            camera = metrics["cameras"][camera_id]
+            print(f"  [{camera_id}] lag {camera['last_lag_s']:.2f}s "
+                      f"(max {camera['max_lag_s']:.2f}s), inference {camera['last_inference_s']:.2f}s, "
+                      f"dropped {camera['dropped']}/{camera['decoded']}")
+
+        if self.metrics_path:
+            with open(self.metrics_path, 'w') as f:
+                json.dump(metrics, f, indent=4)
+
+    def stop(self):
+        self.stop_event.set()
+        for source in self.sources:
+            source.stop()
+        if self.upload_queue is not None:
+            self.upload_queue.close()
+        self.detector.close()
+
+
+def run_service(args):
+    with open(args.cameras_path, 'r') as f:
+        cameras = json.load(f)["cameras"]
+
+    annotation_writer = None
+    if args.annotate_dir:
+        annotation_writer = AnnotationWriter(every_n=args.annotate_every, quality=args.annotate_quality,
+                                             image_format=args.annotate_format, preview_width=args.preview_width)
+
+    print(f"Loading model: {args.model_path}")
+    detector = ParkingDetector(args.model_path, backend=args.backend, channels_last=args.channels_last,
+                               backbone=args.backbone, input_size=args.input_size,
+                               change_threshold=args.change_threshold,
+                               refresh_interval=args.refresh_interval, vote_window=args.vote_window,
+                               annotation_writer=annotation_writer)
+    sources = [create_source(camera) for camera in cameras]
+
+    service = OccupancyService(detector, sources, interval=args.interval,
+                               api_url=None if args.no_upload else args.api_url,
+                               metrics_path=args.metrics_path, spool_path=args.spool_path,
+                               annotate_dir=args.annotate_dir)
+    print(f"Starting occupancy service for {len(sources)} cameras, interval = {args.interval} seconds")
+    service.run(max_ticks=args.max_ticks)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model_path', required=True, help="Path to trained model")
+    parser.add_argument('--backend', default='eager', choices=['eager', 'torchscript', 'onnx', 'int8'],
+                        help="Inference backend, model_path must match (state_dict, .pt, .onnx or .int8.pt)")
+    parser.add_argument('--backbone', default='resnet18', choices=list(BACKBONES), help="Backbone of the checkpoint")
+    parser.add_argument('--input_size', type=int, default=None, help="Model input size, defaults to the backbone's")
+    parser.add_argument('--channels_last', action='store_true', help="Run eager/torchscript models on NHWC batches")
+    parser.add_argument('--cameras_path', required=True,
+                        help="JSON file: {\"cameras\": [{\"camera_id\", \"source\", \"config_path\", \"lot_id\"}]}")
+    parser.add_argument('--interval', type=float, default=10.0, help="Target seconds between inference ticks")
+    parser.add_argument('--api_url', default="https://smartparkingapp-1d951-default-rtdb.europe-west1.firebasedatabase.app/",
+                        help="Firebase Realtime Database URL")
+    parser.add_argument('--change_threshold', type=float, default=None,
+                        help="Skip inference on spots whose crop changed less than this (0-255)")
+    parser.add_argument('--refresh_interval', type=int, default=10,
+                        help="Reclassify a skipped spot at least every N frames")
+    parser.add_argument('--vote_window', type=int, default=1,
+                        help="Consistent readings required before a spot status flips")
+    parser.add_argument('--no_upload', action='store_true', help="Run detection without uploading")
+    parser.add_argument('--metrics_path', default=None, help="Optional JSON file for per-camera lag metrics")
+    parser.add_argument('--spool_path', default="output/upload_spool.json",
+                        help="Local file keeping not-yet-uploaded states across restarts")
+    parser.add_argument('--max_ticks', type=int, default=None, help="Stop after this many ticks")
+    parser.add_argument('--annotate_dir', default=None,
+                        help="Optional folder for annotated previews (<camera_id>.jpg, overwritten each time)")
+    parser.add_argument('--annotate_every', type=int, default=1, help="Write a preview every N ticks per camera")
+    parser.add_argument('--annotate_quality', type=int, default=85, help="Preview encoder quality (0-100)")
+    parser.add_argument('--annotate_format', default='jpg', choices=list(ENCODE_PARAMS), help="Preview image format")
+    parser.add_argument('--preview_width', type=int, default=960, help="Previews wider than this are downscaled")
+    args = parser.parse_args()
+
+    run_service(args)
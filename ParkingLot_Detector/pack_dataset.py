@@ -0,0 +1,17 @@
+# pack_dataset.py
+import argparse
+
+from data_processing.packed_dataset import pack_dataset
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data_dir', required=True, help="Dataset folder with empty/occupied subfolders")
+    parser.add_argument('--output_dir', required=True, help="Folder for images.npy, labels.npy and index.json")
+    parser.add_argument('--img_size', type=int, default=224, help="Size the crops are stored at")
+    parser.add_argument('--sample_list', default=None, help="Only pack the samples listed by dedup_dataset.py")
+    parser.add_argument('--num_threads', type=int, default=None, help="Decode threads, defaults to the CPU count")
+    args = parser.parse_args()
+
+    pack_dataset(args.data_dir, args.output_dir, img_size=args.img_size, num_threads=args.num_threads,
+                 sample_list=args.sample_list)
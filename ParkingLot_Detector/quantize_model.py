@@ -0,0 +1,194 @@
+# quantize_model.py
+import argparse
+import copy
+import json
+import os
+import time
+
+import numpy as np
+import torch
+import torchvision.transforms as transforms
+from torch.ao.quantization import get_default_qconfig_mapping
+from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+from torch.utils.data import DataLoader
+
+from detector import BACKBONES
+from data_processing.dataset import ParkingDataset, IMAGENET_MEAN, IMAGENET_STD
+from export_model import load_classifier
+from inference_backends import create_backend
+
+
+def quantized_engine():
+    engines = torch.backends.quantized.supported_engines
+    return 'x86' if 'x86' in engines else 'qnnpack'
+
+
+def make_loader(data_dir, split, batch_size, num_samples=None, input_size=224):
+    """
+    ParkingDataset loader with the validation transform, optionally capped at num_samples
+    """
+    transform = transforms.Compose([
+        transforms.Resize((input_size, input_size)),
+        transforms.ToTensor(),
+        transforms.Normalize(mean=IMAGENET_MEAN, std=IMAGENET_STD)
+    ])
+    dataset = ParkingDataset(data_dir, transform=transform, split=split)
+    if num_samples and len(dataset) > num_samples:
+        indices = np.random.RandomState(0).permutation(len(dataset))[:num_samples]
+        dataset.samples = [dataset.samples[i] for i in indices]
+    return DataLoader(dataset, batch_size=batch_size, shuffle=False, num_workers=0)
+
+
+def random_batches(num_samples, batch_size, input_size=224):
+    """
+    random crops preprocessed like detector crops, used when no dataset is given
+    """
+    rng = np.random.RandomState(0)
+    for start in range(0, num_samples, batch_size):
+        count = min(batch_size, num_samples - start)
+        images = rng.randint(0, 256, (count, input_size, input_size, 3), dtype=np.uint8)
+        yield ParkingDataset.preprocess_batch(images, size=input_size), torch.zeros(count, dtype=torch.long)
+
+
+def quantize_static(model, calibration_batches, input_size=224):
+    """
+    post-training static INT8 quantization in FX graph mode
+
+    observers are inserted after conv/bn/relu fusion, calibrated on the
+    given (inputs, labels) batches and replaced by quantized kernels;
+    the result is traced and frozen so it loads without the model class
+    """
+    torch.backends.quantized.engine = quantized_engine()
+    model = copy.deepcopy(model).eval().to(memory_format=torch.channels_last)
+    example = torch.randn(1, 3, input_size, input_size).contiguous(memory_format=torch.channels_last)
+
+    prepared = prepare_fx(model, get_default_qconfig_mapping(torch.backends.quantized.engine), (example,))
+    calibrated = 0
+    with torch.no_grad():
+        for inputs, _ in calibration_batches:
+            prepared(inputs.contiguous(memory_format=torch.channels_last))
+            calibrated += len(inputs)
+    print(f"Calibrated on {calibrated} crops ({torch.backends.quantized.engine} engine)")
+
+    quantized = convert_fx(prepared)
+    with torch.no_grad():
+        return torch.jit.freeze(torch.jit.trace(quantized, example))
+
+
+def evaluate(backends, batches):
+    """
+    returns {backend: accuracy} and the fraction of crops where all backends agree
+    """
+    correct = {name: 0 for name in backends}
+    agreed = 0
+    total = 0
+    with torch.no_grad():
+        for inputs, labels in batches:
+            predictions = {}
+            for name, backend in backends.items():
+                batch = inputs.contiguous(memory_format=backend.memory_format)
+                predictions[name] = backend(batch).argmax(1)
+                correct[name] += (predictions[name] == labels).sum().item()
+            stacked = torch.stack(list(predictions.values()))
+            agreed += (stacked == stacked[0]).all(0).sum().item()
+            total += len(labels)
+    return {name: count / total for name, count in correct.items()}, agreed / total
+
+
+def measure_throughput(backend, batch_size, repeats, input_size=224):
+    """
+    spots per second of the model forward pass alone on one batch
+    """
+    batch = torch.randn(batch_size, 3, input_size, input_size).contiguous(memory_format=backend.memory_format)
+    with torch.no_grad():
+        backend(batch)  # warm-up
+        start = time.perf_counter()
+        for _ in range(repeats):
+            backend(batch)
+    return batch_size * repeats / (time.perf_counter() - start)
+
+
+def quantize(args):
+    model = load_classifier(args.model_path, args.backbone)
+    input_size = args.input_size or BACKBONES[args.backbone]
+    os.makedirs(args.output_dir, exist_ok=True)
+    name = os.path.splitext(os.path.basename(args.model_path))[0]
+    int8_path = os.path.join(args.output_dir, f"{name}.int8.pt")
+
+    if args.data_dir:
+        calibration = make_loader(args.data_dir, 'train', args.batch_size, args.num_calibration, input_size)
+        evaluation = make_loader(args.data_dir, 'test', args.batch_size, input_size=input_size)
+    else:
+        print("Warning: no data_dir, calibrating on random crops; accuracy is not reported")
+        calibration = random_batches(args.num_calibration, args.batch_size, input_size)
+        evaluation = None
+
+    torch.jit.save(quantize_static(model, calibration, input_size), int8_path)
+    print(f"Saved INT8 model: {int8_path}")
+
+    device = torch.device('cpu')
+    backends = {
+        'fp32': create_backend('eager', args.model_path, device, build_model=lambda: model),
+        'fp32_channels_last': create_backend('eager', args.model_path, device,
+                                             build_model=lambda: copy.deepcopy(model), channels_last=True),
+        'int8': create_backend('int8', int8_path, device)
+    }
+
+    report = {
+        "model_path": args.model_path,
+        "int8_path": int8_path,
+        "engine": torch.backends.quantized.engine,
+        "threads": torch.get_num_threads(),
+        "size_mb": {"fp32": os.path.getsize(args.model_path) / 2 ** 20,
+                    "int8": os.path.getsize(int8_path) / 2 ** 20}
+    }
+
+    if evaluation is not None and len(evaluation.dataset) > 0:
+        accuracy, agreement = evaluate(backends, evaluation)
+        report["accuracy"] = accuracy
+        report["agreement"] = agreement
+        report["test_samples"] = len(evaluation.dataset)
+        print(f"Accuracy on {len(evaluation.dataset)} test crops:")
+        for backend, value in accuracy.items():
+            print(f"  {backend:>18}: {value:.4f}")
+        print(f"  prediction agreement: {agreement:.2%}")
+    else:
+        accuracy, agreement = evaluate(backends, random_batches(args.batch_size, args.batch_size, input_size))
+        report["agreement"] = agreement
+        print(f"Prediction agreement on random crops: {agreement:.2%}")
+
+    report["spots_per_sec"] = {}
+    print(f"CPU throughput ({torch.get_num_threads()} threads):")
+    for batch_size in args.batch_sizes:
+        rates = {backend_name: measure_throughput(backend, batch_size, args.repeats, input_size)
+                 for backend_name, backend in backends.items()}
+        report["spots_per_sec"][str(batch_size)] = rates
+        print(f"  batch {batch_size:4d}: " + ", ".join(f"{k} {v:8.1f}" for k, v in rates.items()) + " spots/s")
+
+    report_path = os.path.join(args.output_dir, f"{name}.int8_report.json")
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=4)
+    print(f"Report saved: {report_path}")
+
+    if "accuracy" in report:
+        return report["accuracy"]["fp32"] - report["accuracy"]["int8"] <= args.max_accuracy_drop
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model_path', required=True, help="Path to the trained fp32 state_dict")
+    parser.add_argument('--backbone', default='resnet18', choices=list(BACKBONES), help="Backbone of the checkpoint")
+    parser.add_argument('--input_size', type=int, default=None, help="Model input size, defaults to the backbone's")
+    parser.add_argument('--output_dir', default="model", help="Folder for the INT8 model and report")
+    parser.add_argument('--data_dir', default=None, help="Dataset folder (empty/occupied) for calibration and accuracy")
+    parser.add_argument('--num_calibration', type=int, default=512, help="Training crops used for calibration")
+    parser.add_argument('--batch_size', type=int, default=32, help="Batch size for calibration and evaluation")
+    parser.add_argument('--batch_sizes', type=int, nargs='+', default=[1, 16, 64], help="Batch sizes for the throughput report")
+    parser.add_argument('--repeats', type=int, default=5, help="Timed repetitions per batch size")
+    parser.add_argument('--max_accuracy_drop', type=float, default=0.01,
+                        help="Exit non-zero when INT8 accuracy falls further than this below fp32")
+    args = parser.parse_args()
+
+    if not quantize(args):
+        raise SystemExit(1)
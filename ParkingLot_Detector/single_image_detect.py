@@ -1,20 +1,39 @@
 # single_image_detector.py
 
 import argparse
-from detector import ParkingLotDetector
+import json
+
+from detector import BACKBONES, ParkingDetector
+from inference_backends import BACKENDS
+
 
 def detect_single(args):
     """
     detect parking spots from a single image.
 
     """
-    detector = ParkingLotDetector(args.model_path)
+    detector = ParkingDetector(args.model_path, backend=args.backend, channels_last=args.channels_last,
+                               backbone=args.backbone, input_size=args.input_size)
     if not detector.load_parking_spots(args.config_path):
         print("Failed to load parking spot configuration.")
-        return
+        return None
+
+    results = detector.detect_image(args.image_path, args.output_path)
+    if not results:
+        return results
+
+    # the annotated image is written by a background thread, wait for it
+    output_path = detector.annotation_writer.output_path(args.output_path)
+    detector.close()
+
+    occupied = sum(1 for spot in results.values() if spot["status"] == "occupied")
+    print(f" Detection complete: {occupied}/{len(results)} spots occupied. Result saved to {output_path}")
 
-    detector.detect_image(args.image_path, args.output_path)
-    print(f" Detection complete. Result saved to {args.output_path}")
+    if args.results_path:
+        with open(args.results_path, 'w') as f:
+            json.dump(results, f, indent=4)
+        print(f" Spot results saved to {args.results_path}")
+    return results
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -22,6 +41,12 @@ if __name__ == "__main__":
     parser.add_argument('--config_path', required=True, help="Path to parking spots config JSON")
     parser.add_argument('--image_path', required=True, help="Path to the input image")
     parser.add_argument('--output_path', required=True, help="Path to save the output image")
+    parser.add_argument('--results_path', default=None, help="Optional JSON file for the per-spot results")
+    parser.add_argument('--backend', default='eager', choices=list(BACKENDS),
+                        help="Inference backend, model_path must match it")
+    parser.add_argument('--backbone', default='resnet18', choices=list(BACKBONES), help="Backbone of the checkpoint")
+    parser.add_argument('--input_size', type=int, default=None, help="Model input size, defaults to the backbone's")
+    parser.add_argument('--channels_last', action='store_true', help="Run eager/torchscript models on NHWC batches")
     args = parser.parse_args()
 
     detect_single(args)
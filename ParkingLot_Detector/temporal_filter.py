@@ -0,0 +1,105 @@
+import numpy as np
+import cv2
+
+
+# side length of the downsampled crop used as a change signature,
+# 224 / 8 = 28 so each signature pixel is the mean of a 28x28 block
+SIGNATURE_SIZE = 8
+
+
+def crop_signatures(strip, count):
+    """
+    Compute the change signature of every crop in a remap strip.
+
+    Args:
+        strip: (count * H, W, 3) uint8 strip of stacked spot crops
+        count: number of crops in the strip
+
+    returns a (count, 8, 8, 3) float32 array of block means
+    """
+    # INTER_AREA over an exact multiple is a block mean, and the block grid
+    # lines up with the crop boundaries, so one resize covers the whole strip
+    small = cv2.resize(strip, (SIGNATURE_SIZE, count * SIGNATURE_SIZE), interpolation=cv2.INTER_AREA)
+    return small.reshape(count, SIGNATURE_SIZE, SIGNATURE_SIZE, 3).astype(np.float32)
+
+
+class SpotStateTracker:
+    """
+    Per-camera temporal state: skips inference on spots whose crop has not
+    changed and debounces the published status.
+
+    - change gate: a spot is reclassified only when the mean absolute
+      difference between its signature and the signature at its last
+      inference exceeds change_threshold (0-255 scale), or when it has been
+      skipped refresh_interval frames in a row
+    - hysteresis: the published status flips only after vote_window
+      consecutive readings agree on the new status
+    """
+
+    def __init__(self, change_threshold=None, refresh_interval=10, vote_window=1):
+        self.change_threshold = change_threshold
+        self.refresh_interval = refresh_interval
+        self.vote_window = max(1, vote_window)
+        self.spot_ids = None
+        self.classified = 0
+        self.skipped = 0
+
+    def _reset(self, spot_ids, signatures):
+        count = len(spot_ids)
+        self.spot_ids = list(spot_ids)
+        self.signatures = signatures.copy()
+        # a huge age forces inference on the first frame
+        self.age = np.full(count, 1 << 30, dtype=np.int64)
+        self.last_class = np.full(count, -1, dtype=np.int64)
+        self.last_confidence = np.zeros(count, dtype=np.float64)
+        self.stable_class = np.full(count, -1, dtype=np.int64)
+        self.stable_confidence = np.zeros(count, dtype=np.float64)
+        self.history = np.full((count, self.vote_window), -1, dtype=np.int64)
+        self.history_pos = 0
+
+    def select(self, spot_ids, signatures):
+        """
+        returns the indices of the spots that need the model this frame
+        """
+        if self.spot_ids != list(spot_ids):
+            self._reset(spot_ids, signatures)
+
+        if self.change_threshold is None:
+            return np.arange(len(spot_ids))
+
+        difference = np.abs(signatures - self.signatures).mean(axis=(1, 2, 3))
+        needs_inference = (difference > self.change_threshold) | (self.age >= self.refresh_interval)
+        return np.flatnonzero(needs_inference)
+
+    def update(self, indices, predictions, signatures):
+        """
+        Record the model readings for the selected spots and advance one frame.
+
+        Args:
+            indices: spot indices returned by select
+            predictions: (predicted_class, confidence) per selected spot
+            signatures: signatures of all spots this frame
+
+        returns (predicted_class, confidence) for every spot after smoothing
+        """
+        self.age += 1
+        if len(indices):
+            classes, confidences = zip(*predictions)
+            self.last_class[indices] = classes
+            self.last_confidence[indices] = confidences
+            self.signatures[indices] = signatures[indices]
+            self.age[indices] = 0
+
+        self.classified += len(indices)
+        self.skipped += len(self.spot_ids) - len(indices)
+
+        # skipped spots repeat their last reading, the crop has not changed
+        self.history[:, self.history_pos % self.vote_window] = self.last_class
+        self.history_pos += 1
+
+        agreed = (self.history == self.last_class[:, None]).all(axis=1)
+        flip = agreed | (self.stable_class < 0) | (self.last_class == self.stable_class)
+        self.stable_class[flip] = self.last_class[flip]
+        self.stable_confidence[flip] = self.last_confidence[flip]
+
+        return list(zip(self.stable_class.tolist(), self.stable_confidence.tolist()))
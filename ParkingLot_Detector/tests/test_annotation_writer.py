@@ -0,0 +1,37 @@
+import cv2
+import numpy as np
+
+from annotation_writer import AnnotationWriter
+
+POLYGONS = np.array([[[10, 10], [60, 10], [60, 60], [10, 60]]], dtype=np.float32)
+
+
+def write(writer, output_path):
+    frame = np.zeros((120, 160, 3), dtype=np.uint8)
+    writer.submit(frame, POLYGONS, np.array([True]), np.array([0.9]), str(output_path))
+    writer.close()
+
+
+def test_default_writer_keeps_png_path(tmp_path):
+    writer = AnnotationWriter()
+    output_path = tmp_path / "res.png"
+    assert writer.output_path(str(output_path)) == str(output_path)
+    write(writer, output_path)
+
+    assert output_path.exists()
+    assert not (tmp_path / "res.jpg").exists()
+    assert output_path.read_bytes()[:8] == b"\x89PNG\r\n\x1a\n"
+    assert cv2.imread(str(output_path)).shape == (120, 160, 3)
+
+
+def test_default_writer_adds_jpg_without_extension(tmp_path):
+    writer = AnnotationWriter()
+    write(writer, tmp_path / "res")
+    assert (tmp_path / "res.jpg").exists()
+
+
+def test_explicit_format_replaces_extension(tmp_path):
+    writer = AnnotationWriter(image_format='webp')
+    write(writer, tmp_path / "res.png")
+    assert (tmp_path / "res.webp").exists()
+    assert not (tmp_path / "res.png").exists()
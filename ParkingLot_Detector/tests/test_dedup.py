@@ -0,0 +1,38 @@
+import numpy as np
+
+from data_processing.dedup import cluster_hashes
+
+
+def chain(steps, bits_per_step):
+    """hashes where each one flips bits_per_step new bits of the previous one"""
+    hashes, value = [0], 0
+    for step in range(steps):
+        for bit in range(step * bits_per_step, (step + 1) * bits_per_step):
+            value ^= 1 << bit
+        hashes.append(value)
+    return np.array(hashes, dtype=np.uint64)
+
+
+def distance(a, b):
+    return bin(int(a) ^ int(b)).count('1')
+
+
+def test_chain_of_near_duplicates_is_not_one_cluster():
+    hashes = chain(20, 3)
+    assert distance(hashes[0], hashes[-1]) == 60
+
+    clusters = cluster_hashes(hashes, 4)
+    assert len(set(clusters.tolist())) > 1
+    # every member is within max_distance of its leader, so the diameter is bounded
+    for index, leader in enumerate(clusters):
+        assert distance(hashes[index], hashes[leader]) <= 4
+    for cluster in set(clusters.tolist()):
+        members = hashes[clusters == cluster]
+        assert max(distance(a, b) for a in members for b in members) <= 8
+
+
+def test_near_and_exact_duplicates_share_a_cluster():
+    base = 0x0123456789ABCDEF
+    hashes = np.array([base, base ^ 0b101, base, base ^ (0xFFFF << 40), base ^ 0b1], dtype=np.uint64)
+    clusters = cluster_hashes(hashes, 4)
+    assert clusters.tolist() == [0, 0, 0, 3, 0]
@@ -0,0 +1,29 @@
+import os
+
+import numpy as np
+
+from detector import ParkingDetector
+from utils.csv_utils import SOURCE_RESOLUTION, resolution_scale
+from utils.spot_config import load_spot_table
+
+CAMERA8_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           'config', 'camera_data_csv', 'camera8.csv')
+
+
+def test_camera8_csv_scaled_into_frame():
+    spots = load_spot_table(CAMERA8_CSV, resolution_scale(SOURCE_RESOLUTION, (1000, 750)))
+    assert len(spots) == 54
+    assert spots.in_bounds(1000, 750).all()
+
+
+def test_detector_scales_csv_spots_to_frame():
+    detector = ParkingDetector(backbone='tiny_cnn', device='cpu')
+    assert detector.load_parking_spots(CAMERA8_CSV)
+    assert detector.parking_spots.in_bounds(1000, 750).all()
+    target_coords = detector.parking_spots.coords.copy()
+
+    # a frame of another resolution rescales the CSV rectangles to it
+    warp_maps = detector._get_warp_maps(1296, 972, CAMERA8_CSV)
+    spots = detector._spot_configs[CAMERA8_CSV]["spots"]
+    assert len(warp_maps["valid_index"]) == len(spots) == 54
+    np.testing.assert_allclose(spots.coords, target_coords * 1.296, rtol=1e-4)
@@ -1,20 +1,53 @@
 #train.py
 import argparse
-from detector import ParkingLotDetector
+
+from detector import BACKBONES, ParkingSpaceClassifier, train_model
+from data_processing.augment import BatchAugment
+from data_processing.dataset import get_data_loaders
+
 
 def train(args):
     """
     entry point for training the parking lot detection model.
 
     """
-    detector = ParkingLotDetector()
-    detector.train(train_dir=args.train_dir, val_dir=args.val_dir, output_model_path=args.output_model_path)
+    input_size = args.input_size or BACKBONES[args.backbone]
+    # loaders stay at 224 for every backbone, train_model downsizes batches on the device
+    train_loader, val_loader, _ = get_data_loaders(args.data_dir, batch_size=args.batch_size, img_size=224,
+                                                   num_workers=args.num_workers,
+                                                   device_augment=args.device_augment,
+                                                   sample_list=args.sample_list)
+    if train_loader is None:
+        return None
+
+    model = ParkingSpaceClassifier(backbone=args.backbone, pretrained=not args.no_pretrained)
+    return train_model(model, train_loader, val_loader, epochs=args.epochs, learning_rate=args.learning_rate,
+                       model_save_path=args.output_model_path, input_size=input_size,
+                       augment=BatchAugment() if args.device_augment else None, amp=args.amp,
+                       accumulation_steps=args.accumulation_steps, checkpoint_path=args.checkpoint_path,
+                       resume=args.resume)
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument('--train_dir', required=True, help="Path to training dataset")
-    parser.add_argument('--val_dir', required=True, help="Path to validation dataset")
-    parser.add_argument('--output_model_path', required=True, help="Path to save the trained model")
+    parser.add_argument('--data_dir', required=True,
+                        help="Dataset folder with empty/occupied subfolders, or a folder from pack_dataset.py")
+    parser.add_argument('--output_model_path', default="model/parking_detector.pth",
+                        help="Path to save the best model")
+    parser.add_argument('--backbone', default='resnet18', choices=list(BACKBONES), help="Classifier backbone")
+    parser.add_argument('--input_size', type=int, default=None, help="Model input size, defaults to the backbone's")
+    parser.add_argument('--no_pretrained', action='store_true', help="Do not start from ImageNet weights")
+    parser.add_argument('--sample_list', default=None, help="Optional sample list from dedup_dataset.py")
+    parser.add_argument('--num_workers', type=int, default=None, help="DataLoader workers, defaults to min(4, CPUs)")
+    parser.add_argument('--device_augment', action='store_true',
+                        help="Augment whole uint8 batches on the training device instead of per image")
+    parser.add_argument('--epochs', type=int, default=10, help="Training epochs")
+    parser.add_argument('--batch_size', type=int, default=32, help="Batch size")
+    parser.add_argument('--learning_rate', type=float, default=0.001, help="Learning rate")
+    parser.add_argument('--amp', action='store_true', help="Mixed precision: bf16 on the CPU, fp16 on CUDA")
+    parser.add_argument('--accumulation_steps', type=int, default=1, help="Batches accumulated per optimizer step")
+    parser.add_argument('--checkpoint_path', default=None, help="Full training checkpoint written every epoch")
+    parser.add_argument('--resume', action='store_true', help="Resume from --checkpoint_path")
     args = parser.parse_args()
 
     train(args)
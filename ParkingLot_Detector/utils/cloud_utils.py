@@ -1,6 +1,7 @@
 import requests
 import json
 import time
+from requests.adapters import HTTPAdapter
 
 
 ''' #以后上传别的东西（比如照片、debug日志）时备用。
@@ -34,19 +35,41 @@ class CloudStorage:
 
 
 class CloudUploader:
-    def __init__(self, api_url, lot_id):
+    def __init__(self, api_url, lot_id, session=None, pool_size=4, timeout=10):
+        """
+        :param api_url: Firebase Realtime Database URL
+        :param lot_id: 停车场 ID，例如 "lot-c"
+        :param session: 可选的 requests.Session（多个停车场可以共用一个连接池）
+        :param pool_size: 每个主机保持的 keep-alive 连接数
+        :param timeout: 单次请求超时（秒）
+        """
         self.api_url = api_url.rstrip('/')
         self.lot_id = lot_id
+        self.session = session if session is not None else self.create_session(pool_size)
+        self.timeout = timeout
+
+        # 上次成功发布的状态，用于只上传变化部分
+        self.published_spaces = {}
+        self.published_counts = None
+
+    @staticmethod
+    def create_session(pool_size=4):
+        """创建带连接池的 keep-alive Session"""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
 
     def upload_parking_status(self, occupied, empty):
         """上传停车场整体空位信息"""
         data = {
             "occupied": occupied,
             "empty": empty,
-            "timestamp": int(__import__("time").time())
+            "timestamp": int(time.time())
         }
         url = f"{self.api_url}/parking-lots/{self.lot_id}/availability.json"
-        response = requests.put(url, json=data)
+        response = self.session.put(url, json=data, timeout=self.timeout)
         return response.status_code == 200
 
     def upload_spaces_status(self, results):
@@ -60,6 +83,54 @@ class CloudUploader:
             "status": status
         }
         url = f"{self.api_url}/parking-lots/{self.lot_id}/spaces/{space_id}.json"
-        response = requests.put(url, json=data)
+        response = self.session.put(url, json=data, timeout=self.timeout)
+        if response.status_code != 200:
+            print(f"上传车位 {space_id} 状态失败：{response.status_code}")
+
+    def build_changes(self, results):
+        """
+        计算与上次发布相比的变化，返回多路径更新字典（没有变化时为空）
+        例如 {"spaces/613/status": "occupied", "availability": {...}}
+        """
+        occupied = sum(1 for spot in results.values() if spot["status"] == "occupied")
+        empty = sum(1 for spot in results.values() if spot["status"] == "empty")
+
+        changes = {}
+        for spot_id, spot_info in results.items():
+            if self.published_spaces.get(spot_id) != spot_info["status"]:
+                changes[f"spaces/{spot_id}/status"] = spot_info["status"]
+
+        if (occupied, empty) != self.published_counts:
+            changes["availability"] = {
+                "occupied": occupied,
+                "empty": empty,
+                "timestamp": int(time.time())
+            }
+        return changes
+
+    def publish_changes(self, results):
+        """
+        只上传变化的车位状态和空位统计：合并为一次发往停车场根节点的多路径 PATCH。
+        上传失败时不更新本地状态，下次调用会重新发送这些变化。
+        """
+        changes = self.build_changes(results)
+        if not changes:
+            return True
+
+        url = f"{self.api_url}/parking-lots/{self.lot_id}.json"
+        try:
+            response = self.session.patch(url, json=changes, timeout=self.timeout)
+        except requests.RequestException as e:
+            print(f"上传停车场 {self.lot_id} 状态异常：{e}")
+            return False
+
         if response.status_code != 200:
-            print(f"上传车位 {space_id} 状态失败：{response.status_code}")
\ No newline at end of file
+            print(f"上传停车场 {self.lot_id} 状态失败：{response.status_code}")
+            return False
+
+        for path, value in changes.items():
+            if path.startswith("spaces/"):
+                self.published_spaces[path.split('/')[1]] = value
+        if "availability" in changes:
+            self.published_counts = (changes["availability"]["occupied"], changes["availability"]["empty"])
+        return True
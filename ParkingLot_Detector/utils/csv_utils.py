@@ -1,56 +1,59 @@
-import pandas as pd
-import json
 import os
+
 import cv2
 import numpy as np
 
+from utils.spot_config import SpotTable, read_csv_spots
+
+# 标注 CSV 的坐标基于摄像头原始分辨率，检测在缩放后的帧上进行
+SOURCE_RESOLUTION = (2592, 1944)
+TARGET_RESOLUTION = (1000, 750)
+
 
-def convert_camera_csv_to_config(csv_path, config_path, scale_x=0.3858, scale_y=0.3858):
-    """将摄像头CSV文件中的坐标转换为配置文件，并应用缩放比例"""
-    import pandas as pd
-    import json
-    import os
+def resolution_scale(source_size=SOURCE_RESOLUTION, target_size=TARGET_RESOLUTION):
+    """由源分辨率和目标分辨率 (宽, 高) 计算 (scale_x, scale_y)"""
+    return target_size[0] / source_size[0], target_size[1] / source_size[1]
 
-    # 读取CSV文件
-    df = pd.read_csv(csv_path)
 
-    # 创建停车位配置列表
-    parking_spots = []
+def image_resolution(image_path):
+    """读取图像的 (宽, 高)，用于从实际帧推导目标分辨率"""
+    image = cv2.imread(image_path)
+    if image is None:
+        raise ValueError(f"无法读取图像: {image_path}")
+    return image.shape[1], image.shape[0]
 
-    # 遍历每行数据
-    for index, row in df.iterrows():
-        # 应用缩放比例
-        x = int(row['X'] * scale_x)
-        y = int(row['Y'] * scale_y)
-        w = int(row['W'] * scale_x)
-        h = int(row['H'] * scale_y)
 
-        # 将矩形坐标转换为四个角点坐标
-        coords = [
-            [x, y],  # 左上
-            [x + w, y],  # 右上
-            [x + w, y + h],  # 右下
-            [x, y + h]  # 左下
-        ]
+def convert_csv_files(csv_paths, source_size=SOURCE_RESOLUTION, target_size=TARGET_RESOLUTION):
+    """
+    将多个 SlotId,X,Y,W,H 格式的 CSV 转换为 SpotTable
 
-        spot_id = str(row['SlotId'])
+    所有文件的矩形先拼接成一个数组，一次完成缩放和取整（与旧转换脚本的 int() 截断一致），
+    再按文件拆分
 
-        parking_spots.append({
-            "id": spot_id,
-            "coords": coords
-        })
+    Returns:
+        与 csv_paths 对应的 SpotTable 列表
+    """
+    tables = [read_csv_spots(csv_path) for csv_path in csv_paths]
+    if not tables:
+        return []
 
-    # 保存为JSON配置文件
-    os.makedirs(os.path.dirname(config_path), exist_ok=True)
-    with open(config_path, 'w') as f:
-        json.dump(parking_spots, f, indent=4)
+    scale = np.array(resolution_scale(source_size, target_size), dtype=np.float64)
+    coords = np.concatenate([table.coords for table in tables]).astype(np.float64)
+    coords = np.floor(coords * scale)
+    splits = np.cumsum([len(table) for table in tables])[:-1]
+    return [SpotTable(table.ids, part) for table, part in zip(tables, np.split(coords, splits))]
 
-    print(f"已转换并缩放{len(parking_spots)}个停车位配置到: {config_path}")
-    return parking_spots
 
+def convert_camera_csv_to_config(csv_path, config_path, source_size=SOURCE_RESOLUTION, target_size=TARGET_RESOLUTION):
+    """将摄像头CSV文件中的坐标按分辨率缩放后保存为标准配置文件 [{"id", "coords"}]"""
+    spots = convert_csv_files([csv_path], source_size, target_size)[0]
+    spots.save(config_path)
+    print(f"已转换并缩放{len(spots)}个停车位配置到: {config_path}")
+    return spots
 
-def visualize_spots_from_csv(csv_path, image_path, output_path, original_width=1000, original_height=750):
-    """可视化CSV中的停车位坐标"""
+
+def visualize_spots_from_csv(csv_path, image_path, output_path, source_size=SOURCE_RESOLUTION):
+    """可视化CSV中的停车位坐标，坐标按图像的实际分辨率缩放"""
     if not os.path.exists(csv_path):
         print(f"错误：CSV文件不存在: {csv_path}")
         return
@@ -59,31 +62,29 @@ def visualize_spots_from_csv(csv_path, image_path, output_path, original_width=1
         print(f"错误：图像文件不存在: {image_path}")
         return
 
-    # 读取CSV和图像
-    df = pd.read_csv(csv_path)
     image = cv2.imread(image_path)
     if image is None:
         print(f"错误：无法读取图像: {image_path}")
         return
 
-    # 复制图像用于绘制
-    result = image.copy()
-
-    # 绘制停车位
-    for index, row in df.iterrows():
-        x, y, w, h = row['X'], row['Y'], row['W'], row['H']
+    height, width = image.shape[:2]
+    spots = convert_csv_files([csv_path], source_size, (width, height))[0]
 
-        # 确保坐标在有效范围内
-        if x < 0 or y < 0 or x + w > original_width or y + h > original_height:
-            print(f"警告：停车位 {row['SlotId']} 坐标超出图像范围: ({x},{y},{w},{h})")
-            continue
+    # 越界检查一次完成
+    in_bounds = spots.in_bounds(width, height)
+    if not in_bounds.all():
+        print(f"警告：{int((~in_bounds).sum())} 个停车位坐标超出图像范围: "
+              f"{[spots.ids[i] for i in np.flatnonzero(~in_bounds)]}")
+    spots = spots.subset(in_bounds)
 
-        # 绘制矩形和ID
-        cv2.rectangle(result, (x, y), (x + w, y + h), (0, 255, 0), 2)
-        cv2.putText(result, str(row['SlotId']), (x, y - 5),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+    # 复制图像用于绘制，所有多边形一次绘制
+    result = image.copy()
+    corners = spots.int_coords()
+    cv2.polylines(result, list(corners), True, (0, 255, 0), 2)
+    for spot_id, (x, y) in zip(spots.ids, corners[:, 0]):
+        cv2.putText(result, spot_id, (int(x), int(y) - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
 
     # 保存结果
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
     cv2.imwrite(output_path, result)
-    print(f"已保存可视化结果到: {output_path}")
\ No newline at end of file
+    print(f"已保存可视化结果到: {output_path}")
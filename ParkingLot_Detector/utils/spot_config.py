@@ -0,0 +1,164 @@
+import json
+import os
+
+import numpy as np
+
+
+class SpotTable:
+    """
+    停车位表：全部车位的几何信息保存在一个 numpy 数组中
+
+    Attributes:
+        ids: 车位 id 列表（字符串），顺序即配置文件中的顺序
+        coords: (N, 4, 2) float32 数组，每个车位的四个角点（左上、右上、右下、左下）
+        index: id -> 行号
+    """
+
+    def __init__(self, ids, coords):
+        self.ids = [str(spot_id) for spot_id in ids]
+        self.coords = np.asarray(coords, dtype=np.float32).reshape(len(self.ids), 4, 2)
+        self.index = {spot_id: i for i, spot_id in enumerate(self.ids)}
+        if len(self.index) != len(self.ids):
+            duplicates = sorted({spot_id for spot_id in self.ids if self.ids.count(spot_id) > 1})
+            raise ValueError(f"车位 id 重复: {duplicates}")
+
+    def __len__(self):
+        return len(self.ids)
+
+    def areas(self):
+        """每个车位四边形的面积（鞋带公式），(N,)"""
+        x, y = self.coords[:, :, 0], self.coords[:, :, 1]
+        return 0.5 * np.abs((x * np.roll(y, -1, axis=1) - np.roll(x, -1, axis=1) * y).sum(axis=1))
+
+    def in_bounds(self, width, height):
+        """四个角点都在 width x height 图像内的车位掩码，(N,) bool"""
+        x, y = self.coords[:, :, 0], self.coords[:, :, 1]
+        return ((x >= 0) & (x < width) & (y >= 0) & (y < height)).all(axis=1)
+
+    def int_coords(self):
+        """用于 cv2 绘图的 (N, 4, 2) int32 角点"""
+        return self.coords.astype(np.int32)
+
+    def subset(self, mask):
+        """按布尔掩码或行号取出部分车位"""
+        rows = np.flatnonzero(mask) if np.asarray(mask).dtype == bool else np.asarray(mask)
+        return SpotTable([self.ids[i] for i in rows], self.coords[rows])
+
+    def to_records(self):
+        """转换为 [{"id", "coords"}] 列表，即标准的配置文件格式"""
+        # 整数坐标保存为整数，与手工标注的配置文件一致；否则保留两位小数
+        if np.array_equal(self.coords, np.round(self.coords)):
+            coords = self.int_coords().tolist()
+        else:
+            coords = self.coords.astype(np.float64).round(2).tolist()
+        return [{"id": spot_id, "coords": points} for spot_id, points in zip(self.ids, coords)]
+
+    def save(self, path):
+        """以标准格式保存"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.to_records(), f, indent=4)
+
+
+def rectangles_to_corners(x, y, w, h):
+    """将 X/Y/W/H 矩形数组转换为 (N, 4, 2) 角点数组（左上、右上、右下、左下）"""
+    x, y, w, h = (np.asarray(v, dtype=np.float32) for v in (x, y, w, h))
+    return np.stack([
+        np.stack([x, y], axis=1),
+        np.stack([x + w, y], axis=1),
+        np.stack([x + w, y + h], axis=1),
+        np.stack([x, y + h], axis=1)
+    ], axis=1)
+
+
+def _points(value):
+    # 字典条目的角点在 "coords" 或 "points" 中，否则条目本身就是角点列表
+    if isinstance(value, dict):
+        return value.get("coords", value.get("points"))
+    return value
+
+
+def _slot_id(value):
+    # SlotId 可能被保存为 613.0，统一为整数字符串
+    value = value.strip()
+    try:
+        number = float(value)
+    except ValueError:
+        return value
+    return str(int(number)) if number.is_integer() else value
+
+
+def parse_spots(data):
+    """
+    识别并统一已解析的 JSON 车位配置，支持：
+
+        [{"id": ..., "coords": [[x, y] * 4]}]     ParkingDetector 的标准格式
+        {id: {"points": [[x, y] * 4]}}             annotate.py 的输出
+        {id: [[x, y] * 4]}                          旧的 convert_camera8_csv_to_json.py 输出
+
+    Returns:
+        SpotTable
+    """
+    if isinstance(data, list):
+        entries = [(spot["id"], _points(spot)) for spot in data]
+    elif isinstance(data, dict):
+        entries = [(spot_id, _points(value)) for spot_id, value in data.items()]
+    else:
+        raise ValueError(f"无法识别的车位配置类型: {type(data).__name__}")
+
+    for spot_id, points in entries:
+        if points is None or np.shape(points) != (4, 2):
+            raise ValueError(f"车位 {spot_id} 需要 4 个 (x, y) 角点，实际为 {points}")
+
+    ids = [spot_id for spot_id, _ in entries]
+    coords = np.array([points for _, points in entries], dtype=np.float32).reshape(len(entries), 4, 2)
+    return SpotTable(ids, coords)
+
+
+CSV_COLUMNS = ('SlotId', 'X', 'Y', 'W', 'H')
+
+
+def read_csv_spots(csv_path, scale=1.0):
+    """
+    读取 SlotId,X,Y,W,H 格式的 CSV（列顺序由表头决定），坐标乘以 scale（标量或 (scale_x, scale_y)）
+
+    数值列由 np.loadtxt 一次解析，所有矩形在一次向量运算中转换为角点
+    """
+    with open(csv_path, 'r') as f:
+        header = [name.strip() for name in f.readline().split(',')]
+    missing = [name for name in CSV_COLUMNS if name not in header]
+    if missing:
+        raise ValueError(f"{csv_path}: 缺少列 {missing}")
+    columns = [header.index(name) for name in CSV_COLUMNS]
+
+    ids = np.loadtxt(csv_path, delimiter=',', skiprows=1, usecols=columns[0], dtype=str, ndmin=1)
+    values = np.loadtxt(csv_path, delimiter=',', skiprows=1, usecols=columns[1:], dtype=np.float32, ndmin=2)
+    corners = rectangles_to_corners(*values.T) * np.broadcast_to(np.asarray(scale, dtype=np.float32), 2)
+    return SpotTable([_slot_id(spot_id) for spot_id in ids], corners)
+
+
+def load_spot_table(config_path, csv_scale=1.0):
+    """
+    读取车位配置文件并自动识别格式（JSON 的三种格式或 CSV），统一为 SpotTable
+
+    读取时检查一次几何形状：每个车位必须是 4 个有限坐标的非退化四边形；
+    与图像尺寸相关的越界检查由 SpotTable.in_bounds 在已知分辨率后完成
+
+    Args:
+        config_path: .json 或 .csv 文件
+        csv_scale: CSV 坐标的缩放比例
+
+    Returns:
+        SpotTable；格式或几何无效时抛出 ValueError
+    """
+    if config_path.lower().endswith('.csv'):
+        table = read_csv_spots(config_path, csv_scale)
+    else:
+        with open(config_path, 'r') as f:
+            table = parse_spots(json.load(f))
+
+    invalid = ~np.isfinite(table.coords).all(axis=(1, 2)) | (table.areas() <= 0)
+    if invalid.any():
+        raise ValueError(f"{config_path}: 车位几何无效（非有限坐标或面积为 0）: "
+                         f"{[table.ids[i] for i in np.flatnonzero(invalid)]}")
+    return table
@@ -0,0 +1,173 @@
+import json
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from utils.cloud_utils import CloudUploader
+
+
+class UploadQueue:
+    """
+    后台上传队列：检测循环只调用 submit()，网络请求全部在后台线程完成。
+
+    - 每个停车场只保留最新一份检测结果（合并旧状态），因此队列大小以停车场数量为上限
+    - 上传失败按指数退避重试
+    - 待上传状态写入本地 spool 文件，进程重启后继续上传
+    """
+
+    def __init__(self, api_url, spool_path=None, max_pending=64,
+                 base_delay=1.0, max_delay=60.0, session=None):
+        """
+        :param api_url: Firebase Realtime Database URL
+        :param spool_path: 可选的本地 spool 文件路径（JSON）
+        :param max_pending: 最多同时等待上传的停车场数量，超出时丢弃最旧的一项
+        :param base_delay: 首次重试等待时间（秒）
+        :param max_delay: 重试等待时间上限（秒）
+        :param session: 可选的 requests.Session，默认新建一个连接池
+        """
+        self.api_url = api_url
+        self.spool_path = spool_path
+        self.max_pending = max_pending
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.session = session if session is not None else CloudUploader.create_session()
+
+        self.uploaders = {}
+        self.pending = OrderedDict()
+        self.inflight = None
+        self.failures = 0
+        self.stats = {"submitted": 0, "coalesced": 0, "dropped": 0, "sent": 0, "failed": 0}
+
+        self.condition = threading.Condition()
+        self.spool_lock = threading.Lock()
+        self.spool_dirty = False
+        self.stopping = False
+        self._load_spool()
+
+        self.worker = threading.Thread(target=self._run, name="upload-queue", daemon=True)
+        self.worker.start()
+
+    def submit(self, lot_id, results):
+        """
+        提交一个停车场的最新检测结果，立即返回，不会等待网络。
+        返回 False 表示因队列已满丢弃了另一个停车场的旧状态。
+        """
+        accepted = True
+        with self.condition:
+            self.stats["submitted"] += 1
+            if lot_id in self.pending:
+                self.stats["coalesced"] += 1
+            elif len(self.pending) >= self.max_pending:
+                dropped_lot, _ = self.pending.popitem(last=False)
+                self.stats["dropped"] += 1
+                print(f"上传队列已满，丢弃停车场 {dropped_lot} 的旧状态")
+                accepted = False
+
+            self.pending[lot_id] = results
+            self.pending.move_to_end(lot_id)
+            self.spool_dirty = True
+            self.condition.notify()
+        return accepted
+
+    def pending_count(self):
+        with self.condition:
+            return len(self.pending) + (1 if self.inflight else 0)
+
+    def close(self, timeout=10.0):
+        """
+        等待队列清空（最多 timeout 秒）后停止后台线程；未上传的状态保留在 spool 文件中
+        """
+        deadline = time.monotonic() + timeout
+        while self.pending_count() and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        with self.condition:
+            self.stopping = True
+            self.condition.notify()
+        self.worker.join(max(0.0, deadline - time.monotonic()) + 1.0)
+        self._write_spool()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.stopping:
+                    self.condition.wait()
+                if self.stopping:
+                    return
+                lot_id, results = self.pending.popitem(last=False)
+                self.inflight = (lot_id, results)
+
+            # 先落盘，再访问网络
+            self._write_spool()
+
+            try:
+                success = self._uploader(lot_id).publish_changes(results)
+            except Exception as e:
+                print(f"上传停车场 {lot_id} 状态异常：{e}")
+                success = False
+
+            with self.condition:
+                self.inflight = None
+                if success:
+                    self.failures = 0
+                    self.stats["sent"] += 1
+                else:
+                    self.failures += 1
+                    self.stats["failed"] += 1
+                    # 没有更新的状态时放回队首重试
+                    if lot_id not in self.pending:
+                        self.pending[lot_id] = results
+                        self.pending.move_to_end(lot_id, last=False)
+                self.spool_dirty = True
+            self._write_spool()
+
+            if not success:
+                delay = min(self.max_delay, self.base_delay * 2 ** (self.failures - 1))
+                delay *= random.uniform(0.8, 1.2)
+                print(f"{delay:.1f} 秒后重试上传（连续失败 {self.failures} 次）")
+                with self.condition:
+                    self.condition.wait_for(lambda: self.stopping, timeout=delay)
+
+    def _uploader(self, lot_id):
+        if lot_id not in self.uploaders:
+            self.uploaders[lot_id] = CloudUploader(self.api_url, lot_id, session=self.session)
+        return self.uploaders[lot_id]
+
+    def _load_spool(self):
+        if not self.spool_path or not os.path.exists(self.spool_path):
+            return
+        try:
+            with open(self.spool_path, 'r') as f:
+                spooled = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"读取 spool 文件失败：{e}")
+            return
+
+        for lot_id, results in spooled.items():
+            self.pending[lot_id] = results
+        if spooled:
+            print(f"从 spool 文件恢复了 {len(spooled)} 个停车场的待上传状态")
+
+    def _write_spool(self):
+        if not self.spool_path:
+            return
+        with self.spool_lock:
+            with self.condition:
+                if not self.spool_dirty:
+                    return
+                snapshot = OrderedDict()
+                if self.inflight:
+                    snapshot[self.inflight[0]] = self.inflight[1]
+                snapshot.update(self.pending)
+                self.spool_dirty = False
+
+            # 先写临时文件再替换，避免进程中断时留下半个文件
+            spool_dir = os.path.dirname(self.spool_path)
+            if spool_dir:
+                os.makedirs(spool_dir, exist_ok=True)
+            tmp_path = self.spool_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self.spool_path)
@@ -1,12 +1,14 @@
 # visualize_spots.py
 import argparse
 import cv2
-import json
 import os
 
+from utils.spot_config import load_spot_table
+
 def draw_spots(image_path, config_path):
     """
-    Draw parking spot boundaries on an image using a JSON config file.
+    Draw parking spot boundaries on an image using a spot config file
+    (any format utils.spot_config.load_spot_table reads).
 
     """
     image = cv2.imread(image_path)
@@ -18,16 +20,12 @@ def draw_spots(image_path, config_path):
         print(f"Config file not found: {config_path}")
         return
 
-    with open(config_path, 'r') as f:
-        spots = json.load(f)
+    spots = load_spot_table(config_path)
 
-    for spot_id, data in spots.items():
-        points = data["points"]
-        pts = [(int(x), int(y)) for x, y in points]
-        for i in range(4):
-            cv2.line(image, pts[i], pts[(i + 1) % 4], (0, 255, 0), 2)
+    for spot_id, pts in zip(spots.ids, spots.int_coords()):
+        cv2.polylines(image, [pts], True, (0, 255, 0), 2)
         x, y = pts[0]
-        cv2.putText(image, f"{spot_id}", (x, y - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 1)
+        cv2.putText(image, f"{spot_id}", (int(x), int(y) - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 1)
 
     cv2.imshow("Parking Spot Visualisation", image)
     cv2.waitKey(0)
@@ -34,28 +34,49 @@ export default function ParkingHistoryScreen() {
     });
   }, []);
 
-  // listen for parking records for the current account
+  // listen for parking records for the current account:
+  // the active session stays in parking-records, completed ones are archived
+  // under parking-history/{plate}/{YYYY-MM}
   useEffect(() => {
     if (!licensePlate) return;
 
-    // set up Firebase reference to user's parking records
-    const userRef = ref(database, `parking-records/${licensePlate}`);
+    let active: RecordItem[] = [];
+    let history: RecordItem[] = [];
 
-    // subscribe to realtime updates from Firebase
-    return onValue(userRef, (snapshot) => {
-      const data = snapshot.val();
-      if (!data) {
-        setRecords([]);
-        return;
-      }
+    // newest first, push ids sort chronologically
+    const publish = () => {
+      setRecords([...active, ...history].sort((a, b) => (a.id < b.id ? 1 : a.id > b.id ? -1 : 0)));
+    };
 
-      // parse and sort
-      const parsed = Object.entries(data).map(([id, value]: any) => ({
+    // set up Firebase references to user's parking records
+    const activeRef = ref(database, `parking-records/${licensePlate}`);
+    const historyRef = ref(database, `parking-history/${licensePlate}`);
+
+    // subscribe to realtime updates from Firebase
+    const unsubscribeActive = onValue(activeRef, (snapshot) => {
+      const data = snapshot.val() || {};
+      active = Object.entries(data).map(([id, value]: any) => ({
         id,
         ...value,
       }));
-      setRecords(parsed.reverse());
+      publish();
     });
+
+    const unsubscribeHistory = onValue(historyRef, (snapshot) => {
+      const months = snapshot.val() || {};
+      history = Object.values(months).flatMap((sessions: any) =>
+        Object.entries(sessions).map(([id, value]: any) => ({
+          id,
+          ...value,
+        }))
+      );
+      publish();
+    });
+
+    return () => {
+      unsubscribeActive();
+      unsubscribeHistory();
+    };
   }, [licensePlate]);
 
    // render each parking record item